@@ -8,6 +8,7 @@
 
 import numpy as np
 import scipy.spatial.distance as ssd
+from scipy import sparse
 from scipy.cluster import hierarchy
 
 import iotbx.phil
@@ -190,12 +191,13 @@ def calculate_matrices(self):
         )
 
         # Convert cosym output into cc/cos matrices in correct form and compute linkage matrices as clustering method
+        rij_matrix = self.cosym_analysis.target.rij_matrix
+        if sparse.issparse(rij_matrix):
+            rij_matrix = rij_matrix.toarray()
         (
             self.correlation_matrix,
             self.cc_linkage_matrix,
-        ) = self.compute_correlation_coefficient_matrix(
-            self.cosym_analysis.target.rij_matrix
-        )
+        ) = self.compute_correlation_coefficient_matrix(rij_matrix)
 
         self.correlation_clusters = self.cluster_info(
             linkage_matrix_to_dict(self.cc_linkage_matrix)
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import collections
+import concurrent.futures
 import itertools
 import logging
 import math
+import multiprocessing
 from io import StringIO
 
 import pkg_resources
@@ -40,6 +43,12 @@
         .expert_level = 1
     sys_absent_threshold = 0.9
         .type = float(value_min=0.0, value_max=1.0)
+    n_unchanged_best = None
+        .type = int(value_min=1)
+        .help = "If set, stop evaluating the putative crystal models once the best"
+                "model has not changed for this many successive evaluations. By"
+                "default, all models are evaluated, up to max_refine."
+        .expert_level = 2
     solution_scorer = filter *weighted
         .type = choice
         .expert_level = 1
@@ -108,6 +117,42 @@
 )
 
 
+# The lattice search, reflections and model evaluator of the forked worker
+# processes used to evaluate the candidate crystal models.
+_worker_state = {}
+
+
+def _initialise_evaluation_worker(lattice_search, reflections, evaluator):
+    _worker_state["lattice_search"] = lattice_search
+    _worker_state["reflections"] = reflections
+    _worker_state["evaluator"] = evaluator
+
+
+def _evaluate_candidate_in_worker(crystal_model):
+    return _worker_state["lattice_search"]._evaluate_candidate(
+        crystal_model, _worker_state["reflections"], _worker_state["evaluator"]
+    )
+
+
+def _evaluate_candidates_in_pool(pool, candidates, n_pending):
+    """Evaluate candidate crystal models in a pool of worker processes, yielding
+    the results in the order of the candidates.
+
+    The candidates are taken lazily from an iterator, with no more than n_pending
+    submitted ahead of the results consumed, so that no more candidates are
+    generated than are needed when the consumer stops early.
+    """
+    pending = collections.deque(
+        pool.submit(_evaluate_candidate_in_worker, cm)
+        for cm in itertools.islice(candidates, n_pending)
+    )
+    while pending:
+        result = pending.popleft().result()
+        for cm in itertools.islice(candidates, 1):
+            pending.append(pool.submit(_evaluate_candidate_in_worker, cm))
+        yield result
+
+
 class LatticeSearch(indexer.Indexer):
     def __init__(self, reflections, experiments, params):
         super().__init__(reflections, experiments, params)
@@ -181,103 +226,73 @@ def choose_best_orientation_matrix(self, candidate_orientation_matrices):
                 n_indexed_cutoff=filter_params.n_indexed_cutoff,
             )
 
-        args = []
-
-        for cm in candidate_orientation_matrices:
-            sel = self.reflections["id"] == -1
-            if self.d_min is not None:
-                sel &= 1 / self.reflections["rlp"].norms() > self.d_min
-            xo, yo, zo = self.reflections["xyzobs.mm.value"].parts()
-            imageset_id = self.reflections["imageset_id"]
-            experiments = ExperimentList()
-            for i_expt, expt in enumerate(self.experiments):
-                # XXX Not sure if we still need this loop over self.experiments
-                if expt.scan is not None and expt.scan.has_property("oscillation"):
-                    start, end = expt.scan.get_oscillation_range()
-                    if (end - start) > 360:
-                        # only use reflections from the first 360 degrees of the scan
-                        sel.set_selected(
-                            (imageset_id == i_expt)
-                            & (zo > ((start * math.pi / 180) + 2 * math.pi)),
-                            False,
-                        )
-                experiments.append(
-                    Experiment(
-                        imageset=expt.imageset,
-                        beam=expt.beam,
-                        detector=expt.detector,
-                        goniometer=expt.goniometer,
-                        scan=expt.scan,
-                        crystal=cm,
-                    )
-                )
-            refl = self.reflections.select(sel)
-            self.index_reflections(experiments, refl)
-            if refl.get_flags(refl.flags.indexed).count(True) == 0:
-                continue
-
-            from rstbx.dps_core.cell_assessment import SmallUnitCellVolume
-
-            from dials.algorithms.indexing import non_primitive_basis
+        evaluator = model_evaluation.ModelEvaluation(self.all_params)
+        reflections = self._reflections_for_candidate_evaluation()
+        max_refine = self.params.basis_vector_combinations.max_refine
+        n_unchanged_best = self.params.basis_vector_combinations.n_unchanged_best
+
+        # The candidates may be generated lazily, so look ahead only as far as
+        # needed to know whether there is more than one candidate
+        candidates = iter(candidate_orientation_matrices)
+        first_candidates = list(itertools.islice(candidates, 2))
+        candidates = itertools.chain(first_candidates, candidates)
+
+        # Evaluate the candidates in order, in a pool of forked worker processes
+        # (which share the reflections with this process) if nproc > 1, so that
+        # the results are considered in the same order whatever the value of nproc
+        pool = None
+        if (
+            self.params.nproc > 1
+            and len(first_candidates) > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.params.nproc,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_initialise_evaluation_worker,
+                initargs=(self, reflections, evaluator),
+            )
+            evaluations = _evaluate_candidates_in_pool(
+                pool, candidates, 2 * self.params.nproc
+            )
+        else:
+            evaluations = (
+                self._evaluate_candidate(cm, reflections, evaluator)
+                for cm in candidates
+            )
 
-            threshold = self.params.basis_vector_combinations.sys_absent_threshold
-            if threshold and (
-                self._symmetry_handler.target_symmetry_primitive is None
-                or self._symmetry_handler.target_symmetry_primitive.unit_cell() is None
-            ):
-                try:
-                    non_primitive_basis.correct(
-                        experiments, refl, self._assign_indices, threshold
-                    )
-                    if refl.get_flags(refl.flags.indexed).count(True) == 0:
-                        continue
-                except SmallUnitCellVolume:
-                    logger.debug(
-                        "correct_non_primitive_basis SmallUnitCellVolume error for unit cell %s:",
-                        experiments[0].crystal.get_unit_cell(),
-                    )
+        n_candidates = 0
+        n_evaluated = 0
+        n_unchanged = 0
+        best_model = None
+        try:
+            for accepted, soln in evaluations:
+                n_candidates += 1
+                if not accepted:
                     continue
-                except RuntimeError as e:
-                    if "Krivy-Gruber iteration limit exceeded" in str(e):
+                n_evaluated += 1
+                if soln is not None:
+                    solutions.append(soln)
+                if n_evaluated == max_refine:
+                    break
+                if n_unchanged_best and len(solutions):
+                    if solutions.best_model() is best_model:
+                        n_unchanged += 1
+                    else:
+                        best_model = solutions.best_model()
+                        n_unchanged = 0
+                    if n_unchanged == n_unchanged_best:
                         logger.debug(
-                            "correct_non_primitive_basis Krivy-Gruber iteration limit exceeded error for unit cell %s:",
-                            experiments[0].crystal.get_unit_cell(),
+                            "Best model unchanged after %i further evaluations: "
+                            "stopping after %i evaluated of %i candidate models",
+                            n_unchanged,
+                            n_evaluated,
+                            n_candidates,
                         )
-                        continue
-                    raise
-                if (
-                    experiments[0].crystal.get_unit_cell().volume()
-                    < self.params.min_cell_volume
-                ):
-                    continue
-
-            if self.params.known_symmetry.space_group is not None:
-                new_crystal, _ = self._symmetry_handler.apply_symmetry(
-                    experiments[0].crystal
-                )
-                if new_crystal is None:
-                    continue
-                experiments[0].crystal.update(new_crystal)
-
-            args.append((experiments, refl))
-            if len(args) == self.params.basis_vector_combinations.max_refine:
-                break
-
-        from libtbx import easy_mp
-
-        evaluator = model_evaluation.ModelEvaluation(self.all_params)
-        results = easy_mp.parallel_map(
-            evaluator.evaluate,
-            args,
-            iterable_type=easy_mp.posiargs,
-            processes=self.params.nproc,
-            preserve_exception_message=True,
-        )
-
-        for soln in results:
-            if soln is None:
-                continue
-            solutions.append(soln)
+                        break
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
 
         if len(solutions):
             logger.info("Candidate solutions:")
@@ -290,6 +305,104 @@ def choose_best_orientation_matrix(self, candidate_orientation_matrices):
         else:
             return None, None
 
+    def _reflections_for_candidate_evaluation(self):
+        """Select the unindexed reflections to be indexed by each of the
+        candidate crystal models."""
+        sel = self.reflections["id"] == -1
+        if self.d_min is not None:
+            sel &= 1 / self.reflections["rlp"].norms() > self.d_min
+        zo = self.reflections["xyzobs.mm.value"].parts()[2]
+        imageset_id = self.reflections["imageset_id"]
+        for i_expt, expt in enumerate(self.experiments):
+            # XXX Not sure if we still need this loop over self.experiments
+            if expt.scan is not None and expt.scan.has_property("oscillation"):
+                start, end = expt.scan.get_oscillation_range()
+                if (end - start) > 360:
+                    # only use reflections from the first 360 degrees of the scan
+                    sel.set_selected(
+                        (imageset_id == i_expt)
+                        & (zo > ((start * math.pi / 180) + 2 * math.pi)),
+                        False,
+                    )
+        return self.reflections.select(sel)
+
+    def _evaluate_candidate(self, cm, reflections, evaluator):
+        """Index the reflections with a candidate crystal model, correct for a
+        non-primitive basis and apply the known symmetry, then evaluate the
+        model.
+
+        Args:
+            cm: The candidate crystal model
+            reflections: The reflections to index, which are not modified
+            evaluator: The model evaluation strategy
+
+        Returns:
+            A tuple (accepted, solution), where accepted is False if the candidate
+            was rejected before evaluation, and solution is the result of the
+            evaluation (None if the evaluation failed).
+        """
+        from rstbx.dps_core.cell_assessment import SmallUnitCellVolume
+
+        from dials.algorithms.indexing import non_primitive_basis
+
+        experiments = ExperimentList()
+        for expt in self.experiments:
+            experiments.append(
+                Experiment(
+                    imageset=expt.imageset,
+                    beam=expt.beam,
+                    detector=expt.detector,
+                    goniometer=expt.goniometer,
+                    scan=expt.scan,
+                    crystal=cm,
+                )
+            )
+        refl = reflections.copy()
+        self.index_reflections(experiments, refl)
+        if refl.get_flags(refl.flags.indexed).count(True) == 0:
+            return False, None
+
+        threshold = self.params.basis_vector_combinations.sys_absent_threshold
+        if threshold and (
+            self._symmetry_handler.target_symmetry_primitive is None
+            or self._symmetry_handler.target_symmetry_primitive.unit_cell() is None
+        ):
+            try:
+                non_primitive_basis.correct(
+                    experiments, refl, self._assign_indices, threshold
+                )
+                if refl.get_flags(refl.flags.indexed).count(True) == 0:
+                    return False, None
+            except SmallUnitCellVolume:
+                logger.debug(
+                    "correct_non_primitive_basis SmallUnitCellVolume error for unit cell %s:",
+                    experiments[0].crystal.get_unit_cell(),
+                )
+                return False, None
+            except RuntimeError as e:
+                if "Krivy-Gruber iteration limit exceeded" in str(e):
+                    logger.debug(
+                        "correct_non_primitive_basis Krivy-Gruber iteration limit exceeded error for unit cell %s:",
+                        experiments[0].crystal.get_unit_cell(),
+                    )
+                    return False, None
+                raise
+            if (
+                experiments[0].crystal.get_unit_cell().volume()
+                < self.params.min_cell_volume
+            ):
+                return False, None
+
+        if self.params.known_symmetry.space_group is not None:
+            new_crystal, _ = self._symmetry_handler.apply_symmetry(
+                experiments[0].crystal
+            )
+            if new_crystal is None:
+                return False, None
+            experiments[0].crystal.update(new_crystal)
+
+        return True, evaluator.evaluate(experiments, refl)
+
 
 class BasisVectorSearch(LatticeSearch):
     def __init__(self, reflections, experiments, params):
@@ -0,0 +1,105 @@
+"""
+A cache of decoded image frames, shared between the processing tasks of an
+integration run.
+
+When a sweep is split into blocks, neighbouring blocks overlap by a number of
+frames, and each of the overlapping frames would otherwise be read, decoded and
+corrected once for every block that contains it. The first task to read one
+of the shared frames writes the corrected image data and mask to the cache, so
+that the other tasks which need the frame can read it back rather than
+decoding it again.
+
+Frames are stored as files in a temporary directory (on the shared memory
+filesystem /dev/shm where available), so that the cache can be used from
+separate worker processes on the same node. Each frame is written to a
+temporary file which is then atomically renamed, so a frame is only visible to
+other processes once it has been completely written.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from dxtbx import flumpy
+
+_SHARED_MEMORY_DIR = "/dev/shm"
+
+
+class SharedFrameCache:
+    """A cache of the corrected image data and mask for a set of frames of one
+    imageset."""
+
+    def __init__(self, frames, directory=None):
+        """
+        Initialise the cache.
+
+        :param frames: The (array range) indices of the frames to cache
+        :param directory: The directory in which to create the cache directory.
+                          Defaults to /dev/shm if available, else the system
+                          temporary directory.
+        """
+        if directory is None and os.path.isdir(_SHARED_MEMORY_DIR):
+            directory = _SHARED_MEMORY_DIR
+        self.frames = frozenset(frames)
+        self.directory = tempfile.mkdtemp(prefix="dials_frames_", dir=directory)
+
+    def __contains__(self, frame):
+        return frame in self.frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _path(self, frame):
+        return os.path.join(self.directory, f"{frame}.npz")
+
+    def get(self, frame):
+        """
+        Get a frame from the cache.
+
+        :param frame: The frame index
+        :return: A tuple of the image data and mask (each a tuple of flex arrays
+                 with one array per panel), or None if the frame is not cached
+        """
+        if frame not in self.frames:
+            return None
+        try:
+            with np.load(self._path(frame)) as arrays:
+                arrays = [arrays[f"arr_{i}"] for i in range(len(arrays.files))]
+        except FileNotFoundError:
+            return None
+        npanels = len(arrays) // 2
+        image = tuple(flumpy.from_numpy(a) for a in arrays[:npanels])
+        mask = tuple(flumpy.from_numpy(a) for a in arrays[npanels:])
+        return image, mask
+
+    def put(self, frame, image, mask):
+        """
+        Add a frame to the cache, if it is one of the frames to be cached and
+        has not already been written.
+
+        :param frame: The frame index
+        :param image: The image data, a tuple of flex.double with one per panel
+        :param mask: The mask, a tuple of flex.bool with one per panel
+        """
+        path = self._path(frame)
+        if frame not in self.frames or os.path.exists(path):
+            return
+        arrays = [flumpy.to_numpy(im) for im in image]
+        arrays.extend(flumpy.to_numpy(m) for m in mask)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, *arrays)
+            os.replace(tmp_path, path)
+        except OSError:
+            # e.g. out of space: the frame will just be read from the imageset
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def close(self):
+        """Remove the cached frames."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -119,6 +119,13 @@ def generate_phil_scope():
           .help = "The maximum percentage of available memory to use for"
                   "allocating shoebox arrays."
 
+        share_frames = True
+          .type = bool
+          .help = "Cache the images in the overlaps between blocks, so that each"
+                  "image is only read once. The cache uses the memory within"
+                  "max_memory_usage not required for shoebox arrays."
+          .expert_level = 2
+
       }
 
       use_dynamic_mask = True
@@ -407,6 +414,7 @@ def from_phil(params):
         block.threshold = params.block.threshold
         block.force = params.block.force
         block.max_memory_usage = params.block.max_memory_usage
+        block.share_frames = params.block.share_frames
 
         # Set the modelling processor parameters
         result.modelling.mp = mp
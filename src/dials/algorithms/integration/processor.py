@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import collections
 import itertools
 import logging
 import math
@@ -11,6 +12,7 @@
 import dials.algorithms.integration
 import dials.util
 import dials.util.log
+from dials.algorithms.integration.frame_cache import SharedFrameCache
 from dials.array_family import flex
 from dials.model.data import make_image
 from dials.util import tabulate
@@ -135,6 +137,7 @@ def __init__(self):
         self.threshold = 0.99
         self.force = False
         self.max_memory_usage = 0.90
+        self.share_frames = True
 
     def update(self, other):
         self.size = other.size
@@ -142,6 +145,7 @@ def update(self, other):
         self.threshold = other.threshold
         self.force = other.force
         self.max_memory_usage = other.max_memory_usage
+        self.share_frames = other.share_frames
 
 
 class Shoebox:
@@ -276,24 +280,27 @@ def process(self):
         else:
             logger.info(" Using multiprocessing with %d parallel job(s)\n", mp_nproc)
 
-        if mp_njobs * mp_nproc > 1:
-
-            def process_output(result):
-                rehandle_cached_records(result[1])
-                self.manager.accumulate(result[0])
-
-            multi_node_parallel_map(
-                func=execute_parallel_task,
-                iterable=list(self.manager.tasks()),
-                njobs=mp_njobs,
-                nproc=mp_nproc,
-                callback=process_output,
-                cluster_method=mp_method,
-                preserve_order=True,
-            )
-        else:
-            for task in self.manager.tasks():
-                self.manager.accumulate(task())
+        try:
+            if mp_njobs * mp_nproc > 1:
+
+                def process_output(result):
+                    rehandle_cached_records(result[1])
+                    self.manager.accumulate(result[0])
+
+                multi_node_parallel_map(
+                    func=execute_parallel_task,
+                    iterable=list(self.manager.tasks()),
+                    njobs=mp_njobs,
+                    nproc=mp_nproc,
+                    callback=process_output,
+                    cluster_method=mp_method,
+                    preserve_order=True,
+                )
+            else:
+                for task in self.manager.tasks():
+                    self.manager.accumulate(task())
+        finally:
+            self.manager.close_frame_caches()
         self.manager.finalize()
         end_time = time()
         self.manager.time.user_time = end_time - start_time
@@ -365,7 +372,16 @@ class Task:
     A class to perform a processing task.
     """
 
-    def __init__(self, index, job, experiments, reflections, params, executor=None):
+    def __init__(
+        self,
+        index,
+        job,
+        experiments,
+        reflections,
+        params,
+        executor=None,
+        frame_cache=None,
+    ):
         """
         Initialise the task.
 
@@ -376,6 +392,7 @@ def __init__(self, index, job, experiments, reflections, params, executor=None):
         :param job: The frames to integrate
         :param flatten: Flatten the shoeboxes
         :param executor: The executor class
+        :param frame_cache: A SharedFrameCache of frames shared with other tasks
         """
         assert executor is not None, "No executor given"
         assert len(reflections) > 0, "Zero reflections given"
@@ -385,6 +402,7 @@ def __init__(self, index, job, experiments, reflections, params, executor=None):
         self.reflections = reflections
         self.params = params
         self.executor = executor
+        self.frame_cache = frame_cache
 
     def __call__(self):
         """
@@ -463,23 +481,15 @@ def __call__(self):
         read_time = 0.0
         for i in range(len(imageset)):
             st = time()
-            image = imageset.get_corrected_data(i)
-            if imageset.is_marked_for_rejection(i):
-                mask = tuple(flex.bool(im.accessor(), False) for im in image)
+            cached = None
+            if self.frame_cache is not None:
+                cached = self.frame_cache.get(frame0 + i)
+            if cached is not None:
+                image, mask = cached
             else:
-                mask = imageset.get_mask(i)
-                if self.params.lookup.mask is not None:
-                    assert len(mask) == len(self.params.lookup.mask), (
-                        "Mask/Image are incorrect size %d %d"
-                        % (
-                            len(mask),
-                            len(self.params.lookup.mask),
-                        )
-                    )
-                    mask = tuple(
-                        m1 & m2 for m1, m2 in zip(self.params.lookup.mask, mask)
-                    )
-
+                image, mask = self._read_frame(imageset, i)
+                if self.frame_cache is not None:
+                    self.frame_cache.put(frame0 + i, image, mask)
             read_time += time() - st
             processor.next(make_image(image, mask), self.executor)
             del image
@@ -517,6 +527,30 @@ def __call__(self):
             total_time=time() - start_time,
         )
 
+    def _read_frame(self, imageset, i):
+        """
+        Read the corrected image data and mask for a frame of the imageset.
+
+        :param imageset: The (sliced) imageset
+        :param i: The index of the frame in the imageset
+        :return: A tuple of the image data and mask
+        """
+        image = imageset.get_corrected_data(i)
+        if imageset.is_marked_for_rejection(i):
+            mask = tuple(flex.bool(im.accessor(), False) for im in image)
+        else:
+            mask = imageset.get_mask(i)
+            if self.params.lookup.mask is not None:
+                assert len(mask) == len(self.params.lookup.mask), (
+                    "Mask/Image are incorrect size %d %d"
+                    % (
+                        len(mask),
+                        len(self.params.lookup.mask),
+                    )
+                )
+                mask = tuple(m1 & m2 for m1, m2 in zip(self.params.lookup.mask, mask))
+        return image, mask
+
 
 class _Manager:
     """
@@ -542,6 +576,10 @@ def __init__(self, experiments, reflections, params):
         # Other data
         self.data = {}
 
+        # The caches of frames shared between tasks, by first experiment index
+        self.frame_caches = {}
+        self.frame_cache_limit = 0
+
         # Save some parameters
         self.params = params
 
@@ -573,6 +611,9 @@ def initialize(self):
         # Create the reflection manager
         self.manager = ReflectionManager(self.jobs, self.reflections)
 
+        # Create caches for the frames that are shared between jobs
+        self.compute_frame_caches()
+
         # Set the initialization time
         self.time.initialize = time() - start_time
 
@@ -599,6 +640,7 @@ def task(self, index):
                 reflections=reflections,
                 params=self.params,
                 executor=self.executor,
+                frame_cache=self.frame_caches.get(expr_id[0]),
             )
         return task
 
@@ -818,6 +860,15 @@ def _report(description, numbytes):
         report.append("")
         logger.log(output_level, "\n".join(report))
 
+        if output_level < logging.ERROR:
+            # Memory not needed for shoeboxes may be used to share frames
+            nproc = 1
+            if self.params.mp.method == "multiprocessing":
+                nproc = self.params.mp.nproc
+            self.frame_cache_limit = max(
+                0, available_limit - nproc * memory_required_per_process
+            )
+
         if output_level >= logging.ERROR:
             raise MemoryError(
                 """
@@ -830,6 +881,56 @@ def _report(description, numbytes):
                 % _average_bbox_size(self.reflections)
             )
 
+    def compute_frame_caches(self):
+        """
+        Set up caches for the frames that are read by more than one job (i.e.
+        the overlaps between blocks), limited by the memory left over after
+        allocating the shoeboxes.
+        """
+        if not self.params.block.share_frames or self.params.mp.njobs > 1:
+            # The cache is only shared between processes on a single node
+            return
+
+        # Count the number of jobs reading each frame of each imageset
+        counts = collections.Counter()
+        for i in range(len(self)):
+            if self.manager.num_reflections(i) == 0:
+                continue
+            job = self.manager.job(i)
+            f0, f1 = job.frames()
+            counts.update((job.expr()[0], f) for f in range(f0, f1))
+
+        # Select the shared frames that fit into the available memory
+        frames = collections.defaultdict(list)
+        memory_required = 0
+        for index, frame in sorted(k for k, n in counts.items() if n > 1):
+            detector = self.experiments[index].detector
+            # Corrected data as double and mask as bool
+            bytes_per_frame = 9 * sum(
+                p.get_image_size()[0] * p.get_image_size()[1] for p in detector
+            )
+            if memory_required + bytes_per_frame > self.frame_cache_limit:
+                break
+            memory_required += bytes_per_frame
+            frames[index].append(frame)
+
+        for index, indices in frames.items():
+            self.frame_caches[index] = SharedFrameCache(indices)
+        if frames:
+            logger.info(
+                " Sharing %d frames read by more than one block (%.1f GB)\n",
+                sum(len(f) for f in frames.values()),
+                memory_required / 1e9,
+            )
+
+    def close_frame_caches(self):
+        """
+        Remove the shared frames
+        """
+        for cache in self.frame_caches.values():
+            cache.close()
+        self.frame_caches = {}
+
     def summary(self):
         """
         Get a summary of the processing
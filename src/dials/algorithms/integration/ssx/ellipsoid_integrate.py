@@ -128,6 +128,7 @@ def run(self, experiment, table):
                         LL_tolerance=self.params.profile.ellipsoid.refinement.LL_tolerance,
                         mosaicity_max_limit=self.params.profile.ellipsoid.refinement.mosaicity_max_limit,
                         max_cell_volume_change_fraction=self.params.profile.ellipsoid.refinement.max_cell_volume_change_fraction,
+                        vectorised=self.params.profile.ellipsoid.refinement.vectorised,
                     )
                 except BadSpotForIntegrationException as e:
                     raise RuntimeError(e)
@@ -187,6 +188,7 @@ def refine(
         LL_tolerance=1e-6,
         mosaicity_max_limit=0.004,
         max_cell_volume_change_fraction=0.2,
+        vectorised=True,
     ):
         fix_unit_cell = False
         fix_orientation = False
@@ -209,6 +211,7 @@ def refine(
             LL_tolerance=LL_tolerance,
             mosaicity_max_limit=mosaicity_max_limit,
             max_cell_volume_change_fraction=max_cell_volume_change_fraction,
+            vectorised=vectorised,
         )
         return expts[0], refls, output_data
 
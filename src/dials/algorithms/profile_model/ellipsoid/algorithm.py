@@ -276,6 +276,7 @@ def refine_profile(
     wavelength_spread_model="delta",
     max_iter=1000,
     LL_tolerance=1e-6,
+    vectorised=True,
 ):
     """Do the profile refinement"""
     logger.info("\n" + "=" * 80 + "\nRefining profile parameters")
@@ -290,7 +291,9 @@ def refine_profile(
     )
 
     # Create the refiner and refine
-    refiner = ProfileRefiner(state, refiner_data, max_iter, LL_tolerance)
+    refiner = ProfileRefiner(
+        state, refiner_data, max_iter, LL_tolerance, vectorised=vectorised
+    )
     refiner.refine()
 
     # Set the profile parameters
@@ -311,6 +314,7 @@ def refine_crystal(
     max_iter=1009,
     LL_tolerance=1e-6,
     max_cell_volume_change_fraction=0.2,
+    vectorised=True,
 ):
     """Do the crystal refinement"""
     if (fix_unit_cell is True) and (fix_orientation is True):
@@ -330,7 +334,9 @@ def refine_crystal(
     )
 
     # Create the refiner and refine
-    refiner = ProfileRefiner(state, refiner_data, max_iter, LL_tolerance)
+    refiner = ProfileRefiner(
+        state, refiner_data, max_iter, LL_tolerance, vectorised=vectorised
+    )
     refiner.refine()
 
     end_cell_volume = refiner.state.crystal.get_unit_cell().volume()
@@ -416,6 +422,7 @@ def run_ellipsoid_refinement(
     LL_tolerance=1e-6,
     mosaicity_max_limit=0.004,
     max_cell_volume_change_fraction=0.2,
+    vectorised=True,
 ):
     """Runs ellipsoid refinement on strong spots.
 
@@ -449,6 +456,7 @@ def run_ellipsoid_refinement(
             wavelength_spread_model=wavelength_model,
             max_iter=max_iter,
             LL_tolerance=LL_tolerance,
+            vectorised=vectorised,
         )
         if capture_progress:
             # Save some data for plotting later.
@@ -467,6 +475,7 @@ def run_ellipsoid_refinement(
             max_iter=max_iter,
             LL_tolerance=LL_tolerance,
             max_cell_volume_change_fraction=max_cell_volume_change_fraction,
+            vectorised=vectorised,
         )
         if capture_progress:
             # Save some data for plotting later.
@@ -106,6 +106,13 @@
       .help = "Processing will be stopped for a given image if the fractional volume change is"
               "greater than this amount during a cycle of cell refinement."
 
+    vectorised = True
+      .type = bool
+      .help = "Compute the likelihood, score and Fisher information with array"
+              "operations over all reflections, rather than for each reflection"
+              "in turn."
+      .expert_level = 2
+
 }
 
 prediction {
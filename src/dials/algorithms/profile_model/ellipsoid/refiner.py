@@ -15,6 +15,7 @@
 from dials.algorithms.profile_model.ellipsoid import mosaicity_from_eigen_decomposition
 from dials.algorithms.profile_model.ellipsoid.model import (
     compute_change_of_basis_operation,
+    compute_change_of_basis_operations,
 )
 from dials.algorithms.profile_model.ellipsoid.parameterisation import (
     ReflectionModelState,
@@ -487,6 +488,281 @@ def fisher_information(self):
         return sum(d.fisher_information() for d in self.data)
 
 
+class VectorisedMaximumLikelihoodTarget(object):
+    """
+    The joint likelihood of all reflections, computed with array operations on
+    the stacked reflection data rather than by looping over a ReflectionLikelihood
+    for each reflection. The results are the same as for the
+    MaximumLikelihoodTarget.
+
+    Arrays are stored with the reflections along the first axis, and the
+    parameters along the last axis for derivatives.
+
+    """
+
+    def __init__(
+        self, model, s0, sp_list, h_list, ctot_list, mobs_list, sobs_list, panel_ids
+    ):
+        # Check input
+        assert len(h_list) == sp_list.shape[-1]
+        assert len(h_list) == ctot_list.shape[-1]
+        assert len(h_list) == mobs_list.shape[-1]
+        assert len(h_list) == sobs_list.shape[-1]
+
+        # Save the model and data
+        self.model = model
+        self.s0 = np.array(s0, dtype=np.float64).reshape(3)
+        self.norm_s0 = norm(self.s0)
+        self.h = flumpy.to_numpy(flex.miller_index(h_list).as_vec3_double())
+        self.ctot = np.array(ctot_list, dtype=np.float64)
+        self.mobs = np.transpose(mobs_list)  # n x 2
+        self.sobs = np.transpose(sobs_list, axes=(2, 0, 1))  # n x 2 x 2
+        self.panel_ids = panel_ids
+
+        # Compute the change of basis for each reflection (n x 3 x 3)
+        self.R = compute_change_of_basis_operations(self.s0, sp_list)
+        self.R_cctbx = [matrix.sqr(flex.double(R.flatten().tolist())) for R in self.R]
+
+        # The number of parameters
+        n_params = 0
+        if not model.is_orientation_fixed:
+            n_params += len(model.U_params)
+        if not model.is_unit_cell_fixed:
+            n_params += len(model.B_params)
+        if not model.is_mosaic_spread_fixed:
+            n_params += len(model.M_params)
+        if not model.is_wavelength_spread_fixed:
+            n_params += len(model.L_params)
+        self._dr_dp = np.zeros(shape=(len(self.h), 3, n_params), dtype=np.float64)
+        self._dS_dp = np.zeros(shape=(len(self.h), 3, 3, n_params), dtype=np.float64)
+
+        self._r = None
+        self._Q = None
+        self.mu = None
+        self.S = None
+        self._update_model()
+        self.update()
+
+    def _update_model(self):
+        """
+        Compute the reciprocal lattice vectors, the mosaicity covariance matrices
+        and their derivatives for all reflections, in the same way as for each
+        ReflectionModelState
+
+        """
+        state = self.model
+        UB_fixed = state.is_orientation_fixed and state.is_unit_cell_fixed
+        U = state.U_matrix
+        B = state.B_matrix
+        if self._r is None or not UB_fixed:
+            self._r = self.h @ np.matmul(U, B).T
+
+        # The rotation to the frame of the angular mosaicity (n x 3 x 3)
+        if state.is_mosaic_spread_angular and (self._Q is None or not UB_fixed):
+            norm_r = self._r / norm(self._r, axis=1)[:, np.newaxis]
+            q1 = np.cross(norm_r, self.s0 / self.norm_s0)
+            q1 /= norm(q1, axis=1)[:, np.newaxis]
+            q2 = np.cross(norm_r, q1)
+            q2 /= norm(q2, axis=1)[:, np.newaxis]
+            self._Q = np.stack([q1, q2, norm_r], axis=1)
+
+        # The covariance matrix (3 x 3, or n x 3 x 3 for angular mosaicity)
+        MS = state._M_parameterisation.sigma()
+        if state.is_mosaic_spread_angular:
+            MA = state._M_parameterisation.sigma_A()
+            A = np.zeros((len(self._r), 3, 3), dtype=np.float64)
+            A[:, 0, 0] = A[:, 1, 1] = np.sum(self._r**2, axis=1)
+            self._A = A
+            self._sigma = np.einsum("nji,njk,kl,nlm->nim", self._Q, A, MA, self._Q) + MS
+        else:
+            self._sigma = MS
+
+        # Compute derivatives w.r.t U and B parameters
+        n_tot = 0
+        if not state.is_orientation_fixed:
+            dU_dp = state.dU_dp
+            n_U_params = dU_dp.shape[0]
+            self._dr_dp[:, :, n_tot : n_tot + n_U_params] = np.einsum(
+                "lij,jk,nk->nil", dU_dp, B, self.h
+            )
+            n_tot += n_U_params
+        if not state.is_unit_cell_fixed:
+            dB_dp = state.dB_dp
+            n_B_params = dB_dp.shape[0]
+            self._dr_dp[:, :, n_tot : n_tot + n_B_params] = np.einsum(
+                "ij,ljk,nk->nil", U, dB_dp, self.h
+            )
+            n_tot += n_B_params
+
+        # Compute derivatives w.r.t M parameters
+        if not state.is_mosaic_spread_fixed:
+            dM_dp = state.dM_dp
+            n_M_params = dM_dp.shape[0]
+            self._dS_dp[:, :, :, n_tot : n_tot + n_M_params] = np.transpose(
+                dM_dp, axes=(1, 2, 0)
+            )
+            n_tot += n_M_params
+            if state.is_mosaic_spread_angular:
+                dM_dp_A = state.dM_dp_A
+                n_M_A_params = dM_dp_A.shape[0]
+                self._dS_dp[:, :, :, n_tot : n_tot + n_M_A_params] = np.einsum(
+                    "nji,njk,mkl,nlp->nipm", self._Q, self._A, dM_dp_A, self._Q
+                )
+
+    def update(self):
+        """
+        Update the model quantities and the conditional distributions of all
+        reflections for the current model state
+
+        """
+        state = self.model
+        UB_fixed = state.is_orientation_fixed and state.is_unit_cell_fixed
+        if not (UB_fixed and state.is_mosaic_spread_fixed):
+            self._update_model()
+        R = self.R
+
+        # Rotate the mean vectors, covariance matrices and derivatives
+        if self.mu is None or not UB_fixed:
+            self.mu = np.einsum("nij,nj->ni", R, self.s0 + self._r)
+            self.dmu = np.einsum("nij,njp->nip", R, self._dr_dp)
+        if self.S is None or not state.is_mosaic_spread_fixed:
+            if self._sigma.ndim == 2:
+                self.S = np.einsum("nij,jk,nlk->nil", R, self._sigma, R)
+            else:
+                self.S = np.einsum("nij,njk,nlk->nil", R, self._sigma, R)
+            self.dS = np.einsum("nij,njkp,nlk->nilp", R, self._dS_dp, R)
+
+        # Partition the covariance matrices and mean vectors
+        S, dS, dmu = self.S, self.dS, self.dmu
+        S11 = S[:, 0:2, 0:2]
+        S12 = S[:, 0:2, 2]
+        S21 = S[:, 2, 0:2]
+        self.S22 = S22 = S[:, 2, 2]
+        dS12 = dS[:, 0:2, 2, :]
+        dS21 = dS[:, 2, 0:2, :]
+        self.dS22 = dS22 = dS[:, 2, 2, :]
+        S22_inv = 1 / S22
+
+        # The conditional mean and covariance
+        self.epsilon = epsilon = self.norm_s0 - self.mu[:, 2]
+        self.mubar = self.mu[:, 0:2] + S12 * (S22_inv * epsilon)[:, np.newaxis]
+        self.Sbar = S11 - np.einsum("ni,nj->nij", S12 * S22_inv[:, np.newaxis], S21)
+        self.Sbar_inv = inv(self.Sbar)
+
+        # The derivatives of the conditional covariance (n x 2 x 2 x p)
+        self.dSbar = (
+            dS[:, 0:2, 0:2, :]
+            + np.einsum("ni,np,nj->nijp", S12 * (S22_inv**2)[:, np.newaxis], dS22, S21)
+            - np.einsum("ni,njp->nijp", S12 * S22_inv[:, np.newaxis], dS21)
+            - np.einsum("nip,nj->nijp", dS12 * S22_inv[:, np.newaxis, np.newaxis], S21)
+        )
+
+        # The derivatives of the conditional mean (n x 2 x p)
+        A = (S12 * S22_inv[:, np.newaxis])[:, :, np.newaxis]
+        w = (S22_inv * epsilon)[:, np.newaxis, np.newaxis]
+        dep = -dmu[:, np.newaxis, 2, :]
+        self.dmbar = (
+            dmu[:, 0:2, :] + dS12 * w - A * dS22[:, np.newaxis, :] * w + A * dep
+        )
+
+    def mse(self):
+        """
+        The MSE in local reflection coordinates
+
+        """
+        return np.sum((self.mobs - self.mubar) ** 2) / len(self.mobs)
+
+    def rmsd(self):
+        """
+        The RMSD in pixels
+
+        """
+        mse_x = 0.0
+        mse_y = 0.0
+        detector = self.model.experiment.detector
+        for R, mbar, xobs in zip(self.R_cctbx, self.mubar, self.mobs):
+            rse_i = rse(R, tuple(mbar), tuple(xobs), self.norm_s0, detector)
+            mse_x += rse_i[0]
+            mse_y += rse_i[1]
+        mse_x /= len(self.mobs)
+        mse_y /= len(self.mobs)
+        return np.sqrt(np.array([mse_x, mse_y]))
+
+    def log_likelihoods(self):
+        """
+        The log likelihood of each reflection
+
+        """
+        m_d = self.epsilon
+        m_lnL = self.ctot * (np.log(self.S22) + m_d**2 / self.S22)
+        c_d = self.mobs - self.mubar
+        V = self.sobs + np.einsum("ni,nj->nij", c_d, c_d)
+        c_lnL = self.ctot * (
+            np.log(det(self.Sbar)) + np.einsum("nij,nji->n", self.Sbar_inv, V)
+        )
+        return -0.5 * (m_lnL + c_lnL)
+
+    def log_likelihood(self):
+        """
+        The joint log likelihood
+
+        """
+        return np.sum(self.log_likelihoods())
+
+    def _first_derivatives(self):
+        """
+        The first derivatives of the log likelihood of each reflection (n x p)
+
+        """
+        S22_inv = (1 / self.S22)[:, np.newaxis]
+        epsilon = self.epsilon[:, np.newaxis]
+        ctot = self.ctot[:, np.newaxis]
+        c_d = self.mobs - self.mubar
+
+        V1 = self.sobs + np.einsum("ni,nj->nij", c_d, c_d)
+        V2 = np.identity(2) - np.matmul(self.Sbar_inv, V1)
+        V = ctot * np.einsum("nij,njkp,nki->np", self.Sbar_inv, self.dSbar, V2)
+        dep = -self.dmu[:, 2, :]
+        U = ctot * (
+            S22_inv * self.dS22 * (1.0 - S22_inv * epsilon**2)
+            + 2 * S22_inv * epsilon * dep
+        )
+        W = -2.0 * ctot * np.einsum("nij,nj,nip->np", self.Sbar_inv, c_d, self.dmbar)
+        return -0.5 * (U + V + W)
+
+    def jacobian(self):
+        """
+        Return the Jacobian
+
+        """
+        return flumpy.from_numpy(np.ascontiguousarray(self._first_derivatives()))
+
+    def first_derivatives(self):
+        """
+        The joint first derivatives
+
+        """
+        return np.sum(self._first_derivatives(), axis=0)
+
+    def fisher_information(self):
+        """
+        The joint fisher information
+
+        """
+        S22_inv = 1 / self.S22
+        ctot = self.ctot
+        A = np.einsum("nij,njkp->nikp", self.Sbar_inv, self.dSbar)
+        V = np.einsum("n,nijq,njip->qp", ctot, A, A)
+        W = 2 * np.einsum(
+            "n,niq,nij,njp->qp", ctot, self.dmbar, self.Sbar_inv, self.dmbar
+        )
+        U = np.einsum("n,nq,np->qp", ctot * S22_inv**2, self.dS22, self.dS22)
+        dmu2 = self.dmu[:, 2, :]
+        X = 2 * np.einsum("n,nq,np->qp", ctot * S22_inv, dmu2, dmu2)
+        I = 0.5 * (V + W) + 0.5 * (U + X)
+        return flumpy.from_numpy(np.ascontiguousarray(I))
+
+
 def line_search(func, x, p, tau=0.5, delta=1.0, tolerance=1e-7):
     """
     Perform a line search
@@ -680,10 +956,15 @@ def __init__(
         max_iter=1000,
         tolerance=1e-7,
         LL_tolerance=1e-6,
+        vectorised=True,
     ):
         """
         Initialise the algorithm:
 
+        :param vectorised: Compute the likelihood and its derivatives with array
+                           operations over all reflections, rather than for each
+                           reflection in turn
+
         """
         # Initialise the super class
         super(FisherScoringMaximumLikelihood, self).__init__(
@@ -708,7 +989,11 @@ def __init__(
         # Store the parameter history
         self.history = []
 
-        self._ml_target = MaximumLikelihoodTarget(
+        if vectorised:
+            target = VectorisedMaximumLikelihoodTarget
+        else:
+            target = MaximumLikelihoodTarget
+        self._ml_target = target(
             self.model,
             self.s0,
             self.sp_list,
@@ -900,7 +1185,7 @@ class Refiner(object):
 
     """
 
-    def __init__(self, state, data, max_iter=1000, LL_tolerance=1e-6):
+    def __init__(self, state, data, max_iter=1000, LL_tolerance=1e-6, vectorised=True):
         """
         Set the data and initial parameters
 
@@ -916,6 +1201,7 @@ def __init__(self, state, data, max_iter=1000, LL_tolerance=1e-6):
         self.history = []
         self.max_iter = max_iter
         self.LL_tolerance = LL_tolerance
+        self.vectorised = vectorised
 
     def refine(self):
         """
@@ -951,6 +1237,7 @@ def refine_fisher_scoring(self):
             self.panel_ids,
             max_iter=self.max_iter,
             LL_tolerance=self.LL_tolerance,
+            vectorised=self.vectorised,
         )
 
         # Solve the maximum likelihood equations
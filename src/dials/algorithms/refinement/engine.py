@@ -4,10 +4,13 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import copy
 import json
 import logging
+import multiprocessing
 from io import StringIO
+from itertools import repeat
 from typing import List, Union
 
 import libtbx
@@ -23,6 +26,10 @@
 
 logger = logging.getLogger(__name__)
 
+# The refinery of a forked worker process, with the parameter values for which
+# its reflections were last predicted and the resulting blocks of matches
+_worker_state = {}
+
 
 # termination reason strings
 TARGET_ACHIEVED = "RMSD target achieved"
@@ -652,6 +659,41 @@ def compute_functional_gradients_diag(self):
         return self._f, self._g, diags
 
 
+def _initialise_worker(refinery):
+    _worker_state["refinery"] = refinery
+    _worker_state["x"] = None
+
+
+def _build_up_block(x, iblock):
+    """Calculate the normal equations for one block of the matches in a worker
+    process. The reflections are predicted (and the matches split into blocks)
+    only when the parameter values differ from those of the previous call."""
+    refinery = _worker_state["refinery"]
+    if _worker_state["x"] != tuple(x):
+        refinery.x = x
+        refinery.prepare_for_step()
+        _worker_state["blocks"] = refinery._target.split_matches_into_blocks(
+            nproc=refinery._nproc
+        )
+        _worker_state["x"] = tuple(x)
+    block = _worker_state["blocks"][iblock]
+
+    residuals, jacobian, weights = refinery._target.compute_residuals_and_gradients(
+        block
+    )
+    if refinery._constr_manager is not None:
+        jacobian = refinery._constr_manager.constrain_jacobian(jacobian)
+    ls = normal_eqns.non_linear_ls(n_parameters=len(x))
+    ls.add_equations(residuals, jacobian, weights)
+    step_equations = ls.step_equations()
+    return (
+        residuals,
+        weights,
+        step_equations.normal_matrix_packed_u(),
+        step_equations.right_hand_side(),
+    )
+
+
 class AdaptLstbx(Refinery, normal_eqns.non_linear_ls, normal_eqns.non_linear_ls_mixin):
     """Adapt Refinery for lstbx"""
 
@@ -680,8 +722,37 @@ def __init__(
         # keep attribute for the Cholesky factor required for ESD calculation
         self.cf = None
 
+        # pool of worker processes for building the normal equations, which
+        # persists for the duration of a run if nproc > 1
+        self._worker_pool = None
+
         normal_eqns.non_linear_ls.__init__(self, n_parameters=len(self.x))
 
+    def start_workers(self):
+        """Start a pool of forked worker processes, which keep a copy of the
+        target and parameterisation for the calculation of the normal equations
+        in parallel, if nproc > 1 and forking is supported. For each build_up
+        only the parameter vector is sent to the workers, which return the
+        residuals and the normal matrix and right hand side for their blocks of
+        the matches, rather than the Jacobian."""
+        if (
+            self._nproc > 1
+            and self._worker_pool is None
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            self._worker_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._nproc,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_initialise_worker,
+                initargs=(self,),
+            )
+
+    def stop_workers(self):
+        """Shut down the pool of worker processes, if started"""
+        if self._worker_pool is not None:
+            self._worker_pool.shutdown()
+            self._worker_pool = None
+
     def restart(self):
         self.x = self.x_0.deep_copy()
         self.old_x = None
@@ -710,7 +781,23 @@ def build_up(self, objective_only=False):
         else:
             blocks = self._target.split_matches_into_blocks(nproc=self._nproc)
 
-            if self._nproc > 1:
+            if self._nproc > 1 and self._worker_pool is not None:
+                # ensure the jacobian is not tracked
+                self._jacobian = None
+
+                # reduce the normal equations of each block, accumulating
+                # them in place
+                step_equations = self.step_equations()
+                normal_matrix = step_equations.normal_matrix_packed_u()
+                right_hand_side = step_equations.right_hand_side()
+                for residuals, weights, a, b in self._worker_pool.map(
+                    _build_up_block, repeat(self.x), range(len(blocks))
+                ):
+                    self.add_residuals(residuals, weights)
+                    normal_matrix += a
+                    right_hand_side += b
+
+            elif self._nproc > 1:
                 # ensure the jacobian is not tracked
                 self._jacobian = None
 
@@ -864,6 +951,13 @@ def __init__(
         libtbx.adopt_optional_init_args(self, kwds)
 
     def run(self):
+        self.start_workers()
+        try:
+            self._run_iterations()
+        finally:
+            self.stop_workers()
+
+    def _run_iterations(self):
         self.n_iterations = 0
 
         # prepare for first step
@@ -1082,5 +1176,9 @@ def _run_core(self):
         self.calculate_esds()
 
     def run(self):
-        self._run_core()
+        self.start_workers()
+        try:
+            self._run_core()
+        finally:
+            self.stop_workers()
         self.calculate_esds()
@@ -5,6 +5,7 @@
 from scitbx import matrix, sparse
 
 from dials.algorithms.refinement import DialsRefineConfigError
+from dials.algorithms.refinement.refinement_helpers import experiment_selections
 from dials.array_family import flex
 
 """The PredictionParameterisation class ties together parameterisations for
@@ -322,26 +323,12 @@ def get_gradients(self, reflections, callback=None):
         self._setting_rotation = flex.mat3_double(self._nref)
 
         # Set up experiment to index mapping
-        self._experiment_to_idx = []
+        self._experiment_to_idx = experiment_selections(
+            reflections, len(self._experiments)
+        )
 
         # Populate values in these arrays
-        for iexp, exp in enumerate(self._experiments):
-            sel = reflections["id"] == iexp
-            isel = sel.iselection()
-            self._experiment_to_idx.append(isel)
-            subref = reflections.select(sel)
-            states = self._get_model_data_for_experiment(exp, subref)
-
-            self._D.set_selected(sel, states["D"])
-            self._s0.set_selected(sel, states["s0"])
-            self._U.set_selected(sel, states["U"])
-            self._B.set_selected(sel, states["B"])
-            if exp.goniometer:
-                self._setting_rotation.set_selected(sel, states["S"])
-                self._axis.set_selected(sel, exp.goniometer.get_rotation_axis_datum())
-                self._fixed_rotation.set_selected(
-                    sel, exp.goniometer.get_fixed_rotation()
-                )
+        self._set_model_data(reflections)
 
         # Other derived values
         self._h = reflections["miller_index"].as_vec3_double()
@@ -401,6 +388,26 @@ def _extend_gradient_vectors(results, m, n, keys=("dX_dp", "dY_dp", "dZ_dp")):
 
         return results
 
+    def _set_model_data(self, reflections):
+        """Populate the arrays of model states for each reflection, one experiment
+        at a time"""
+
+        for iexp, exp in enumerate(self._experiments):
+            isel = self._experiment_to_idx[iexp]
+            subref = reflections.select(isel)
+            states = self._get_model_data_for_experiment(exp, subref)
+
+            self._D.set_selected(isel, states["D"])
+            self._s0.set_selected(isel, states["s0"])
+            self._U.set_selected(isel, states["U"])
+            self._B.set_selected(isel, states["B"])
+            if exp.goniometer:
+                self._setting_rotation.set_selected(isel, states["S"])
+                self._axis.set_selected(isel, exp.goniometer.get_rotation_axis_datum())
+                self._fixed_rotation.set_selected(
+                    isel, exp.goniometer.get_fixed_rotation()
+                )
+
     def _get_model_data_for_experiment(self, experiment, reflections):
         """Helper function to return model data s0, U, B, D and S for a particular
         experiment. D is always returned as an array the same length as the
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
+import numpy as np
+
+from dxtbx import flumpy
+
 from dials.algorithms.refinement.parameterisation.prediction_parameters import (
     PredictionParameterisation,
     SparseGradientVectorMixin,
 )
+from dials.algorithms.refinement.prediction.managed_predictors import (
+    StillsExperimentStates,
+)
 from dials.array_family import flex
 from dials_refinement_helpers_ext import dRq_de
 
 
+def _select_mat3(matrices, indices):
+    """Look up a stack of matrices, given as an (m, 3, 3) numpy array, by the
+    indices of each reflection, returning a flex.mat3_double"""
+    matrices = flex.mat3_double([tuple(m) for m in matrices.reshape(-1, 9).tolist()])
+    return matrices.select(flumpy.from_numpy(indices.astype(np.uint64)))
+
+
 class StillsPredictionParameterisation(PredictionParameterisation):
     """Concrete class that inherits functionality of the
     PredictionParameterisation parent class and provides a detector space
@@ -23,6 +37,26 @@ def __init__(self, *args, **kwargs):
         assert not self._goniometer_parameterisations
         return
 
+    def _set_model_data(self, reflections):
+        """Populate the arrays of model states for each reflection for all of the
+        experiments at once, by looking up the states in the same stacked layout
+        as used by the StillsExperimentsPredictor"""
+
+        states = StillsExperimentStates(self._experiments)
+        ids = flumpy.to_numpy(reflections["id"]).astype(np.int64)
+        panels = flumpy.to_numpy(reflections["panel"]).astype(np.int64)
+        panel_index = states.panel_index(ids, panels)
+        if panel_index is None:
+            return super()._set_model_data(reflections)
+
+        self._D = _select_mat3(states.D, panel_index)
+        self._U = _select_mat3(states.U, ids)
+        self._B = _select_mat3(states.B, ids)
+        if "s0" in reflections:
+            self._s0 = reflections["s0"]
+        else:
+            self._s0 = flumpy.vec_from_numpy(states.s0[ids])
+
     def _local_setup(self, reflections):
         """Setup additional attributes used in gradients calculation. These are
         specific to the stills-type prediction parameterisations that rotates the
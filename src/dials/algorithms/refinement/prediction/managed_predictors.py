@@ -4,13 +4,19 @@
   up to date with the current model geometry
 * StillsRayPredictor predicts reflections without a goniometer, under
   the naive assumption that the relp is already in reflecting position
+* StillsExperimentStates stacks the model states of many stills experiments,
+  so that StillsExperimentsPredictor can predict the reflections of all of the
+  experiments in one vectorised calculation
 """
 
 from __future__ import annotations
 
 from math import pi
 
-from dxtbx.model import tof_helpers
+import numpy as np
+
+from dxtbx import flumpy
+from dxtbx.model import SimplePxMmStrategy, tof_helpers
 from scitbx.array_family import flex
 
 from dials.algorithms.spot_prediction import (
@@ -157,9 +163,175 @@ def _match_full_turns(self, reflections):
         return reflections
 
 
+class StillsExperimentStates:
+    """
+    The model states of a list of stills experiments, stacked into arrays
+    indexed by experiment, so that the states for each reflection can be looked
+    up by experiment id in a single operation. Detectors shared between
+    experiments are stored once, with the panels of all of the distinct
+    detectors stacked into arrays indexed by panel_index().
+    """
+
+    def __init__(self, experiments):
+        self.U = np.array([e.crystal.get_U() for e in experiments]).reshape(-1, 3, 3)
+        self.B = np.array([e.crystal.get_B() for e in experiments]).reshape(-1, 3, 3)
+        self.s0 = np.array([e.beam.get_s0() for e in experiments]).reshape(-1, 3)
+
+        # Keep references to the detectors, so that their ids are not reused
+        detectors = []
+        first_panel = {}
+        self.panels = []
+        self.panel_offset = np.zeros(len(experiments), dtype=np.int64)
+        self.n_panels = np.zeros(len(experiments), dtype=np.int64)
+        for iexp, e in enumerate(experiments):
+            detector = e.detector
+            if id(detector) not in first_panel:
+                detectors.append(detector)
+                first_panel[id(detector)] = len(self.panels)
+                self.panels.extend(detector)
+            self.panel_offset[iexp] = first_panel[id(detector)]
+            self.n_panels[iexp] = len(detector)
+        self._detectors = detectors
+        self.D = np.array([p.get_D_matrix() for p in self.panels]).reshape(-1, 3, 3)
+
+    def __len__(self):
+        return len(self.s0)
+
+    def panel_index(self, ids, panels):
+        """
+        The index into the stacked panels of each reflection.
+
+        :param ids: A numpy array of the experiment id of each reflection
+        :param panels: A numpy array of the panel of each reflection
+        :returns: The indices, or None if any of the reflections do not belong to
+                  an experiment and panel
+        """
+        if len(ids) and (ids.min() < 0 or ids.max() >= len(self)):
+            return None
+        if np.any(panels >= self.n_panels[ids]):
+            return None
+        return self.panel_offset[ids] + panels
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v, axis=1)[:, np.newaxis]
+
+
+def predict_stills_rays(h, UB, s0, spherical_relp=False):
+    """
+    Predict the rays for stills, as StillsRayPredictor (or, if spherical_relp is
+    set, SphericalRelpStillsRayPredictor) does for a single reflection.
+
+    :param h: The Miller indices, as an (n, 3) array
+    :param UB: The setting matrices, as an (n, 3, 3) array
+    :param s0: The beam vectors, as an (n, 3) array
+    :param spherical_relp: Use the spherical relp model
+    :returns: The s1 vectors and the DeltaPsi angles, or None if the rays could
+              not be predicted for all of the reflections
+    """
+    q = np.einsum("nij,nj->ni", UB, h)
+    s0_length = np.linalg.norm(s0, axis=1)
+    unit_s0 = s0 / s0_length[:, np.newaxis]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        e1 = _normalize(np.cross(q, unit_s0))
+        c0 = _normalize(np.cross(unit_s0, e1))
+
+        qq = np.einsum("ni,ni->n", q, q)
+        a = 0.5 * qq / s0_length
+        tmp = qq - a * a
+        b = np.sqrt(tmp)
+        r = -a[:, np.newaxis] * unit_s0 + b[:, np.newaxis] * c0
+
+        q0 = _normalize(q)
+        q1 = _normalize(np.cross(q0, e1))
+        delpsi = -np.arctan2(np.einsum("ni,ni->n", r, q1), np.einsum("ni,ni->n", r, q0))
+
+        s1 = s0 + q if spherical_relp else s0 + r
+        s1 = _normalize(s1) * s0_length[:, np.newaxis]
+
+    if not (np.all(qq > 0) and np.all(tmp > 0) and np.all(np.isfinite(s1))):
+        return None
+    return s1, delpsi
+
+
+def intersect_panels(states, panel_index, s1):
+    """
+    Intersect rays with the panels of the stacked experiment states.
+
+    :param states: The StillsExperimentStates
+    :param panel_index: The index into the stacked panels of each ray
+    :param s1: The ray vectors, as an (n, 3) array
+    :returns: The intersections in mm and in pixels, as (n, 2) arrays, or None
+              if any of the rays do not intersect the plane of their panel
+    """
+    v = np.einsum("nij,nj->ni", states.D[panel_index], s1)
+    if not np.all(v[:, 2] > 0):
+        return None
+    mm = v[:, :2] / v[:, 2:]
+
+    px = np.empty_like(mm)
+    order = np.argsort(panel_index, kind="stable")
+    bounds = np.searchsorted(panel_index[order], np.arange(len(states.panels) + 1))
+    for panel, start, end in zip(states.panels, bounds[:-1], bounds[1:]):
+        isel = order[start:end]
+        if not len(isel):
+            continue
+        if isinstance(panel.get_px_mm_strategy(), SimplePxMmStrategy):
+            px[isel] = mm[isel] / panel.get_pixel_size()
+        else:
+            # e.g. parallax correction, which must be done for each reflection
+            px[isel] = [panel.millimeter_to_pixel(tuple(xy)) for xy in mm[isel]]
+    return mm, px
+
+
 class StillsExperimentsPredictor(ExperimentsPredictor):
     spherical_relp_model = False
 
+    def __call__(self, reflections):
+        """Predict for all reflections at the current model geometry, for all of
+        the experiments in one batch where possible"""
+
+        if not self._predict_batch(reflections):
+            reflections = super().__call__(reflections)
+        return reflections
+
+    def _predict_batch(self, reflections):
+        """Predict the reflections of all of the experiments at once, from the
+        stacked experiment states. Returns False if this is not possible, in which
+        case the reflections are not modified."""
+
+        if len(reflections) == 0:
+            return False
+        states = StillsExperimentStates(self._experiments)
+        ids = flumpy.to_numpy(reflections["id"]).astype(np.int64)
+        panels = flumpy.to_numpy(reflections["panel"]).astype(np.int64)
+        panel_index = states.panel_index(ids, panels)
+        if panel_index is None:
+            return False
+
+        h = flumpy.to_numpy(reflections["miller_index"].as_vec3_double())
+        UB = np.matmul(states.U, states.B)[ids]
+        rays = predict_stills_rays(h, UB, states.s0[ids], self.spherical_relp_model)
+        if rays is None:
+            return False
+        s1, delpsi = rays
+        intersections = intersect_panels(states, panel_index, s1)
+        if intersections is None:
+            return False
+        mm, px = intersections
+
+        zeros = np.zeros((len(reflections), 1))
+        reflections["s1"] = flumpy.vec_from_numpy(s1)
+        reflections["xyzcal.mm"] = flumpy.vec_from_numpy(np.hstack((mm, zeros)))
+        reflections["xyzcal.px"] = flumpy.vec_from_numpy(np.hstack((px, zeros)))
+        reflections["delpsical.rad"] = flumpy.from_numpy(delpsi)
+        if "flags" not in reflections:
+            reflections["flags"] = flex.size_t(len(reflections), 0)
+        reflections.set_flags(
+            flex.bool(len(reflections), True), reflections.flags.predicted
+        )
+        return True
+
     def _predict_one_experiment(self, experiment, reflections):
         predictor = st(experiment, spherical_relp=self.spherical_relp_model)
         UB = experiment.crystal.get_A()
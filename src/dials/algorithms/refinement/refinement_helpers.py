@@ -6,7 +6,10 @@
 import math
 import random
 
+import numpy as np
+
 import scitbx.matrix
+from dxtbx import flumpy
 from scitbx.array_family import flex
 
 from dials_refinement_helpers_ext import CrystalOrientationCompose as xloc_cpp
@@ -263,6 +266,20 @@ def string_sel(l, full_names, prefix=""):
     return sel
 
 
+def experiment_selections(reflections, n_experiments):
+    """Return the indices of the reflections of each experiment, as a list of
+    flex.size_t selections, in a single pass over the reflection ids rather than
+    a pass for each experiment"""
+
+    ids = flumpy.to_numpy(reflections["id"])
+    order = np.argsort(ids, kind="stable").astype(np.uint64)
+    bounds = np.searchsorted(ids[order], np.arange(n_experiments + 1))
+    return [
+        flumpy.from_numpy(order[start:end].copy())
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
 def calculate_frame_numbers(reflections, experiments):
     """calculate observed frame numbers for all reflections, if not already
     set"""
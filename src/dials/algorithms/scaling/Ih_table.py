@@ -202,6 +202,10 @@ def set_inverse_scale_factors(self, new_scales: np.array, block_id: int) -> None
         """Set the inverse scale factors for a given block."""
         self.Ih_table_blocks[block_id].inverse_scale_factors = new_scales
 
+    def set_Ih_values(self, new_Ih_values: np.array, block_id: int) -> None:
+        """Set the Ih values for a given block."""
+        self.Ih_table_blocks[block_id].Ih_values = new_Ih_values
+
     def calc_Ih(self, block_id: int = None) -> None:
         """Calculate the latest value of Ih, for a given block or for all blocks."""
         if block_id is not None:
@@ -210,6 +214,38 @@ def calc_Ih(self, block_id: int = None) -> None:
             for block in self.Ih_table_blocks:
                 block.calc_Ih()
 
+    def remove_datasets(self, n_list: List[int]) -> None:
+        """
+        Remove the data of some datasets from all blocks, in place.
+
+        The remaining datasets are renumbered in order, as if the Ih_table had
+        been created without the removed datasets, and Ih is recalculated.
+        """
+        assert not self.free_Ih_table, "Can't remove datasets with a free set block"
+        keep = [i for i in range(self.n_datasets) if i not in set(n_list)]
+        new_dataset_ids = np.zeros(self.n_datasets, dtype=np.uint64)
+        new_dataset_ids[keep] = np.arange(len(keep), dtype=np.uint64)
+        for j, block in enumerate(self.Ih_table_blocks):
+            dataset_ids = block.Ih_table["dataset_id"].to_numpy()
+            new_block = block.select(np.isin(dataset_ids, n_list, invert=True))
+            new_block.Ih_table["dataset_id"] = new_dataset_ids[
+                new_block.Ih_table["dataset_id"].to_numpy()
+            ]
+            new_block.n_datasets = len(keep)
+            new_block.block_selections = [new_block.block_selections[i] for i in keep]
+            # The rows of the selected block are renumbered, so the rows of each
+            # dataset start after those of the datasets kept before it
+            new_block.dataset_info = {}
+            offset = 0
+            for i, block_selection in enumerate(new_block.block_selections):
+                new_block.dataset_info[i] = {"start_index": offset}
+                offset += len(block_selection)
+                new_block.dataset_info[i]["end_index"] = offset
+            self.Ih_table_blocks[j] = new_block
+        self.n_datasets = len(keep)
+        self.generate_block_selections()
+        self.calc_Ih()
+
     def _determine_required_block_structures(
         self,
         reflection_tables: List[flex.reflection_table],
@@ -680,6 +716,16 @@ def calc_nh(self) -> np.array:
         This is a vector of length n_refl."""
         return self.sum_in_groups(np.full(self.size, 1.0), output="per_refl")
 
+    def group_indices(self) -> np.array:
+        """Return the index of the group to which each reflection belongs.
+
+        This is a vector of length n_refl, indexing the columns of the
+        h_index_matrix."""
+        coo = self._csc_h_index_matrix.tocoo()
+        group_indices = np.empty(self.size, dtype=np.int64)
+        group_indices[coo.row] = coo.col
+        return group_indices
+
     def match_Ih_values_to_target(self, target_Ih_table: IhTable) -> None:
         """
         Use an Ih_table as a target to set Ih values in this table.
@@ -757,6 +803,11 @@ def Ih_values(self) -> np.array:
         """The bset-estimated intensities of symmetry equivalent reflections."""
         return self.Ih_table["Ih_values"].to_numpy()
 
+    @Ih_values.setter
+    def Ih_values(self, new_Ih_values: np.array) -> None:
+        assert new_Ih_values.size == self.size
+        self.Ih_table.loc[:, "Ih_values"] = new_Ih_values
+
     @property
     def weights(self) -> np.array:
         """The weights that will be used in scaling."""
@@ -399,6 +399,7 @@ def run(self):
         with ScalingHTMLContextManager(self):
             start_time = time.time()
             results = AnalysisResults()
+            script = None
 
             for counter in range(1, self.params.filtering.deltacchalf.max_cycles + 1):
                 self.run_scaling_cycle()
@@ -419,6 +420,7 @@ def run(self):
                     self.params.filtering.deltacchalf.group_size
                 )
                 delta_cc_params.stdcutoff = self.params.filtering.deltacchalf.stdcutoff
+                delta_cc_params.nproc = self.params.scaling_options.nproc
                 logger.info("\nPerforming a round of filtering.\n")
 
                 # need to reduce to single table.
@@ -426,8 +428,9 @@ def run(self):
                 for table in self.reflections:
                     joined_reflections.extend(table)
 
+                # update the statistics of the previous cycle where possible
                 script = deltaccscript(
-                    delta_cc_params, self.experiments, joined_reflections
+                    delta_cc_params, self.experiments, joined_reflections, script
                 )
                 script.run()
 
@@ -496,8 +499,8 @@ def run(self):
                     results.finish(termination_reason="max_cycles")
                     break
 
-                # If not finished then need to create new scaler to try again
-                self._create_model_and_scaler()
+                # If not finished then need to prepare the scaler to try again
+                self._prepare_next_cycle(latest_results)
             self.filtering_results = results
             # Print summary of results
             logger.info(results)
@@ -507,6 +510,60 @@ def run(self):
             logger.info("\nTotal time taken: %.4fs ", time.time() - start_time)
             logger.info("%s%s%s", "\n", "=" * 80, "\n")
 
+    def _can_reuse_scaler(self, removed_identifiers):
+        """
+        Check whether the scaler of the last cycle can be used for the next.
+
+        This is the case if only whole datasets were removed by filtering, and
+        the reflections suitable for scaling in the remaining datasets have not
+        changed (e.g. by excluding reflections with very small scales).
+        """
+        if not (
+            self.params.filtering.deltacchalf.warm_start
+            and self.params.filtering.deltacchalf.mode == "dataset"
+            and self.scaler.id_ == "multi"
+            and self.params.reflection_selection.method != "intensity_ranges"
+        ):
+            return False
+        scalers = [
+            s
+            for s in self.scaler.active_scalers
+            if s.experiment.identifier not in removed_identifiers
+        ]
+        if [s.experiment.identifier for s in scalers] != list(
+            self.experiments.identifiers()
+        ):
+            return False
+        return all(
+            (
+                s.suitable_refl_for_scaling_sel
+                == s._get_suitable_for_scaling_sel(s.reflection_table)
+            ).all_eq(True)
+            for s in scalers
+        )
+
+    def _prepare_next_cycle(self, cycle_results):
+        """
+        Prepare the scaler for the next cycle of scaling and filtering.
+
+        Where possible, the filtered datasets are removed from the existing
+        scaler and its Ih tables, so that the scaler does not have to be created
+        again and minimisation starts from the current model parameters.
+        Otherwise, the models and scaler are created from the filtered data.
+        """
+        removed_identifiers = set(cycle_results["removed_datasets"])
+        if not self._can_reuse_scaler(removed_identifiers):
+            self._create_model_and_scaler()
+            return
+        st = time.time()
+        self.scaler.prepare_for_rescaling(removed_identifiers)
+        self.reflections = [s.reflection_table for s in self.scaler.active_scalers]
+        logger.info(
+            "Reused the scaler of the previous cycle, removing %s datasets (%.2fs)",
+            len(removed_identifiers),
+            time.time() - st,
+        )
+
     def run_scaling_cycle(self):
         """Do a round of scaling for scaling and filtering."""
         # Turn off the full matrix round, all else is the same.
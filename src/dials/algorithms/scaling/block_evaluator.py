@@ -0,0 +1,131 @@
+"""
+Classes to evaluate the scaling target over the blocks of an Ih_table.
+
+During minimisation, the scale factors, derivatives and Ih values, followed by
+the target quantities (functional/gradients or residuals/jacobian) are
+calculated independently for each block of the Ih_table (the number of blocks
+is set by scaling_options.nproc). The BlockEvaluator performs these
+calculations serially in the current process, while the ParallelBlockEvaluator
+distributes the blocks over a pool of worker processes.
+
+The worker processes are forked once at the start of a round of minimisation
+and so inherit the scaler, Ih_table and parameter manager; for each evaluation
+only the current parameter vector is sent to the workers. The updated inverse
+scale factors and Ih values of each block are returned alongside the target
+quantities, so that the Ih_table of the main process is left in the same state
+as after a serial evaluation. As the same calculations are performed on the same
+data for each block, and the results are returned in block order, the parallel
+evaluation gives results identical to the serial evaluation.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import multiprocessing
+from itertools import repeat
+
+from dials.algorithms.scaling.scaling_utilities import (
+    sparse_matrix_from_arrays,
+    sparse_matrix_to_arrays,
+)
+
+logger = logging.getLogger("dials")
+
+# The scaler and active parameter manager of a forked worker process.
+_worker_state = {}
+
+
+def _initialise_worker(scaler, apm):
+    _worker_state["scaler"] = scaler
+    _worker_state["apm"] = apm
+
+
+def _evaluate_block(method, x, block_id):
+    """Calculate the target quantities for one block in a worker process."""
+    scaler = _worker_state["scaler"]
+    apm = _worker_state["apm"]
+    apm.set_param_vals(x)
+    scaler.update_for_minimisation(apm, block_id)
+    block = scaler.Ih_table.blocked_data_list[block_id]
+    result = getattr(apm, method)(block)
+    if method == "compute_residuals_and_gradients":
+        residuals, jacobian, weights = result
+        result = (residuals, sparse_matrix_to_arrays(jacobian), weights)
+    return result, block.inverse_scale_factors, block.Ih_values
+
+
+class BlockEvaluator:
+    """Evaluate the target quantities for each block in turn."""
+
+    def __init__(self, scaler, apm):
+        self._scaler = scaler
+        self._apm = apm
+
+    def evaluate(self, method, blocks):
+        """
+        Update the blocks for the current parameter values and compute the target
+        quantities for each block.
+
+        Args:
+            method: The name of the active parameter manager method to call on
+                each block, one of compute_functional_gradients, compute_residuals
+                or compute_residuals_and_gradients.
+            blocks: The Ih_table blocks used for minimisation.
+
+        Yields:
+            The result of the method for each block, in block order.
+        """
+        for block_id, block in enumerate(blocks):
+            self._scaler.update_for_minimisation(self._apm, block_id)
+            yield getattr(self._apm, method)(block)
+
+    def close(self):
+        """Release any resources held by the evaluator."""
+
+
+class ParallelBlockEvaluator(BlockEvaluator):
+    """Evaluate the target quantities for the blocks using a pool of forked
+    worker processes, which persists until close is called."""
+
+    def __init__(self, scaler, apm, nproc):
+        super().__init__(scaler, apm)
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=nproc,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_initialise_worker,
+            initargs=(scaler, apm),
+        )
+
+    def evaluate(self, method, blocks):
+        x = self._apm.get_param_vals()
+        Ih_table = self._scaler.Ih_table
+        for block_id, (result, scales, Ih_values) in enumerate(
+            self._pool.map(
+                _evaluate_block, repeat(method), repeat(x), range(len(blocks))
+            )
+        ):
+            Ih_table.set_inverse_scale_factors(scales, block_id)
+            Ih_table.set_Ih_values(Ih_values, block_id)
+            if method == "compute_residuals_and_gradients":
+                residuals, jacobian, weights = result
+                result = (residuals, sparse_matrix_from_arrays(*jacobian), weights)
+            yield result
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def block_evaluator(scaler, apm):
+    """Return a parallel evaluator if nproc > 1 and multiple blocks are to be
+    minimised (and forking is supported), else a serial evaluator."""
+    nproc = scaler.params.scaling_options.nproc
+    n_blocks = len(scaler.get_blocks_for_minimisation())
+    if nproc > 1 and n_blocks > 1 and "fork" in multiprocessing.get_all_start_methods():
+        logger.debug(
+            "Evaluating %s Ih_table blocks with %s processes",
+            n_blocks,
+            min(nproc, n_blocks),
+        )
+        return ParallelBlockEvaluator(scaler, apm, min(nproc, n_blocks))
+    return BlockEvaluator(scaler, apm)
@@ -61,6 +61,13 @@ namespace dials_scaling { namespace boost_python {
     def("row_multiply", &row_multiply, (arg("m"), arg("v")));
   }
 
+  void export_sparse_matrix_csc() {
+    def("sparse_matrix_as_csc", &sparse_matrix_as_csc, (arg("m")));
+    def("sparse_matrix_from_csc",
+        &sparse_matrix_from_csc,
+        (arg("n_rows"), arg("n_cols"), arg("data"), arg("indices"), arg("indptr")));
+  }
+
   void export_limit_outlier_weights() {
     def("limit_outlier_weights",
         &limit_outlier_weights,
@@ -34,12 +34,21 @@
 cross_validation_mode=multi parameter=physical.absorption_correction
 cross_validation_mode=multi parameter=physical.decay_interval parameter_values="5.0 10.0 15.0"
 cross_validation_mode=multi parameter=model parameter_values="array physical"
+
+The runs for the folds and parameter values can be performed concurrently by
+setting nproc= to the total number of processes to use. The processes are
+shared between the concurrent runs, each of which uses the remaining share of
+the processes for its own parallel parts (e.g. scaling_options.nproc for
+dials.scale). The results of each run are reported as it finishes.
 """
 
 from __future__ import annotations
 
+import concurrent.futures
+import copy
 import itertools
 import logging
+import multiprocessing
 import time
 
 from libtbx import phil
@@ -78,17 +87,91 @@
               "allowed is 1/free_set_percentage; if set greater than this then"
               "the repetition will finish after 1/free_set_percentage folds."
       .expert_level = 2
+    nproc = 1
+      .type = int(value_min=1)
+      .help = "The total number of processes to use for cross validation. The"
+              "runs for the folds and parameter values are performed"
+              "concurrently, and the processes not needed for concurrent runs"
+              "are shared between the runs for their own parallel processing."
+      .expert_level = 2
   }
 """
 )
 
 
+# The cross validator, in the worker processes
+_worker_cross_validator = None
+
+
+def _initialise_worker(cross_validator):
+    global _worker_cross_validator
+    _worker_cross_validator = cross_validator
+    # Only show warnings, as the output of the concurrent runs is interleaved
+    logging.getLogger("dials").setLevel(logging.WARNING)
+
+
+def _run_in_worker(params):
+    return _worker_cross_validator.calculate_results(params)
+
+
+def _add_results(cross_validator, config_no, n, results):
+    """Add the results of a run to the results dict, and report them."""
+    cross_validator.add_results_to_results_dict(config_no, results)
+    logger.info(
+        "Cross validation results for %s, fold %s: %s",
+        " ".join(cross_validator.results_dict[config_no]["configuration"]),
+        n + 1,
+        ", ".join(
+            f"{name} {result:.5f}"
+            for name, result in zip(cross_validator.results_metadata["names"], results)
+        ),
+    )
+
+
+def _run(cross_validator, runs, nproc):
+    """
+    Perform the runs, concurrently if nproc > 1, adding the results of each
+    run to the results dict as it finishes.
+
+    The input data of the cross validator are shared between the worker
+    processes, and the processes not needed for concurrent runs are shared
+    between the runs.
+    """
+    n_workers = min(nproc, len(runs))
+    if n_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        for _, _, run_params in runs:
+            cross_validator.set_nproc(run_params, max(1, nproc // n_workers))
+        logger.info(
+            "Performing %i cross validation runs with %i processes",
+            len(runs),
+            n_workers,
+        )
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_initialise_worker,
+            initargs=(cross_validator,),
+        ) as pool:
+            futures = {
+                pool.submit(_run_in_worker, run_params): (config_no, n)
+                for config_no, n, run_params in runs
+            }
+            for future in concurrent.futures.as_completed(futures):
+                _add_results(cross_validator, *futures[future], future.result())
+    else:
+        for config_no, n, run_params in runs:
+            results = cross_validator.calculate_results(run_params)
+            _add_results(cross_validator, config_no, n, results)
+
+
 def cross_validate(params, cross_validator):
     """Run cross validation script."""
 
     start_time = time.time()
     free_set_percentage = cross_validator.get_free_set_percentage(params)
     options_dict = {}
+    # The configuration number, fold number and params of each run
+    runs = []
 
     if params.cross_validation.cross_validation_mode == "single":
         # just run the setup nfolds times
@@ -96,7 +179,7 @@ def cross_validate(params, cross_validator):
         for n in range(params.cross_validation.nfolds):
             if n < 100.0 / free_set_percentage:
                 params = cross_validator.set_free_set_offset(params, n)
-                cross_validator.run_script(params, config_no=0)
+                runs.append((0, n, copy.deepcopy(params)))
 
     elif params.cross_validation.cross_validation_mode == "multi":
         # run each option nfolds times
@@ -157,11 +240,13 @@ def cross_validate(params, cross_validator):
             for n in range(params.cross_validation.nfolds):
                 if n < 100.0 / free_set_percentage:
                     params = cross_validator.set_free_set_offset(params, n)
-                    cross_validator.run_script(params, config_no=i)
+                    runs.append((i, n, copy.deepcopy(params)))
 
     else:
         raise ValueError("Error in interpreting mode and options.")
 
+    _run(cross_validator, runs, params.cross_validation.nproc)
+
     st = cross_validator.interpret_results()
     logger.info("Summary of the cross validation analysis: \n %s", st.format())
 
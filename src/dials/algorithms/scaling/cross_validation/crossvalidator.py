@@ -37,6 +37,12 @@ def run_script(self, params, config_no):
         """Run the appropriate command line script with the params, get the
         free/work set results and add to the results dict. Indicate the
         configuration number being run."""
+        results = self.calculate_results(params)
+        self.add_results_to_results_dict(config_no, results)
+
+    def calculate_results(self, params):
+        """Run the appropriate command line script with the params and return
+        the free/work set results."""
         raise NotImplementedError()
 
     def get_results_from_script(self, script):
@@ -59,6 +65,10 @@ def get_free_set_percentage(self, params):
         """Inspect the free set percentage in the correct place in the scope"""
         raise NotImplementedError()
 
+    def set_nproc(self, params, nproc):
+        """Set the number of processes used by each run of the script"""
+        raise NotImplementedError()
+
     @staticmethod
     def _avg_sd_from_list(lst):
         """simple function to get average and standard deviation"""
@@ -211,9 +221,14 @@ def get_free_set_percentage(self, params):
         """Inspect the free set percentage in the correct place in the scope"""
         return params.scaling_options.free_set_percentage
 
-    def run_script(self, params, config_no):
-        """Run the scaling script with the params, get the free/work set results
-        and add to the results dict"""
+    def set_nproc(self, params, nproc):
+        """Set the number of processes used by each run of the script"""
+        params.scaling_options.nproc = nproc
+        return params
+
+    def calculate_results(self, params):
+        """Run the scaling script with the params and return the free/work set
+        results"""
         from dials.algorithms.scaling.algorithm import ScalingAlgorithm
 
         params.scaling_options.__setattr__("use_free_set", True)
@@ -223,5 +238,4 @@ def run_script(self, params, config_no):
             reflections=deepcopy(self.reflections),
         )
         algorithm.run()
-        results = self.get_results_from_script(algorithm)
-        self.add_results_to_results_dict(config_no, results)
+        return self.get_results_from_script(algorithm)
@@ -20,7 +20,7 @@
 
 from dials.algorithms.scaling.Ih_table import IhTable
 from dials.util.normalisation import quasi_normalisation
-from dials_scaling_ext import determine_outlier_indices, limit_outlier_weights
+from dials_scaling_ext import limit_outlier_weights
 
 logger = logging.getLogger("dials")
 
@@ -160,6 +160,30 @@ def determine_outlier_index_arrays(Ih_table, method="standard", zmax=6.0, target
     return outlier_index_arrays
 
 
+def _miller_index_keys(*miller_indices):
+    """
+    Pack miller indices into integer keys, for matching with numpy.
+
+    Args:
+        miller_indices: flex.miller_index arrays to be compared.
+
+    Returns:
+        A list of np.int64 arrays of keys, one for each input array, with equal
+        keys for equal miller indices.
+    """
+    hkls = [
+        flumpy.to_numpy(indices.as_vec3_double()).astype(np.int64).reshape(-1, 3)
+        for indices in miller_indices
+    ]
+    offset = max((int(np.abs(hkl).max()) for hkl in hkls if hkl.size), default=0)
+    base = 2 * offset + 1
+    return [
+        ((hkl[:, 0] + offset) * base + (hkl[:, 1] + offset)) * base
+        + (hkl[:, 2] + offset)
+        for hkl in hkls
+    ]
+
+
 class OutlierRejectionBase:
     """
     Base class for outlier rejection algorithms using an IhTable datastructure.
@@ -240,48 +264,43 @@ def _do_outlier_rejection(self):
         """Add indices (w.r.t. the Ih_table data) to self._outlier_indices."""
         Ih_table = self._Ih_table_block
         target = self._target_Ih_table_block
-        target_asu_Ih_dict = dict(
-            zip(target.asu_miller_index, zip(target.Ih_values, target.variances))
+        keys, target_keys = _miller_index_keys(
+            Ih_table.asu_miller_index, target.asu_miller_index
+        )
+        # Take the values of the last target reflection of each miller index
+        unique_keys, last = np.unique(target_keys[::-1], return_index=True)
+        last = target_keys.size - 1 - last
+        positions = np.minimum(
+            np.searchsorted(unique_keys, keys), max(unique_keys.size - 1, 0)
         )
+        matched = np.zeros(keys.size, dtype=bool)
+        if unique_keys.size:
+            matched = unique_keys[positions] == keys
         target_Ih_value = np.zeros(Ih_table.size)
         target_Ih_sigmasq = np.zeros(Ih_table.size)
-        for j, miller_idx in enumerate(Ih_table.asu_miller_index):
-            try:
-                vals = target_asu_Ih_dict[miller_idx]
-            except KeyError:
-                pass
-            else:
-                target_Ih_value[j] = vals[0]
-                target_Ih_sigmasq[j] = vals[1]
+        target_Ih_value[matched] = target.Ih_values[last[positions[matched]]]
+        target_Ih_sigmasq[matched] = target.variances[last[positions[matched]]]
 
         nz_sel = target_Ih_value != 0.0
         target_Ih_value = target_Ih_value[nz_sel]
         target_Ih_sigmasq = target_Ih_sigmasq[nz_sel]
-        Ih_table = Ih_table.select(nz_sel)
-        norm_dev = (
-            Ih_table.intensities - (Ih_table.inverse_scale_factors * target_Ih_value)
-        ) / (
-            np.sqrt(
-                Ih_table.variances
-                + (np.square(Ih_table.inverse_scale_factors) * target_Ih_sigmasq)
-            )
+        g = Ih_table.inverse_scale_factors[nz_sel]
+        norm_dev = (Ih_table.intensities[nz_sel] - (g * target_Ih_value)) / (
+            np.sqrt(Ih_table.variances[nz_sel] + (np.square(g) * target_Ih_sigmasq))
         )
         outliers_sel = np.abs(norm_dev) > self._zmax
         outliers_isel = np.nonzero(nz_sel)[0][outliers_sel]
 
-        outliers = np.full(self._Ih_table_block.size, False)
-        outliers[outliers_isel] = True
-
         self._outlier_indices = np.concatenate(
             [
                 self._outlier_indices,
-                self._Ih_table_block.Ih_table["loc_indices"].iloc[outliers],
+                Ih_table.Ih_table["loc_indices"].to_numpy()[outliers_isel],
             ]
         )
         self._datasets = np.concatenate(
             [
                 self._datasets,
-                self._Ih_table_block.Ih_table["dataset_id"].iloc[outliers],
+                Ih_table.Ih_table["dataset_id"].to_numpy()[outliers_isel],
             ]
         )
 
@@ -356,29 +375,42 @@ def __init__(self, Ih_table, zmax):
         )
 
     def _do_outlier_rejection(self):
-        """Add indices (w.r.t. the Ih_table data) to self._outlier_indices."""
-        self._round_of_outlier_rejection()
-        n_outliers = self._outlier_indices.size
-        n_new_outliers = n_outliers
-        while n_new_outliers:
-            self._round_of_outlier_rejection()
-            n_new_outliers = self._outlier_indices.size - n_outliers
-            n_outliers = self._outlier_indices.size
-
-    def _round_of_outlier_rejection(self):
+        """Add indices (w.r.t. the Ih_table data) to self._outlier_indices.
+
+        In each round, the reflection with the largest normalised deviation in
+        each group is rejected if this is above zmax. Only the groups in which
+        an outlier was found are tested again in the next round, until no more
+        outliers are found."""
+        self._group_indices = self._Ih_table_block.group_indices()
+        candidates = np.arange(self._Ih_table_block.size)
+        while candidates.size:
+            candidates = self._round_of_outlier_rejection(candidates)
+
+    def _round_of_outlier_rejection(self, candidates):
         """
         Calculate normal deviations from the data in the Ih_table.
+
+        Args:
+            candidates: The sorted indices of the reflections to test.
+
+        Returns:
+            The indices of the reflections to test in the next round.
         """
         Ih_table = self._Ih_table_block
-        intensity = Ih_table.intensities
-        g = Ih_table.inverse_scale_factors
-        w = self.weights
-        wgIsum = Ih_table.sum_in_groups(w * g * intensity, output="per_refl")
-        wg2sum = Ih_table.sum_in_groups(w * g * g, output="per_refl")
+        # Renumber the groups of the candidates, so that sums are only
+        # calculated over the groups still being tested
+        group_ids, groups = np.unique(
+            self._group_indices[candidates], return_inverse=True
+        )
+        intensity = Ih_table.intensities[candidates]
+        g = Ih_table.inverse_scale_factors[candidates]
+        w = self.weights[candidates]
+        wgIsum = np.bincount(groups, weights=w * g * intensity)[groups]
+        wg2sum = np.bincount(groups, weights=w * g * g)[groups]
         wgIsum_others = wgIsum - (w * g * intensity)
         wg2sum_others = wg2sum - (w * g * g)
         # Now do the rejection analysis if n_in_group > 2
-        nh = Ih_table.calc_nh()
+        nh = np.bincount(groups)[groups]
         sel = nh > 2
         wg2sum_others_sel = wg2sum_others[sel]
         wgIsum_others_sel = wgIsum_others[sel]
@@ -398,33 +430,33 @@ def _round_of_outlier_rejection(self):
             np.sqrt((1.0 / w_sel) + (np.square(g_sel) / wg2sum_others_sel))
         )
         norm_dev[zero_sel] = 1000  # to trigger rejection
-        z_score = np.abs(norm_dev)
-        # Want an array same size as Ih table.
-        all_z_scores = np.zeros(Ih_table.size)
-        # all_z_scores.set_selected(sel.iselection(), z_score)
-        all_z_scores[sel] = z_score
-        outlier_indices, other_potential_outliers = determine_outlier_indices(
-            Ih_table.h_index_matrix, flumpy.from_numpy(all_z_scores), self._zmax
-        )
-        sel = np.full(Ih_table.size, False, dtype=bool)
-        outlier_indices = flumpy.to_numpy(outlier_indices)
-        sel[outlier_indices] = True
-        lsel = self._Ih_table_block.Ih_table["loc_indices"].iloc[sel].to_numpy()
-        dsel = self._Ih_table_block.Ih_table["dataset_id"].iloc[sel].to_numpy()
+        z_score = np.zeros(candidates.size)
+        z_score[sel] = np.abs(norm_dev)
+
+        # Find the largest z-score in each group (the first reflection, if tied)
+        order = np.lexsort((candidates, -z_score, groups))
+        first_in_group = np.ones(order.size, dtype=bool)
+        first_in_group[1:] = groups[order[1:]] != groups[order[:-1]]
+        max_z = order[first_in_group]
+        outliers = max_z[(z_score[max_z] > self._zmax) & (nh[max_z] > 2)]
+
+        outlier_rows = np.sort(candidates[outliers])
         self._outlier_indices = np.concatenate(
             [
                 self._outlier_indices,
-                lsel,
+                Ih_table.Ih_table["loc_indices"].to_numpy()[outlier_rows],
             ]
         )
         self._datasets = np.concatenate(
             [
                 self._datasets,
-                dsel,
+                Ih_table.Ih_table["dataset_id"].to_numpy()[outlier_rows],
             ]
         )
 
-        sel = np.full(Ih_table.size, False, dtype=bool)
-        sel[flumpy.to_numpy(other_potential_outliers)] = True
-        self._Ih_table_block = self._Ih_table_block.select(sel)
-        self.weights = self.weights[sel]
+        # The other reflections in groups with an outlier are tested again
+        has_outlier = np.zeros(group_ids.size, dtype=bool)
+        has_outlier[groups[outliers]] = True
+        retest = has_outlier[groups]
+        retest[outliers] = False
+        return candidates[retest]
@@ -33,6 +33,13 @@
         stdcutoff = 4.0
             .type = float
             .help = "Datasets with a ΔCC½ below (mean - stdcutoff*std) are removed"
+        warm_start = True
+            .type = bool
+            .help = "In dataset mode, reuse the scalers of the previous cycle,"
+                    "removing the filtered datasets, rather than creating them"
+                    "again, so that minimisation starts from the previous"
+                    "scaling model parameters."
+            .expert_level = 2
     }
     output {
         scale_and_filter_results = "scale_and_filter_results.json"
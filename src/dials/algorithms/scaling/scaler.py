@@ -44,6 +44,7 @@
     select_connected_reflections_across_datasets,
 )
 from dials.algorithms.scaling.scaling_library import (
+    choose_initial_scaling_intensities,
     merging_stats_from_scaled_array,
     scaled_data_as_miller_array,
 )
@@ -572,6 +573,20 @@ def _combine_intensities(self, use_Imid=None):
                 combiner.max_key
             )
 
+    def reset_intensities(self):
+        """
+        Reset the intensities and variances to their values before scaling.
+
+        This undoes the adjustment of the variances for output, as done for a
+        new scaler, so that the scaler can be used for another round of
+        scaling.
+        """
+        self._reflection_table = choose_initial_scaling_intensities(
+            self._reflection_table, self.params.reflection_selection.intensity_choice
+        )
+        if "Imid" in self.experiment.scaling_model.configdict:
+            self._combine_intensities(self.experiment.scaling_model.configdict["Imid"])
+
     def expand_scales_to_all_reflections(self, caller=None, calc_cov=False):
         """
         Calculate scale factors for all suitable reflections.
@@ -1580,6 +1595,56 @@ def __init__(self, single_scalers):
         logger.info("Completed configuration of MultiScaler. \n\n" + "=" * 80 + "\n")
         log_memory_usage()
 
+    def prepare_for_rescaling(self, identifiers_to_remove=()):
+        """
+        Prepare for another round of scaling after scaling and output, reusing
+        the single scalers and the global Ih tables.
+
+        The datasets with the given identifiers are removed in place, the
+        intensities and variances are reset, and a new selection of reflections
+        is made for minimisation. The scaling models keep their parameters, so
+        that minimisation starts from the previous solution.
+        """
+        n_list = [
+            i
+            for i, scaler in enumerate(self.active_scalers)
+            if scaler.experiment.identifier in identifiers_to_remove
+        ]
+        if n_list:
+            self.remove_datasets(self.active_scalers, n_list)
+            self._global_Ih_table.remove_datasets(n_list)
+            if self._free_Ih_table:
+                self._free_Ih_table.remove_datasets(n_list)
+        # The caller has already removed these from the experiments.
+        self._removed_datasets = []
+        self.n_initial_active_scalers = len(self.active_scalers)
+
+        Ih_tables = [t for t in (self._global_Ih_table, self._free_Ih_table) if t]
+        for i, scaler in enumerate(self.active_scalers):
+            scaler.reset_intensities()
+            suitable = scaler.suitable_refl_for_scaling_sel
+            for Ih_table in Ih_tables:
+                for column in ("intensity", "variance"):
+                    Ih_table.update_data_in_blocks(
+                        scaler.reflection_table[column].select(suitable),
+                        i,
+                        column=column,
+                    )
+        error_models = [
+            s.experiment.scaling_model.error_model for s in self.active_scalers
+        ]
+        for Ih_table in Ih_tables:
+            if all(em is error_models[0] for em in error_models):
+                Ih_table.update_weights(error_models[0])
+            else:
+                for i, error_model in enumerate(error_models):
+                    Ih_table.update_weights(error_model, dataset_id=i)
+            Ih_table.calc_Ih()
+
+        self._select_reflections_for_scaling()
+        self._create_Ih_table()
+        self._update_model_data()
+
     def fix_initial_parameter(self):
         for scaler in self.active_scalers:
             fixed = scaler.experiment.scaling_model.fix_initial_parameter(self.params)
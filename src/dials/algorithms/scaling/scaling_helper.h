@@ -277,6 +277,58 @@ scitbx::sparse::matrix<double> row_multiply(scitbx::sparse::matrix<double> m,
   return result;
 }
 
+/**
+ * Decompose a sparse matrix into arrays in compressed sparse column format,
+ * walking only the non-zero elements of each column. Returns a tuple of the
+ * values, their row indices and the index of the first value of each column
+ * (followed by the total number of values), as for scipy.sparse.csc_matrix.
+ */
+boost::python::tuple sparse_matrix_as_csc(scitbx::sparse::matrix<double> m) {
+  // call compact to ensure that each elt of the matrix is only defined once
+  m.compact();
+
+  scitbx::af::shared<double> data;
+  scitbx::af::shared<std::size_t> indices;
+  scitbx::af::shared<std::size_t> indptr(m.n_cols() + 1, 0);
+  for (std::size_t j = 0; j < m.n_cols(); j++) {
+    for (scitbx::sparse::matrix<double>::row_iterator p = m.col(j).begin();
+         p != m.col(j).end();
+         ++p) {
+      if (*p != 0.0) {
+        indices.push_back(p.index());
+        data.push_back(*p);
+      }
+    }
+    indptr[j + 1] = data.size();
+  }
+  return boost::python::make_tuple(data, indices, indptr);
+}
+
+/**
+ * Create a sparse matrix from arrays in compressed sparse column format, as
+ * returned by sparse_matrix_as_csc.
+ */
+scitbx::sparse::matrix<double> sparse_matrix_from_csc(
+  std::size_t n_rows,
+  std::size_t n_cols,
+  scitbx::af::const_ref<double> data,
+  scitbx::af::const_ref<std::size_t> indices,
+  scitbx::af::const_ref<std::size_t> indptr) {
+  DIALS_ASSERT(data.size() == indices.size());
+  DIALS_ASSERT(indptr.size() == n_cols + 1);
+  DIALS_ASSERT(indptr[n_cols] == data.size());
+
+  scitbx::sparse::matrix<double> result(n_rows, n_cols);
+  for (std::size_t j = 0; j < n_cols; j++) {
+    DIALS_ASSERT(indptr[j] <= indptr[j + 1]);
+    for (std::size_t k = indptr[j]; k < indptr[j + 1]; k++) {
+      DIALS_ASSERT(indices[k] < n_rows);
+      result(indices[k], j) = data[k];
+    }
+  }
+  return result;
+}
+
 scitbx::af::shared<scitbx::vec2<double> > calc_theta_phi(
   scitbx::af::shared<scitbx::vec3<double> > xyz) {
   // physics conventions, phi from 0 to 2pi (xy plane, 0 along x axis), theta from 0 to
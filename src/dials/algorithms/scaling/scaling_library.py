@@ -35,6 +35,7 @@
 )
 from dials.array_family import flex
 from dials.util import Sorry
+from dials.util.merging_statistics import cached_dataset_statistics
 from dials.util.options import ArgumentParser
 from dials.util.reference import intensities_from_reference_file
 from dials_scaling_ext import split_unmerged
@@ -554,8 +555,9 @@ def merging_stats_from_scaled_array(
             "cannot be calculated."
         )
     try:
-        result = ExtendedDatasetStatistics(
-            i_obs=scaled_miller_array,
+        result = cached_dataset_statistics(
+            scaled_miller_array,
+            ExtendedDatasetStatistics,
             n_bins=n_bins,
             anomalous=False,
             sigma_filtering=None,
@@ -583,8 +585,9 @@ def merging_stats_from_scaled_array(
             )
         else:
             try:
-                anom_result = ExtendedDatasetStatistics(
-                    i_obs=intensities_anom,
+                anom_result = cached_dataset_statistics(
+                    intensities_anom,
+                    ExtendedDatasetStatistics,
                     n_bins=n_bins,
                     anomalous=True,
                     sigma_filtering=None,
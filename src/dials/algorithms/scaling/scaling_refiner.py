@@ -14,6 +14,7 @@
     LevenbergMarquardtIterations,
     SimpleLBFGS,
 )
+from dials.algorithms.scaling.block_evaluator import BlockEvaluator, block_evaluator
 from dials.algorithms.scaling.scaling_utilities import log_memory_usage
 from dials.util import tabulate
 
@@ -157,6 +158,17 @@ def __init__(self, scaler, target, prediction_parameterisation, *args, **kwargs)
         self._scaler = scaler
         self._rmsd_tolerance = scaler.params.scaling_refinery.rmsd_tolerance
         self._parameters = prediction_parameterisation
+        self._block_evaluator = BlockEvaluator(scaler, prediction_parameterisation)
+
+    def run(self):
+        """Run the minimisation, evaluating the Ih_table blocks in parallel if
+        scaling_options.nproc > 1."""
+        self._block_evaluator = block_evaluator(self._scaler, self._parameters)
+        try:
+            return super().run()
+        finally:
+            self._block_evaluator.close()
+            self._block_evaluator = BlockEvaluator(self._scaler, self._parameters)
 
     def print_step_table(self):
         print_step_table(self)
@@ -229,21 +241,9 @@ def compute_functional_gradients_and_curvatures(self):
 
         work_blocks = self._scaler.get_blocks_for_minimisation()
 
-        f = []
-        gi = []
-        for block_id, block in enumerate(work_blocks):
-            self._scaler.update_for_minimisation(self._parameters, block_id)
-            fb, gb = self._parameters.compute_functional_gradients(block)
-            f.append(fb)
-            gi.append(gb)
-        """task_results = easy_mp.parallel_map(
-            func=self._target.compute_functional_gradients,
-            iterable=blocks,
-            processes=self._scaler.params.scaling_options.nproc,
-            method="multiprocessing",
-            preserve_exception_message=True
+        f, gi = zip(
+            *self._block_evaluator.evaluate("compute_functional_gradients", work_blocks)
         )
-        f, gi = zip(*task_results)"""
 
         f = sum(f)
         g = gi[0]
@@ -279,28 +279,17 @@ def build_up(self, objective_only=False):
 
         # observation terms
         if objective_only:
-            for block_id, block in enumerate(work_blocks):
-                self._scaler.update_for_minimisation(self._parameters, block_id)
-                residuals, weights = self._parameters.compute_residuals(block)
+            for residuals, weights in self._block_evaluator.evaluate(
+                "compute_residuals", work_blocks
+            ):
                 self.add_residuals(residuals, weights)
         else:
             self._jacobian = None
 
-            for block_id, block in enumerate(work_blocks):
-                self._scaler.update_for_minimisation(self._parameters, block_id)
-                (
-                    residuals,
-                    jacobian,
-                    weights,
-                ) = self._parameters.compute_residuals_and_gradients(block)
+            for residuals, jacobian, weights in self._block_evaluator.evaluate(
+                "compute_residuals_and_gradients", work_blocks
+            ):
                 self.add_equations(residuals, jacobian, weights)
-            """task_results = easy_mp.pool_map(
-                fixed_func=self._target.compute_residuals_and_gradients,
-                iterable=blocks,
-                processes=self._scaler.params.scaling_options.nproc
-            )
-            for result in task_results:
-                self.add_equations(result[0], result[1], result[2])"""
 
         restraints = self._parameters.compute_restraints_residuals_and_gradients(
             self._parameters
@@ -19,6 +19,8 @@
     calc_theta_phi,
     create_sph_harm_table,
     rotate_vectors_about_axis,
+    sparse_matrix_as_csc,
+    sparse_matrix_from_csc,
 )
 
 logger = logging.getLogger("dials")
@@ -225,3 +227,33 @@ def calculate_prescaling_correction(reflection_table):
         conversion *= inverse_qe
     reflection_table["prescaling_correction"] = conversion
     return reflection_table
+
+
+def sparse_matrix_to_arrays(matrix):
+    """
+    Decompose a scitbx sparse matrix into numpy arrays in compressed sparse
+    column format, to allow the matrix to be pickled and passed between processes.
+
+    Returns a tuple of (shape, data, indices, indptr), with the same meaning as for
+    a scipy.sparse.csc_matrix. Only the nonzero elements are retained, and only
+    these are visited, so the cost scales with the number of nonzero elements.
+    """
+    data, indices, indptr = sparse_matrix_as_csc(matrix)
+    return (
+        (matrix.n_rows, matrix.n_cols),
+        flumpy.to_numpy(data),
+        flumpy.to_numpy(indices),
+        flumpy.to_numpy(indptr),
+    )
+
+
+def sparse_matrix_from_arrays(shape, data, indices, indptr):
+    """Recreate a scitbx sparse matrix from the output of sparse_matrix_to_arrays."""
+    n_rows, n_cols = shape
+    return sparse_matrix_from_csc(
+        n_rows,
+        n_cols,
+        flumpy.from_numpy(np.ascontiguousarray(data, dtype=np.float64)),
+        flumpy.from_numpy(np.ascontiguousarray(indices, dtype=np.uint64)),
+        flumpy.from_numpy(np.ascontiguousarray(indptr, dtype=np.uint64)),
+    )
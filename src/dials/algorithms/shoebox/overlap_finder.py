@@ -0,0 +1,183 @@
+"""
+Find the overlapping bounding boxes of very large sets of reflections in
+chunks, optionally in parallel.
+
+OverlapFinder finds the overlaps of all of the reflections in one call, which
+for fine-sliced, high-multiplicity sweeps with ~10^8 predicted reflections
+holds every bounding box and the whole collision list in memory at once. Here
+the reflections are split into chunks by group (e.g. imageset), panel and a
+window of images, and the overlaps in each chunk are found with OverlapFinder.
+
+A reflection is put in the chunk of every window its bounding box spans, so an
+overlap between two reflections is found in each window spanned by both
+boxes. It is kept only for the window containing the first image of the
+overlap (the larger of the two z0), so that each overlap is found exactly once
+and the result is the same graph as found by OverlapFinder for all of the
+reflections at once.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import multiprocessing
+
+import numpy as np
+
+from dxtbx import flumpy
+
+from dials.algorithms.shoebox import OverlapFinder
+from dials.array_family import flex
+from dials.model.data import AdjacencyList
+
+logger = logging.getLogger(__name__)
+
+# The number of reflections for which the overlaps are found in one task
+CHUNK_SIZE = 1000000
+
+
+class _Chunks:
+    """
+    The reflections of each chunk, sorted by chunk.
+
+    The overlaps are found for tasks of consecutive chunks, each task being a
+    range of the sorted entries which starts and ends on chunk boundaries.
+    """
+
+    def __init__(self, group_id, panel, bbox, z_window, chunk_size):
+        group_id = flumpy.to_numpy(group_id).astype(np.int64)
+        panel = flumpy.to_numpy(panel).astype(np.int64)
+        self.parts = [flumpy.to_numpy(p) for p in bbox.parts()]
+        z0, z1 = self.parts[4], self.parts[5]
+
+        self.z_min = int(z0.min())
+        if z_window is None:
+            # Aim for chunk_size reflections per window, but make the windows
+            # wide enough that few reflections are in more than one
+            z_range = int(z1.max()) - self.z_min
+            extent = int(np.ceil(np.mean(z1 - z0)))
+            z_window = max(-(-z_range * chunk_size // len(z0)), 2 * extent, 1)
+        self.z_window = z_window
+
+        # Put each reflection in each window its bounding box spans
+        first = (z0 - self.z_min) // z_window
+        last = np.maximum(first, (z1 - 1 - self.z_min) // z_window)
+        count = last - first + 1
+        index = np.repeat(np.arange(len(z0), dtype=np.uint64), count)
+        offset = np.repeat(np.cumsum(count) - count, count)
+        window = np.repeat(first, count) + np.arange(len(index)) - offset
+
+        # Sort the entries by group, panel and window
+        order = np.lexsort((index, window, panel[index], group_id[index]))
+        self.index = index[order]
+        self.window = window[order]
+        group_id = group_id[self.index]
+        panel = panel[self.index]
+        new_chunk = np.ones(len(self.index), dtype=bool)
+        new_chunk[1:] = (
+            (group_id[1:] != group_id[:-1])
+            | (panel[1:] != panel[:-1])
+            | (self.window[1:] != self.window[:-1])
+        )
+        self.chunk = np.cumsum(new_chunk) - 1
+
+        # Split the entries into tasks of about chunk_size entries
+        starts = np.flatnonzero(new_chunk)
+        _, first_chunk = np.unique(starts // chunk_size, return_index=True)
+        bounds = list(starts[first_chunk]) + [len(self.index)]
+        self.tasks = list(zip(bounds[:-1], bounds[1:]))
+
+    def find_overlaps(self, start, end):
+        """
+        Find the overlaps between the reflections in a range of the entries.
+
+        :return: The indices of the two reflections of each overlap, as numpy
+                 uint64 arrays
+        """
+        index = self.index[start:end]
+        chunk = self.chunk[start:end]
+        bbox = flex.int6(*(flumpy.from_numpy(p[index]) for p in self.parts))
+        overlaps = OverlapFinder()(
+            flumpy.from_numpy((chunk - chunk[0]).astype(np.uint64)),
+            flex.size_t(len(index), 0),
+            bbox,
+        )
+        a, b = (flumpy.to_numpy(v) for v in overlaps.edge_arrays())
+
+        # Keep the overlaps for the window containing their first image
+        z0 = self.parts[4]
+        z_first = np.maximum(z0[index[a]], z0[index[b]])
+        keep = (z_first - self.z_min) // self.z_window == self.window[start:end][a]
+        return index[a[keep]], index[b[keep]]
+
+
+# The chunks of the reflections, in the worker processes
+_worker_chunks = None
+
+
+def _initialise_worker(chunks):
+    global _worker_chunks
+    _worker_chunks = chunks
+
+
+def _find_worker_overlaps(task):
+    return _worker_chunks.find_overlaps(*task)
+
+
+class ChunkedOverlapFinder:
+    """
+    Find the overlapping bounding boxes of reflections in the same group and
+    panel, in chunks of reflections grouped by windows of images.
+
+    Called in the same way as OverlapFinder, and returns the same graph.
+    """
+
+    def __init__(self, nproc=1, chunk_size=CHUNK_SIZE, z_window=None):
+        """
+        :param nproc: The number of processes used to find the overlaps
+        :param chunk_size: The approximate number of reflections for which the
+                           overlaps are found in one task
+        :param z_window: The number of images in each window, or None to choose
+                         from the number and size of the bounding boxes
+        """
+        self.nproc = nproc
+        self.chunk_size = chunk_size
+        self.z_window = z_window
+
+    def __call__(self, group_id, panel, bbox):
+        """
+        :param group_id: The group of each reflection, e.g. the imageset
+        :param panel: The panel of each reflection
+        :param bbox: The bounding box of each reflection
+        :return: An adjacency list of the overlapping reflections
+        """
+        assert len(group_id) == len(panel) == len(bbox)
+        if len(bbox) == 0:
+            return OverlapFinder()(group_id, panel, bbox)
+
+        chunks = _Chunks(group_id, panel, bbox, self.z_window, self.chunk_size)
+        nproc = min(self.nproc, len(chunks.tasks))
+        logger.debug(
+            "Finding overlaps in %d chunks of %d windows of %d images in %d tasks",
+            chunks.chunk[-1] + 1,
+            chunks.window.max() + 1,
+            chunks.z_window,
+            len(chunks.tasks),
+        )
+
+        overlaps = AdjacencyList(len(bbox))
+        if nproc > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=nproc,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_initialise_worker,
+                initargs=(chunks,),
+            ) as pool:
+                for a, b in pool.map(_find_worker_overlaps, chunks.tasks):
+                    overlaps.add_edges(flumpy.from_numpy(a), flumpy.from_numpy(b))
+        else:
+            for task in chunks.tasks:
+                a, b = chunks.find_overlaps(*task)
+                overlaps.add_edges(flumpy.from_numpy(a), flumpy.from_numpy(b))
+        overlaps.finish()
+        return overlaps
@@ -15,6 +15,9 @@
 from dxtbx.model import ExperimentList
 from dxtbx.model.tof_helpers import wavelength_from_tof
 
+from dials.algorithms.spot_finding.streaming_labeller import (
+    StreamingPixelListLabeller,
+)
 from dials.array_family import flex
 from dials.model.data import PixelList, PixelListLabeller
 from dials.util import Sorry, log
@@ -277,10 +280,7 @@ def pixel_list_to_shoeboxes(
     shoeboxes = flex.shoebox()
     spotsizes = flex.size_t()
     hotpixels = tuple(flex.size_t() for i in range(len(imageset.get_detector())))
-    if isinstance(imageset, ImageSequence):
-        twod = imageset.get_scan().is_still()
-    else:
-        twod = True
+    twod = _label_in_2d(imageset)
     for i, (p, hp) in enumerate(zip(pixel_labeller, hotpixels)):
         if p.num_pixels() > 0:
             creator = flex.PixelListShoeboxCreator(
@@ -310,6 +310,36 @@ def pixel_list_to_shoeboxes(
     return shoeboxes, hotpixels
 
 
+def _label_in_2d(imageset: ImageSet) -> bool:
+    """Spots are labelled on each image separately unless the imageset is a
+    sequence with a scan."""
+    if isinstance(imageset, ImageSequence):
+        return imageset.get_scan().is_still()
+    return True
+
+
+def streaming_labeller_to_shoeboxes(
+    pixel_labeller: Iterable[StreamingPixelListLabeller],
+    min_spot_size: int,
+    max_spot_size: int,
+) -> Tuple[flex.shoebox, Tuple[flex.size_t, ...]]:
+    """Complete the spots of the streaming labellers and collect the shoeboxes"""
+    shoeboxes = flex.shoebox()
+    hotpixels = []
+    nspots = ntoosmall = ntoolarge = 0
+    for p in pixel_labeller:
+        p.finish()
+        shoeboxes.extend(p.shoeboxes())
+        hotpixels.append(p.hot_pixels())
+        nspots += p.num_spots
+        ntoosmall += p.num_too_small
+        ntoolarge += p.num_too_large
+    logger.info("\nExtracted %d spots", nspots)
+    logger.info("Removed %d spots with size < %d pixels", ntoosmall, min_spot_size)
+    logger.info("Removed %d spots with size > %d pixels", ntoolarge, max_spot_size)
+    return shoeboxes, tuple(hotpixels)
+
+
 def shoeboxes_to_reflection_table(
     imageset: ImageSet, shoeboxes: flex.shoebox, filter_spots
 ) -> flex.reflection_table:
@@ -484,9 +514,20 @@ def _find_spots(self, imageset):
         # The indices to iterate over
         indices = list(range(len(imageset)))
 
-        # Initialise the pixel labeller
+        # Initialise the pixel labellers, which create the spot shoeboxes as
+        # each spot is completed rather than after all images are processed
         num_panels = len(imageset.get_detector())
-        pixel_labeller = [PixelListLabeller() for p in range(num_panels)]
+        twod = _label_in_2d(imageset)
+        pixel_labeller = [
+            StreamingPixelListLabeller(
+                panel=p,
+                twod=twod,
+                min_spot_size=self.min_spot_size,
+                max_spot_size=self.max_spot_size,
+                find_hot_pixels=self.write_hot_pixel_mask,
+            )
+            for p in range(num_panels)
+        ]
 
         # Do the processing
         logger.info("Extracting strong pixels from images")
@@ -524,14 +565,19 @@ def process_output(result):
                     plabeller.add(plist)
                 result.clear()
 
-        # Create shoeboxes from pixel list
-        return pixel_list_to_reflection_table(
-            imageset,
+        # Collect the spot shoeboxes and create the reflection table. The filters
+        # are applied to all of the spots together, as some (e.g. the spot
+        # density filter) depend on the distribution of all spots.
+        shoeboxes, hot_pixels = streaming_labeller_to_shoeboxes(
             pixel_labeller,
-            filter_spots=self.filter_spots,
             min_spot_size=self.min_spot_size,
             max_spot_size=self.max_spot_size,
-            write_hot_pixel_mask=self.write_hot_pixel_mask,
+        )
+        return (
+            shoeboxes_to_reflection_table(
+                imageset, shoeboxes, filter_spots=self.filter_spots
+            ),
+            hot_pixels,
         )
 
     def _find_spots_2d_no_shoeboxes(self, imageset):
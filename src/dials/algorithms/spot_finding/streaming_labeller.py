@@ -0,0 +1,274 @@
+"""
+Label strong pixels as spots frame by frame, emitting each spot as soon as it
+is complete.
+
+The PixelListLabeller collects the strong pixels of every image of a sweep
+before labelling the connected components, so its memory use grows with the
+length of the sweep. A spot can only extend onto the next frame through a
+pixel with the same (x, y) position, so once a frame has been added, any spot
+with no pixels on that frame is complete. The StreamingPixelListLabeller
+labels each frame as it is added, joins the labels to those of the spots
+still open on the previous frame, and converts the spots that have been
+completed into shoeboxes. Only the pixels of the open spots are kept, so the
+memory use depends on the number of spots in the window of frames rather than
+on the length of the sweep.
+
+The shoeboxes are the same, and are returned in the same order, as those
+created by a PixelListShoeboxCreator from a PixelListLabeller with all of the
+pixels (i.e. ordered by the position of the first pixel of each spot).
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from dxtbx import flumpy
+
+from dials.array_family import flex
+from dials.model.data import PixelList, PixelListLabeller
+
+
+class _Frame:
+    """The pixels of the open spots on one frame."""
+
+    def __init__(self, frame, index, value, label):
+        self.frame = frame
+        self.index = index
+        self.value = value
+        self.label = label
+
+    def select(self, selection):
+        return _Frame(
+            self.frame,
+            self.index[selection],
+            self.value[selection],
+            self.label[selection],
+        )
+
+
+class StreamingPixelListLabeller:
+    """
+    Label the strong pixels of the consecutive images of one panel as spots,
+    creating the shoeboxes of the spots as they are completed.
+    """
+
+    def __init__(
+        self,
+        panel=0,
+        twod=False,
+        min_spot_size=1,
+        max_spot_size=20,
+        find_hot_pixels=False,
+    ):
+        """
+        Initialise the labeller.
+
+        :param panel: The panel number
+        :param twod: Label the spots on each image separately
+        :param min_spot_size: The minimum number of pixels in a spot
+        :param max_spot_size: The maximum number of pixels in a spot
+        :param find_hot_pixels: Find pixels which are strong on every image
+        """
+        assert 0 < min_spot_size < max_spot_size
+        self.panel = panel
+        self.twod = twod
+        self.min_spot_size = min_spot_size
+        self.max_spot_size = max_spot_size
+        self.find_hot_pixels = find_hot_pixels
+        self._size = None
+        self._next_frame = None
+        self._num_pixels = 0
+
+        # The pixels of the open spots, and the number of pixels in each spot
+        self._frames = []
+        self._spot_size = np.zeros(0, dtype=np.int64)
+
+        # The pixels which have been strong on every frame so far
+        self._hot_pixels = None
+
+        # The shoeboxes of the completed spots and their sort keys
+        self._shoeboxes = flex.shoebox()
+        self._keys = []
+        self.num_spots = 0
+        self.num_too_small = 0
+        self.num_too_large = 0
+
+    def num_pixels(self):
+        """The total number of strong pixels added"""
+        return self._num_pixels
+
+    def add(self, pixel_list):
+        """
+        Add the pixel list of the next frame, and create the shoeboxes of the
+        spots which are completed.
+
+        :param pixel_list: The PixelList of the next frame
+        """
+        frame = pixel_list.frame()
+        if self._next_frame is None:
+            self._size = pixel_list.size()
+        else:
+            assert frame == self._next_frame, "Frames must be consecutive"
+            assert tuple(pixel_list.size()) == tuple(self._size), "Inconsistent size"
+        self._next_frame = frame + 1
+        index = flumpy.to_numpy(pixel_list.index()).astype(np.int64)
+        value = flumpy.to_numpy(pixel_list.value()).copy()
+        self._num_pixels += len(index)
+
+        if self.find_hot_pixels:
+            if self._hot_pixels is None:
+                self._hot_pixels = index
+            else:
+                self._hot_pixels = np.intersect1d(
+                    self._hot_pixels, index, assume_unique=True
+                )
+
+        # Graph of the open spots (nodes 0 to n_open - 1) and the pixels of
+        # this frame (nodes n_open to n_open + n - 1)
+        n_open = len(self._spot_size)
+        n = len(index)
+        xsize = self._size[1]
+        first, second = [], []
+
+        # Join pixels to the next pixel along a row and the pixel below
+        right = np.flatnonzero(
+            (index[1:] == index[:-1] + 1) & (index[:-1] % xsize != xsize - 1)
+        )
+        first.append(right)
+        second.append(right + 1)
+        below = np.searchsorted(index, index + xsize)
+        has_below = below < n
+        has_below[has_below] = index[below[has_below]] == index[has_below] + xsize
+        first.append(np.flatnonzero(has_below))
+        second.append(below[has_below])
+
+        # Join the open spots to the pixels at the same position on this frame
+        linked = np.zeros(n_open, dtype=bool)
+        if n_open and not self.twod:
+            previous = self._frames[-1]
+            _, i_prev, i_this = np.intersect1d(
+                previous.index, index, assume_unique=True, return_indices=True
+            )
+            linked[previous.label[i_prev]] = True
+            first.append(previous.label[i_prev] - n_open)
+            second.append(i_this)
+
+        first = np.concatenate(first) + n_open
+        second = np.concatenate(second) + n_open
+        graph = sparse.coo_matrix(
+            (np.ones(len(first), dtype=np.int8), (first, second)),
+            shape=(n_open + n, n_open + n),
+        )
+        _, components = connected_components(graph, directed=False)
+
+        # Label the spots that remain open from 0
+        _, labels = np.unique(
+            np.concatenate((components[:n_open][linked], components[n_open:])),
+            return_inverse=True,
+        )
+        label_map = np.full(n_open, -1, dtype=np.int64)
+        label_map[linked] = labels[: np.count_nonzero(linked)]
+        label = labels[np.count_nonzero(linked) :]
+
+        self._complete_spots(~linked)
+        spot_size = np.bincount(label, minlength=labels.max(initial=-1) + 1)
+        np.add.at(spot_size, label_map[linked], self._spot_size[linked])
+        for f in self._frames:
+            f.label = label_map[f.label]
+        self._frames.append(_Frame(frame, index, value, label))
+        self._spot_size = spot_size
+
+        # The pixels of spots that are too large are not needed, except to
+        # find the pixels joined to them on the next frame
+        too_large = spot_size > self.max_spot_size
+        if too_large.any():
+            for i, f in enumerate(self._frames[:-1]):
+                self._frames[i] = f.select(~too_large[f.label])
+        while self._frames and len(self._frames[0].index) == 0:
+            del self._frames[0]
+
+    def finish(self):
+        """Complete all of the open spots at the end of the images."""
+        self._complete_spots(np.ones(len(self._spot_size), dtype=bool))
+        self._frames = []
+        self._spot_size = np.zeros(0, dtype=np.int64)
+
+    def _complete_spots(self, completed):
+        """
+        Create the shoeboxes for the open spots which are completed, and remove
+        their pixels from the open frames.
+
+        :param completed: A mask of the open spots which are completed
+        """
+        if not completed.any():
+            return
+        spot_size = self._spot_size[completed]
+        self.num_spots += len(spot_size)
+        self.num_too_small += np.count_nonzero(spot_size < self.min_spot_size)
+        self.num_too_large += np.count_nonzero(spot_size > self.max_spot_size)
+        accepted = completed & (self._spot_size >= self.min_spot_size)
+        accepted &= self._spot_size <= self.max_spot_size
+
+        # Split the pixels of the accepted spots from the open frames
+        frames = []
+        for i, f in enumerate(self._frames):
+            selection = accepted[f.label]
+            if selection.any():
+                frames.append(f.select(selection))
+            self._frames[i] = f.select(~completed[f.label])
+        if not frames:
+            return
+
+        # Label the pixels of just these spots to create the shoeboxes
+        labeller = PixelListLabeller()
+        by_frame = {f.frame: f for f in frames}
+        for frame in range(frames[0].frame, frames[-1].frame + 1):
+            if frame in by_frame:
+                f = by_frame[frame]
+                value = flumpy.from_numpy(f.value)
+                index = flumpy.from_numpy(f.index.astype(np.uint64))
+            else:
+                value, index = flex.double(), flex.size_t()
+            labeller.add(PixelList(frame, self._size, value, index))
+        creator = flex.PixelListShoeboxCreator(
+            labeller,
+            self.panel,
+            0,
+            self.twod,
+            self.min_spot_size,
+            self.max_spot_size,
+            False,
+        )
+        shoeboxes = creator.result()
+        assert shoeboxes.is_allocated().all_eq(True)
+
+        # The shoeboxes are ordered by the first pixel of each spot
+        npixels = self._size[0] * self._size[1]
+        keys = np.concatenate([f.frame * npixels + f.index for f in frames])
+        _, first_pixel = np.unique(
+            np.concatenate([f.label for f in frames]), return_index=True
+        )
+        keys = np.sort(keys[first_pixel])
+        assert len(keys) == len(shoeboxes)
+        self._shoeboxes.extend(shoeboxes)
+        self._keys.append(keys)
+
+    def shoeboxes(self):
+        """
+        :return: The shoeboxes of the completed spots, ordered by the position
+                 of the first pixel of each spot
+        """
+        if not self._keys:
+            return flex.shoebox()
+        order = np.argsort(np.concatenate(self._keys), kind="stable")
+        return self._shoeboxes.select(flumpy.from_numpy(order.astype(np.uint64)))
+
+    def hot_pixels(self):
+        """
+        :return: The indices of the pixels which are strong on every image
+        """
+        if not self.find_hot_pixels or not self._num_pixels:
+            return flex.size_t()
+        return flumpy.from_numpy(self._hot_pixels.astype(np.uint64))
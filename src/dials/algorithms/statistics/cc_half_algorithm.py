@@ -6,9 +6,11 @@
 from collections import defaultdict
 from math import sqrt
 
+import numpy as np
 from jinja2 import ChoiceLoader, Environment, PackageLoader
 
 from cctbx import uctbx
+from dxtbx import flumpy
 from iotbx import mtz
 
 from dials.algorithms.scaling.scale_and_filter import (
@@ -153,9 +155,20 @@ def read_mtzfile(filename, batch_offset=None):
 class CCHalfFromDials:
     """
     Run a cc-half algorithm using dials datafiles.
+
+    In image_group mode, the ΔCC½ statistics of a previous run (e.g. the
+    previous cycle of scaling and filtering) can be updated for the data that
+    remain, rather than being recomputed.
     """
 
-    def __init__(self, params, experiments, reflection_table):
+    def __init__(self, params, experiments, reflection_table, previous=None):
+        """
+        :param params: The compute_delta_cchalf parameters
+        :param experiments: The experiments
+        :param reflection_table: The combined reflection table of the experiments
+        :param previous: An optional CCHalfFromDials that has been run on the
+            data (or a superset of the data) in a previous cycle
+        """
         self.params = params
         self.experiments = experiments
         self.reflection_table = reflection_table
@@ -212,7 +225,27 @@ def __init__(self, params, experiments, reflection_table):
 
             table["group"] = image_groups
 
-        self.algorithm = DeltaCCHalf(table, unit_cell, space_group, params)
+        # Identify the observations, and the groups, of the previous run
+        statistics, group_map = None, None
+        self.identifier_index = {}
+        if self.params.mode == "image_group":
+            if previous is not None and previous.algorithm.statistics is not None:
+                statistics = previous.algorithm.statistics
+                self.identifier_index = dict(previous.identifier_index)
+                previous_groups = {
+                    v: k for k, v in previous.group_to_datasetid_and_range.items()
+                }
+                group_map = {
+                    group: previous_groups[v]
+                    for group, v in self.group_to_datasetid_and_range.items()
+                    if v in previous_groups
+                }
+            self.add_observation_keys(table, self.identifier_index)
+        del table["original_index"]
+
+        self.algorithm = DeltaCCHalf(
+            table, unit_cell, space_group, params, statistics, group_map
+        )
 
     def run(self):
         """Run the ΔCC½ algorithm and then exclude data as appropriate"""
@@ -423,6 +456,34 @@ def remove_image_ranges_below_cutoff(
         )
         return output_reflections
 
+    @staticmethod
+    def add_observation_keys(table, identifier_index):
+        """
+        Add an "observation_key" column, which identifies each observation by
+        its experiment identifier and its position in the input reflections of
+        the experiment, so that it can be matched between cycles.
+
+        :param table: A table from read_experiments
+        :param identifier_index: A dictionary of an index for each experiment
+            identifier, to which any new identifiers are added
+        """
+        identifiers = table.experiment_identifiers()
+        datasets, inverse = np.unique(
+            flumpy.to_numpy(table["dataset"]), return_inverse=True
+        )
+        dataset_index = np.array(
+            [
+                identifier_index.setdefault(identifiers[i], len(identifier_index))
+                for i in datasets.tolist()
+            ],
+            dtype=np.uint64,
+        )
+        index_in_experiment = flumpy.to_numpy(table["original_index"])
+        table["observation_key"] = flumpy.from_numpy(
+            (dataset_index[inverse.ravel()] << np.uint64(32))
+            + index_in_experiment.astype(np.uint64)
+        )
+
     @staticmethod
     def read_experiments(experiments, reflection_table):
         """
@@ -449,8 +510,21 @@ def read_experiments(experiments, reflection_table):
         else:
             mean_unit_cell = unit_cell_list[0]
 
+        # Record the position of each reflection in the reflections of its
+        # experiment, to identify the observations after filtering
+        ids = flumpy.to_numpy(reflection_table["id"])
+        order = np.argsort(ids, kind="stable")
+        index_in_experiment = np.empty(ids.size, dtype=np.uint64)
+        index_in_experiment[order] = np.arange(ids.size) - np.searchsorted(
+            ids[order], ids[order]
+        )
+        reflection_table["original_index"] = flumpy.from_numpy(index_in_experiment)
+
         # Require a dials scaled experiments file.
-        filtered_table = filter_reflection_table(reflection_table, ["scale"])
+        try:
+            filtered_table = filter_reflection_table(reflection_table, ["scale"])
+        finally:
+            del reflection_table["original_index"]
         filtered_table["intensity"] = filtered_table["intensity.scale.value"]
         filtered_table["variance"] = filtered_table["intensity.scale.variance"]
         filtered_table["dataset"] = filtered_table["id"]
@@ -466,11 +540,31 @@ class DeltaCCHalf:
     Implementation of a ΔCC½ algorithm.
     """
 
-    def __init__(self, reflection_table, median_unit_cell, space_group, params):
+    def __init__(
+        self,
+        reflection_table,
+        median_unit_cell,
+        space_group,
+        params,
+        statistics=None,
+        group_map=None,
+    ):
+        """
+        :param reflection_table: The reflection table, with a "group" column
+        :param median_unit_cell: The unit cell
+        :param space_group: The space group
+        :param params: The compute_delta_cchalf parameters
+        :param statistics: Optionally, the PerGroupCChalfStatistics of a previous
+            run to update for the reflection table, if possible
+        :param group_map: A dictionary of the group in the previous run for each
+            group in the reflection table
+        """
         self.reflection_table = reflection_table
         self.params = params
         self.median_unit_cell = median_unit_cell
         self.space_group = space_group
+        self.statistics = statistics
+        self._group_map = group_map
         self.delta_cchalf_i = {}
         self.results_summary = {
             "dataset_removal": {
@@ -493,16 +587,28 @@ def __init__(self, reflection_table, median_unit_cell, space_group, params):
     def run(self):
         """Run the delta_cc_half algorithm."""
 
-        statistics = PerGroupCChalfStatistics(
-            self.reflection_table,
-            self.median_unit_cell,
-            self.space_group,
-            self.params.dmin,
-            self.params.dmax,
-            self.params.nbins,
-        )
+        statistics = self.statistics
+        if (
+            statistics is not None
+            and statistics.mean_unit_cell.parameters()
+            == self.median_unit_cell.parameters()
+            and statistics.space_group == self.space_group
+            and statistics.update(self.reflection_table, self._group_map)
+        ):
+            logger.info("Updated the ΔCC½ statistics of the previous cycle")
+        else:
+            statistics = PerGroupCChalfStatistics(
+                self.reflection_table,
+                self.median_unit_cell,
+                self.space_group,
+                self.params.dmin,
+                self.params.dmax,
+                self.params.nbins,
+                nproc=self.params.nproc,
+            )
 
         statistics.run()
+        self.statistics = statistics
 
         self.delta_cchalf_i = statistics.delta_cchalf_i()
         self.results_summary["mean_cc_half"] = statistics._cchalf_mean
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import concurrent.futures
 import logging
-from collections import defaultdict
 from math import floor, sqrt
 
+import numpy as np
+
 from cctbx import crystal, miller
+from dxtbx import flumpy
 
 from dials.array_family import flex
 
@@ -69,89 +72,258 @@ def index(self, h):
             bin_index = 0
         return bin_index
 
+    def indices(self, d):
+        """
+        Get the bin indices from an array of d-spacings
+
+        :param d: A numpy array of d-spacings
+        :returns: A numpy array of bin indices
+        """
+        bin_index = np.floor((1.0 / np.square(d) - self._xmin) / self._bin_size)
+        return np.clip(bin_index, 0, self._nbins - 1).astype(np.int64)
 
-class ReflectionSum:
+
+def _mean_and_variance_of_mean(sum_x, sum_x2, n):
     """
-    A helper class to store sums of X and X**2
+    Compute the mean and the variance of the mean from the sums of X and X**2
+
+    :param sum_x: An array of the sum of X for each unique reflection
+    :param sum_x2: An array of the sum of X**2 for each unique reflection
+    :param n: An array of the number of observations of each unique reflection
+    :returns: Arrays of the mean and variance of the mean, and a boolean array
+        selecting the reflections with more than one observation (for which the
+        mean and variance are defined, these are zero otherwise)
     """
-
-    def __init__(self, sum_x=0, sum_x2=0, n=0):
-        self.sum_x = sum_x
-        self.sum_x2 = sum_x2
-        self.n = n
+    sel = n > 1
+    mean = np.zeros(n.size)
+    var = np.zeros(n.size)
+    n_sel = n[sel]
+    mean[sel] = sum_x[sel] / n_sel
+    var[sel] = (sum_x2[sel] - np.square(sum_x[sel]) / n_sel) / (n_sel - 1) / n_sel
+    return mean, var, sel
 
 
-class BinData:
+def compute_mean_cchalf_from_bin_sums(count, sum_mean, sum_mean2, sum_var):
     """
-    A helper class to store mean and variance
+    Compute the CC 1/2 using the formula from Assmann, Brehm and Diederichs 2016,
+    from the sums of the mean intensities, the squared mean intensities and the
+    variances of the half-dataset mean intensities in each resolution bin, and
+    then compute the mean CC 1/2 weighted by the number of reflections per bin.
+
+    The mean intensities may be offset by a constant per bin to reduce rounding
+    errors, as the CC 1/2 is independent of such an offset. The input arrays
+    can have any leading shape, the last axis is taken as the resolution bins.
+
+    :param count: The number of unique reflections in each bin
+    :param sum_mean: The sum of the mean intensities in each bin
+    :param sum_mean2: The sum of the squared mean intensities in each bin
+    :param sum_var: The sum of the variances on the mean intensities in each bin
+    :returns: The mean CC 1/2 (zero if no bin contains more than one reflection)
+    """
+    valid = count > 1
+    n = np.where(valid, count, 2)
+    sigma_y = (sum_mean2 - np.square(sum_mean) / n) / (n - 1)
+    sigma_e = sum_var / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cchalf = np.where(valid, (sigma_y - sigma_e) / (sigma_y + sigma_e), 0.0)
+    weights = np.where(valid, count, 0)
+    total = np.sum(weights, axis=-1)
+    return np.sum(weights * cchalf, axis=-1) / np.where(total > 0, total, 1)
+
+
+class GroupedReflectionSums:
+    """
+    Array-backed sums of X and X**2 for the unique reflections of a dataset,
+    overall and split into groups, from which the CC 1/2 of the whole dataset and
+    the CC 1/2 with each group excluded are computed in a single vectorised pass.
+
+    The per-group partial sums are stored for each (group, unique reflection)
+    pair present in the data, so that the memory and time required scale with
+    the number of observations rather than with groups x unique reflections.
+
+    The assignment of each observation to a unique reflection and group is
+    kept, so that the sums can be updated for the removal of observations and
+    for changes to their intensities (e.g. between cycles of scaling and
+    filtering) without repeating the assignment.
     """
 
-    def __init__(self):
-        self.mean = []
-        self.var = []
-
+    # The largest fraction of the observations that can change for the changes
+    # to be applied to the sums, above which the sums are recomputed
+    max_update_fraction = 0.1
 
-def compute_cchalf(mean, var):
-    """
-    Compute the CC 1/2 using the formular from Assmann, Brehm and Diederichs 2016
+    def __init__(self, unique_index, group_index, intensities, bin_index, nbins):
+        """
+        :param unique_index: An array of the unique reflection index (0 to
+            n_unique - 1) of each observation
+        :param group_index: An array of the group index (0 to n_groups - 1) of
+            each observation
+        :param intensities: An array of the intensity of each observation
+        :param bin_index: An array of the resolution bin of each unique reflection
+        :param nbins: The number of resolution bins
+        """
+        self.nbins = nbins
+        self.bin_index = bin_index
+        self.n_unique = bin_index.size
+        self.n_groups = int(group_index.max()) + 1 if group_index.size else 0
+
+        # The (group, unique reflection) pairs, sorted by group
+        pair_key = group_index.astype(np.int64) * self.n_unique + unique_index
+        pairs, pair_inverse = np.unique(pair_key, return_inverse=True)
+        self.pair_group = pairs // self.n_unique
+        self.pair_unique = pairs % self.n_unique
+
+        # The observations, for updating the sums
+        self._unique_index = unique_index
+        self._pair_index = pair_inverse.ravel()
+        self._intensities = np.asarray(intensities, dtype=np.float64)
+        self._present = np.ones(self._intensities.size, dtype=bool)
+        self._compute_sums()
+
+    def _compute_sums(self):
+        """
+        Compute the overall sums for each unique reflection, and the partial
+        sums for each (group, unique reflection) pair, of the observations
+        present.
+        """
+        intensities = self._intensities
+        intensities2 = np.square(intensities)
+        present = self._present.astype(np.int64)
+        n_pairs = self.pair_group.size
+        u = self._unique_index
+        p = self._pair_index
+        self.sum_x = np.bincount(u, intensities, minlength=self.n_unique)
+        self.sum_x2 = np.bincount(u, intensities2, minlength=self.n_unique)
+        self.n = np.bincount(u, present, minlength=self.n_unique).astype(np.int64)
+        self.pair_sum_x = np.bincount(p, intensities, minlength=n_pairs)
+        self.pair_sum_x2 = np.bincount(p, intensities2, minlength=n_pairs)
+        self.pair_n = np.bincount(p, present, minlength=n_pairs).astype(np.int64)
+
+    def update(self, present, intensities):
+        """
+        Update the sums for a change to the observations.
 
-    :param mean: The list of mean intensities
-    :param var: The list of variances on the half set of mean intensities
-    :returns: The CC 1/2
-    """
-    assert len(mean) == len(var)
-    n = len(mean)
-    mean_of_means = sum(mean) / n
-    sigma_e = sum(var) / n
-    sigma_y = sum((m - mean_of_means) ** 2 for m in mean) / (n - 1)
-    cchalf = (sigma_y - sigma_e) / (sigma_y + sigma_e)
-    return cchalf
+        If only a small fraction of the observations have been removed (or
+        restored) or have changed intensity, the changes for just these
+        observations are applied to the sums, otherwise (e.g. after the data
+        have been rescaled) the sums are recomputed.
 
+        :param present: A boolean array selecting which of the observations
+            given on initialisation are present
+        :param intensities: An array of the current intensity of each of the
+            observations given on initialisation (ignored if not present)
+        """
+        intensities = np.where(present, intensities, 0.0)
+        previous = self._intensities
+        previous_present = self._present
+        changed = np.flatnonzero(
+            (present != previous_present) | (intensities != previous)
+        )
+        self._intensities = intensities
+        self._present = present.copy()
+        if changed.size > self.max_update_fraction * present.size:
+            self._compute_sums()
+        elif changed.size:
+            dx = intensities[changed] - previous[changed]
+            dx2 = np.square(intensities[changed]) - np.square(previous[changed])
+            dn = present[changed].astype(np.int64) - previous_present[changed]
+            u = self._unique_index[changed]
+            p = self._pair_index[changed]
+            np.add.at(self.sum_x, u, dx)
+            np.add.at(self.sum_x2, u, dx2)
+            np.add.at(self.n, u, dn)
+            np.add.at(self.pair_sum_x, p, dx)
+            np.add.at(self.pair_sum_x2, p, dx2)
+            np.add.at(self.pair_n, p, dn)
+
+    def n_observations_per_group(self):
+        """
+        :returns: An array of the number of observations present in each group
+        """
+        counts = np.bincount(self.pair_group, self.pair_n, minlength=self.n_groups)
+        return counts.astype(np.int64)
+
+    def _bin_sums(self):
+        """Return the per-bin sums for the whole dataset, and the per-bin offsets
+        subtracted from the mean intensities."""
+        mean, var, sel = _mean_and_variance_of_mean(self.sum_x, self.sum_x2, self.n)
+        bins = self.bin_index[sel]
+        count = np.bincount(bins, minlength=self.nbins)
+        offset = np.bincount(bins, mean[sel], minlength=self.nbins) / np.maximum(
+            count, 1
+        )
+        dmean = mean[sel] - offset[bins]
+        sums = (
+            count,
+            np.bincount(bins, dmean, minlength=self.nbins),
+            np.bincount(bins, np.square(dmean), minlength=self.nbins),
+            np.bincount(bins, var[sel], minlength=self.nbins),
+        )
+        return sums, offset
 
-def compute_mean_cchalf_in_bins(bin_data):
-    """
-    Compute the mean cchalf averaged across resolution bins
+    def cchalf(self):
+        """
+        :returns: The mean CC 1/2 of the whole dataset
+        """
+        sums, _ = self._bin_sums()
+        return float(compute_mean_cchalf_from_bin_sums(*sums))
 
-    :param bin_data: The mean and variance in each bin
-    :returns: The mean CC 1/2
-    """
-    mean_cchalf = 0
-    count = 0
-    for bin_i in bin_data:
-        mean = bin_i.mean
-        var = bin_i.var
-        n = len(mean)
-        if n > 1:
-            cchalf = compute_cchalf(mean, var)
-            mean_cchalf += n * cchalf
-            count += n
-    if count:
-        mean_cchalf /= count
-    return mean_cchalf
-
-
-def compute_cchalf_from_reflection_sums(reflection_sums, binner):
-    """
-    Compute the CC 1/2 by computing the CC 1/2 in resolution bins and then
-    computing the weighted mean of the binned CC 1/2 values
-    """
-    # Compute Mean and variance of reflection intensities
-    bin_data = [BinData() for _ in range(binner.nbins())]
-    for h in reflection_sums:
-        sum_x = reflection_sums[h].sum_x
-        sum_x2 = reflection_sums[h].sum_x2
-        n = reflection_sums[h].n
+    def cchalf_excluding_each_group(self, nproc=1):
+        """
+        Compute the CC 1/2 of the dataset with each group excluded in turn.
 
-        if n > 1:
-            mean = sum_x / n
-            var = (sum_x2 - (sum_x) ** 2 / n) / (n - 1)
-            var = var / n
-            index = binner.index(h)
-            bin_data[index].mean.append(mean)
-            bin_data[index].var.append(var)
+        For each (group, unique reflection) pair, the change to the per-bin sums
+        on removing the group's contribution to that reflection is computed, and
+        these changes are accumulated per group and added to the overall bin sums.
 
-    # Compute the mean cchalf in resolution bins
-    return compute_mean_cchalf_in_bins(bin_data)
+        :param nproc: The number of processes over which to split the groups
+        :returns: An array of the mean CC 1/2 excluding each group
+        """
+        sums, offset = self._bin_sums()
+        if nproc > 1 and self.n_groups > 1:
+            boundaries = np.linspace(0, self.n_groups, min(nproc, self.n_groups) + 1)
+            group_ranges = list(
+                zip(boundaries[:-1].astype(int), boundaries[1:].astype(int))
+            )
+            with concurrent.futures.ProcessPoolExecutor(max_workers=nproc) as pool:
+                results = pool.map(
+                    self._cchalf_excluding_groups,
+                    group_ranges,
+                    [sums] * len(group_ranges),
+                    [offset] * len(group_ranges),
+                )
+                return np.concatenate(list(results))
+        return self._cchalf_excluding_groups((0, self.n_groups), sums, offset)
+
+    def _cchalf_excluding_groups(self, group_range, sums, offset):
+        """Compute the CC 1/2 excluding each of the groups in a range of groups."""
+        first, last = group_range
+        start, end = np.searchsorted(self.pair_group, [first, last])
+        u = self.pair_unique[start:end]
+        mean_old, var_old, sel_old = _mean_and_variance_of_mean(
+            self.sum_x[u], self.sum_x2[u], self.n[u]
+        )
+        mean_new, var_new, sel_new = _mean_and_variance_of_mean(
+            self.sum_x[u] - self.pair_sum_x[start:end],
+            self.sum_x2[u] - self.pair_sum_x2[start:end],
+            self.n[u] - self.pair_n[start:end],
+        )
+        bins = self.bin_index[u]
+        dmean_old = np.where(sel_old, mean_old - offset[bins], 0.0)
+        dmean_new = np.where(sel_new, mean_new - offset[bins], 0.0)
+        key = (self.pair_group[start:end] - first) * self.nbins + bins
+        size = (last - first) * self.nbins
+        deltas = (
+            sel_new.astype(np.int64) - sel_old.astype(np.int64),
+            dmean_new - dmean_old,
+            np.square(dmean_new) - np.square(dmean_old),
+            var_new - var_old,
+        )
+        group_sums = [
+            total + np.bincount(key, delta, minlength=size).reshape(-1, self.nbins)
+            for total, delta in zip(sums, deltas)
+        ]
+        group_sums[0] = np.rint(group_sums[0]).astype(np.int64)
+        return compute_mean_cchalf_from_bin_sums(*group_sums)
 
 
 class PerGroupCChalfStatistics:
@@ -163,6 +335,7 @@ def __init__(
         d_min=None,
         d_max=None,
         n_bins=10,
+        nproc=1,
     ):
         # here dataset is the sweep number, group is the group number for doing
         # the cc half analysis. May be the same as dataset if doing per dataset
@@ -173,6 +346,8 @@ def __init__(
         self.d_min = d_min
         self.d_max = d_max
         self._num_bins = n_bins
+        self._nproc = nproc
+        self._d_range = (d_min, d_max)
         self.reflection_table = reflection_table
         self._cchalf_mean = None
         self._cchalf = None
@@ -193,30 +368,52 @@ def __init__(
             self.d_max = flex.max(self.reflection_table["d"])
         self.binner = ResolutionBinner(mean_unit_cell, self.d_min, self.d_max, n_bins)
 
-        self.reflection_sums = defaultdict(ReflectionSum)
         self.compute_overall_stats()
 
     def compute_overall_stats(self):
-        # Create lookups for elements by miller index
-        index_lookup = defaultdict(list)
-        for i, h in enumerate(self.reflection_table["miller_index"]):
-            index_lookup[h].append(i)
-
-        # Compute the Overall Sum(X) and Sum(X^2) for each unique reflection
+        # Assign each observation to a unique reflection and to a group
+        hkl = flumpy.to_numpy(
+            self.reflection_table["miller_index"].as_vec3_double()
+        ).astype(np.int64)
+        _, first_index, unique_index = np.unique(
+            hkl, axis=0, return_index=True, return_inverse=True
+        )
+        groups, group_index = np.unique(
+            flumpy.to_numpy(self.reflection_table["group"]), return_inverse=True
+        )
+        self._group_index = {group: i for i, group in enumerate(groups.tolist())}
+        # Bin each unique reflection by its d-spacing in the mean unit cell
+        unique_hkl = self.reflection_table["miller_index"].select(
+            flumpy.from_numpy(first_index.astype(np.uint64))
+        )
+        d = flumpy.to_numpy(self.mean_unit_cell.d(unique_hkl))
+
+        # Keep what is needed to update the sums for a subset of the observations
+        self._observations = None
+        if "observation_key" in self.reflection_table:
+            keys = flumpy.to_numpy(self.reflection_table["observation_key"])
+            order = np.argsort(keys, kind="stable")
+            if np.all(np.diff(keys[order]) > 0):
+                self._observations = (keys[order], order, hkl, group_index.ravel())
+
+        # Compute the overall and per-group Sum(X) and Sum(X^2) for each unique
+        # reflection
+        self.reflection_sums = GroupedReflectionSums(
+            unique_index.ravel(),
+            group_index.ravel(),
+            flumpy.to_numpy(self.reflection_table["intensity"]),
+            self.binner.indices(d),
+            self.binner.nbins(),
+        )
 
-        for h in index_lookup:
-            sel = flex.size_t(index_lookup[h])
-            intensities = self.reflection_table["intensity"].select(sel)
-            n = intensities.size()
-            sum_x = flex.sum(intensities)
-            sum_x2 = flex.sum(flex.pow2(intensities))
-            self.reflection_sums[h] = ReflectionSum(sum_x, sum_x2, n)
+        self._log_summary()
 
+    def _log_summary(self):
         # Compute some numbers
         self._num_datasets = len(set(self.reflection_table["dataset"]))
         self._num_groups = len(set(self.reflection_table["group"]))
         self._num_reflections = self.reflection_table.size()
-        self._num_unique = len(self.reflection_sums)
+        self._num_unique = int(np.count_nonzero(self.reflection_sums.n))
 
         logger.info(
             """
@@ -231,14 +428,90 @@ def compute_overall_stats(self):
             self._num_unique,
         )
 
-    def map_to_asu(self):
+    def update(self, reflection_table, group_map):
+        """
+        Update the statistics for a reflection table containing a subset of the
+        observations of the current table, with updated intensities, e.g. after
+        a cycle of filtering and scaling.
+
+        The observations are matched by the "observation_key" column. Rather
+        than being recomputed, the overall and per-group sums are updated for
+        the observations that have been removed or whose intensities have
+        changed. The statistics can only be updated if the observations of the
+        new table all have a match with the same Miller index and group, and
+        the resolution bins are unchanged.
+
+        :param reflection_table: The new reflection table
+        :param group_map: A dictionary of the current group of each of the
+            groups of the new reflection table
+        :returns: True if the statistics were updated, False if the statistics
+            must be recomputed for the new reflection table
+        """
+        if self._observations is None or "observation_key" not in reflection_table:
+            return False
+        sorted_keys, order, hkl, group_index = self._observations
+        for r in ("miller_index", "intensity", "variance", "dataset", "group"):
+            if r not in reflection_table:
+                raise KeyError(f"Column {r} not present in reflection table")
+        self.map_to_asu(reflection_table)
+        if self._d_range[0] is None:
+            if flex.min(reflection_table["d"]) != self.d_min:
+                return False
+        if self._d_range[1] is None:
+            if flex.max(reflection_table["d"]) != self.d_max:
+                return False
+
+        # Find the observations of the new table
+        keys = flumpy.to_numpy(reflection_table["observation_key"])
+        position = np.minimum(np.searchsorted(sorted_keys, keys), sorted_keys.size - 1)
+        if keys.size > sorted_keys.size or np.any(sorted_keys[position] != keys):
+            return False
+        observation = order[position]
+        if np.unique(observation).size != observation.size:
+            return False
+        new_hkl = flumpy.to_numpy(
+            reflection_table["miller_index"].as_vec3_double()
+        ).astype(np.int64)
+        if np.any(hkl[observation] != new_hkl):
+            return False
+        groups, new_group_index = np.unique(
+            flumpy.to_numpy(reflection_table["group"]), return_inverse=True
+        )
+        try:
+            group_map = {group: group_map[group] for group in groups.tolist()}
+            current_index = np.array(
+                [self._group_index[group_map[group]] for group in groups.tolist()],
+                dtype=np.int64,
+            )
+        except KeyError:
+            return False
+        new_group_index = current_index[new_group_index.ravel()]
+        if np.any(group_index[observation] != new_group_index):
+            return False
+
+        present = np.zeros(order.size, dtype=bool)
+        present[observation] = True
+        intensities = np.zeros(order.size)
+        intensities[observation] = flumpy.to_numpy(reflection_table["intensity"])
+        self.reflection_sums.update(present, intensities)
+
+        self._group_index = {
+            group: self._group_index[previous] for group, previous in group_map.items()
+        }
+        self.reflection_table = reflection_table
+        self._log_summary()
+        return True
+
+    def map_to_asu(self, reflection_table=None):
         """Map the miller indices to the ASU"""
+        if reflection_table is None:
+            reflection_table = self.reflection_table
         # d = flex.double([self.mean_unit_cell.d(h) for h in reflection_table["miller_index"]])
         cs = crystal.symmetry(self.mean_unit_cell, space_group=self.space_group)
-        ms = miller.set(cs, self.reflection_table["miller_index"], anomalous_flag=False)
+        ms = miller.set(cs, reflection_table["miller_index"], anomalous_flag=False)
         ms_asu = ms.map_to_asu()
-        self.reflection_table["miller_index"] = ms_asu.indices()
-        self.reflection_table["d"] = ms_asu.d_spacings().data()
+        reflection_table["miller_index"] = ms_asu.indices()
+        reflection_table["d"] = ms_asu.d_spacings().data()
 
     def d_filter(self):
         """Filter on d_min, d_max"""
@@ -254,55 +527,28 @@ def d_filter(self):
 
     def run(self):
         """Compute the ΔCC½ for all the data"""
-        self._cchalf_mean = compute_cchalf_from_reflection_sums(
-            self.reflection_sums, self.binner
-        )
+        self._cchalf_mean = self.reflection_sums.cchalf()
         logger.info("CC 1/2 mean: %.3f", (100 * self._cchalf_mean))
         self._cchalf = self._compute_cchalf_excluding_each_group()
 
     def _compute_cchalf_excluding_each_group(self):
-        #   self, reflection_sums, binner, miller_index, dataset, intensity
-        # ):
         """
-        Compute the CC 1/2 with an image excluded.
+        Compute the CC 1/2 with each group excluded.
 
-        For each image, update the sums by removing the contribution from the image
-        and then compute the CC 1/2 of the remaining data
+        For each group, the sums are updated by removing the contribution from the
+        group and the CC 1/2 of the remaining data is computed; this is done for
+        all groups at once from the per-group partial sums.
         """
-
-        # Create a lookup table for each reflection by dataset i.e. group of images
-        dataset_lookup = defaultdict(list)
-        for i, b in enumerate(self.reflection_table["group"]):
-            dataset_lookup[b].append(i)
-
-        # Compute CC1/2 minus each dataset
+        cchalf_excluding_group = self.reflection_sums.cchalf_excluding_each_group(
+            self._nproc
+        )
+        n_observations = self.reflection_sums.n_observations_per_group()
         cchalf_i = {}
-        for dataset in dataset_lookup:
-            # Find all observations from this dataset and create a lookup based on
-            # miller index
-            index_lookup = defaultdict(list)
-            for i in dataset_lookup[dataset]:
-                index_lookup[self.reflection_table["miller_index"][i]].append(i)
-
-            # Loop through all the reflections and remove the contribution of
-            # reflections from the current dataset
-            dataset_reflection_sums = defaultdict(ReflectionSum)
-            for h in self.reflection_sums:
-                sum_x = self.reflection_sums[h].sum_x
-                sum_x2 = self.reflection_sums[h].sum_x2
-                n = self.reflection_sums[h].n
-                for i in index_lookup[h]:
-                    sum_x -= self.reflection_table["intensity"][i]
-                    sum_x2 -= self.reflection_table["intensity"][i] ** 2
-                    n -= 1
-                dataset_reflection_sums[h] = ReflectionSum(sum_x, sum_x2, n)
-
-            # Compute the CC 1/2 without the reflections from the current dataset
-            cchalf = compute_cchalf_from_reflection_sums(
-                dataset_reflection_sums, self.binner
-            )
-            cchalf_i[dataset] = cchalf
-            logger.info("CC 1/2 excluding group %d: %.3f", dataset, 100 * cchalf)
+        for group, i in sorted(self._group_index.items()):
+            if not n_observations[i]:
+                continue
+            cchalf_i[group] = float(cchalf_excluding_group[i])
+            logger.info("CC 1/2 excluding group %d: %.3f", group, 100 * cchalf_i[group])
 
         return cchalf_i
 
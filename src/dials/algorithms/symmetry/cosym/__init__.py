@@ -8,12 +8,15 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import json
 import logging
 import math
+import multiprocessing
 from typing import List, Optional
 
 import numpy as np
+import scipy.optimize
 from sklearn.neighbors import NearestNeighbors
 
 import iotbx.phil
@@ -96,6 +99,13 @@
   .help = 'Minimum number of pairs for inclusion of correlation coefficient in calculation of Rij matrix.'
   .short_caption = "Minimum number of pairs"
 
+sparse_matrices = False
+  .type = bool
+  .help = "Store the Rij and Wij matrices as sparse matrices, and evaluate the"
+          "target function using sparse matrix operations. This reduces the memory"
+          "required for large numbers of datasets with few pairwise overlaps."
+  .short_caption = "Sparse Rij/Wij matrices"
+
 minimization
   .short_caption = "Minimization"
 {
@@ -108,6 +118,13 @@
   max_calls = None
     .type = int(value_min=0)
     .short_caption = "Maximum number of calls"
+  n_random_starts = 1
+    .type = int(value_min=1)
+    .help = "The number of minimisations to run from different random starting"
+            "coordinates, for each number of dimensions tested and for the final"
+            "minimisation. The solution with the lowest functional is used. The"
+            "minimisations are run in parallel if nproc > 1."
+    .short_caption = "Number of random starts"
 }
 
 nproc = Auto
@@ -117,6 +134,46 @@
 )
 
 
+# The cosym target of the forked worker processes used for the minimisations.
+_worker_target = {}
+
+
+def _initialise_minimisation_worker(target):
+    _worker_target["target"] = target
+
+
+def _minimise(
+    target, engine, dimensions, coords, use_curvatures, max_iterations, max_calls
+):
+    """Minimise the target function for the given number of dimensions, from the
+    given starting coordinates."""
+    target.set_dimensions(dimensions)
+    if engine == "scitbx":
+        return cosym_engine.minimize_scitbx_lbfgs(
+            target,
+            coords,
+            use_curvatures=use_curvatures,
+            max_iterations=max_iterations,
+            max_calls=max_calls,
+        )
+    return cosym_engine.minimize_scipy(
+        target,
+        coords,
+        method="L-BFGS-B",
+        max_iterations=max_iterations,
+        max_calls=max_calls,
+    )
+
+
+def _minimise_in_worker(*args):
+    """Run a minimisation in a worker process, returning only the parts of the
+    result that are used."""
+    result = _minimise(_worker_target["target"], *args)
+    return scipy.optimize.OptimizeResult(
+        fun=result.fun, jac=result.jac, x=result.x, nfev=result.nfev
+    )
+
+
 class CosymAnalysis(symmetry_base, Subject):
     """Perform cosym analysis.
 
@@ -263,6 +320,7 @@ def _intialise_target(self):
             weights=self.params.weights,
             cc_weights=self.params.cc_weights,
             nproc=self.params.nproc,
+            sparse_matrices=self.params.sparse_matrices,
         )
 
     def _determine_dimensions(self):
@@ -273,19 +331,15 @@ def _determine_dimensions(self):
             logger.info(
                 "\nAutomatic determination of number of dimensions for analysis"
             )
-            dimensions = []
-            functional = []
-            for dim in range(1, self.target.dim + 1):
-                logger.debug("Testing dimension: %i", dim)
-                self.target.set_dimensions(dim)
-                max_calls = self.params.minimization.max_calls
-                self._optimise(
-                    self.params.minimization.engine,
-                    max_iterations=self.params.minimization.max_iterations,
-                    max_calls=min(20, max_calls) if max_calls else max_calls,
-                )
-                dimensions.append(dim)
-                functional.append(self.minimizer.fun)
+            dimensions = list(range(1, self.target.dim + 1))
+            max_calls = self.params.minimization.max_calls
+            results = self._minimise_best_of_random_starts(
+                self.params.minimization.engine,
+                dimensions,
+                max_iterations=self.params.minimization.max_iterations,
+                max_calls=min(20, max_calls) if max_calls else max_calls,
+            )
+            functional = [result.fun for result in results]
 
             # Find the elbow point of the curve, in the same manner as that used by
             # distl spotfinder for resolution method 1 (Zhang et al 2006).
@@ -338,28 +392,85 @@ def _optimise(self, engine, max_iterations=None, max_calls=None):
         NN = len(set(self.dataset_ids))
         n_sym_ops = len(self.target.sym_ops)
 
-        coords = np.random.rand(NN * n_sym_ops * self.target.dim)
-        if engine == "scitbx":
-            self.minimizer = cosym_engine.minimize_scitbx_lbfgs(
-                self.target,
-                coords,
-                use_curvatures=self.params.use_curvatures,
-                max_iterations=max_iterations,
-                max_calls=max_calls,
-            )
-        else:
-            self.minimizer = cosym_engine.minimize_scipy(
-                self.target,
-                coords,
-                method="L-BFGS-B",
-                max_iterations=max_iterations,
-                max_calls=max_calls,
-            )
+        (self.minimizer,) = self._minimise_best_of_random_starts(
+            engine,
+            [self.target.dim],
+            max_iterations=max_iterations,
+            max_calls=max_calls,
+        )
 
         self.coords = self.minimizer.x.reshape(
             self.target.dim, NN * n_sym_ops
         ).transpose()
 
+    def _minimise_best_of_random_starts(
+        self, engine, dimensions, max_iterations=None, max_calls=None
+    ):
+        """Minimise the target function for each number of dimensions.
+
+        For each number of dimensions, minimisations are run from
+        minimization.n_random_starts sets of random starting coordinates. If
+        nproc > 1, all of the minimisations are run concurrently in forked worker
+        processes, which share the (read-only) rij and wij matrices of the
+        target with the main process. The random starting coordinates are
+        generated in the main process, so that the results do not depend on
+        nproc.
+
+        Args:
+          engine (str): The minimisation engine, scitbx or scipy.
+          dimensions (List[int]): The numbers of dimensions.
+          max_iterations (int): The maximum number of iterations.
+          max_calls (int): The maximum number of function calls.
+
+        Returns:
+          List[scipy.optimize.OptimizeResult]: The result with the lowest
+          functional for each number of dimensions. The target is left set to
+          the last number of dimensions.
+        """
+        NN = len(set(self.dataset_ids))
+        n_sym_ops = len(self.target.sym_ops)
+        n_starts = self.params.minimization.n_random_starts
+        tasks = [
+            (
+                engine,
+                dim,
+                np.random.rand(NN * n_sym_ops * dim),
+                self.params.use_curvatures,
+                max_iterations,
+                max_calls,
+            )
+            for dim in dimensions
+            for _ in range(n_starts)
+        ]
+
+        nproc = min(self.params.nproc, len(tasks))
+        if nproc > 1 and "fork" in multiprocessing.get_all_start_methods():
+            logger.debug(
+                "Running %i minimisations with %i processes", len(tasks), nproc
+            )
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=nproc,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_initialise_minimisation_worker,
+                initargs=(self.target,),
+            ) as pool:
+                results = list(pool.map(_minimise_in_worker, *zip(*tasks)))
+            self.target.set_dimensions(dimensions[-1])
+        else:
+            results = [_minimise(self.target, *task) for task in tasks]
+
+        best = []
+        for i, dim in enumerate(dimensions):
+            dim_results = results[i * n_starts : (i + 1) * n_starts]
+            functional = [result.fun for result in dim_results]
+            logger.debug(
+                "Dimension %i functional: %s",
+                dim,
+                ", ".join(f"{f:.6g}" for f in functional),
+            )
+            best.append(dim_results[int(np.argmin(functional))])
+        return best
+
     def _principal_component_analysis(self):
         # Perform PCA
         from sklearn.decomposition import PCA
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import numpy as np
+from scipy import sparse
 
 
 def plot_coords(coords, labels=None, key="cosym_coordinates"):
@@ -72,8 +73,12 @@ def plot_rij_histogram(rij_matrix, key="cosym_rij_histogram"):
       plot_name (str): The file name to save the plot to.
         If this is not defined then the plot is displayed in interactive mode.
     """
+    if sparse.issparse(rij_matrix):
+        rij_values = rij_matrix.data[rij_matrix.data != 0]
+    else:
+        rij_values = rij_matrix[rij_matrix != 0]
     hist, bin_edges = np.histogram(
-        rij_matrix[rij_matrix != 0],
+        rij_values,
         bins=100,
         range=(min(-1, rij_matrix.min()), max(1, rij_matrix.max())),
     )
@@ -4,11 +4,9 @@
 
 import concurrent.futures
 import copy
-import itertools
 import logging
 
 import numpy as np
-import pandas as pd
 from orderedset import OrderedSet
 from scipy import sparse
 
@@ -145,6 +143,75 @@ def _compute_rij_matrix_one_row_block(
     return rij, wij
 
 
+# The sparse (lattices x sym ops, unique miller indices) intensity matrix used by
+# the worker processes computing the rij matrix, with the matrices of the squared
+# intensities and of the presence of each intensity, which are shared by every
+# block of rows.
+_worker_intensities = {}
+
+
+def _initialise_rij_worker(intensities):
+    present = intensities.copy()
+    present.data[:] = 1.0
+    squared = intensities.copy()
+    squared.data **= 2
+    _worker_intensities["values"] = intensities
+    _worker_intensities["present"] = present
+    _worker_intensities["squared"] = squared
+    # The transposes, converted once to the row format used in the products
+    _worker_intensities["values_T"] = intensities.T.tocsr()
+    _worker_intensities["present_T"] = present.T.tocsr()
+    _worker_intensities["squared_T"] = squared.T.tocsr()
+
+
+def _compute_pairwise_cc_one_row_block(start, stop, min_pairs):
+    """Compute the pairwise correlation coefficients for a block of rows.
+
+    The correlation between two rows of the sparse intensity matrix is calculated
+    from the intensities of the miller indices present in both rows, using sums
+    over the common indices obtained from sparse matrix products.
+
+    Args:
+      start (int): The first row of the block.
+      stop (int): The end of the block of rows (exclusive).
+      min_pairs (int): The minimum number of common miller indices required to
+        calculate a correlation coefficient.
+
+    Returns:
+      Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The row and column
+      indices, the number of common miller indices and the correlation
+      coefficients of the pairs with at least min_pairs common indices. The
+      correlation coefficient is zero if it is undefined.
+    """
+    values_b = _worker_intensities["values"][start:stop]
+    present_b = _worker_intensities["present"][start:stop]
+    squared_b = _worker_intensities["squared"][start:stop]
+    values_t = _worker_intensities["values_T"]
+    present_t = _worker_intensities["present_T"]
+    squared_t = _worker_intensities["squared_T"]
+    n_common = (present_b @ present_t).tocoo()
+    rows = n_common.row
+    cols = n_common.col
+    n = n_common.data
+    sel = (n >= min_pairs) & (rows + start != cols)
+    rows, cols, n = rows[sel], cols[sel], n[sel]
+
+    def sample(m):
+        return np.asarray(m.tocsr()[rows, cols]).ravel()
+
+    sum_x = sample(values_b @ present_t)
+    sum_y = sample(present_b @ values_t)
+    sum_xx = sample(squared_b @ present_t)
+    sum_yy = sample(present_b @ squared_t)
+    sum_xy = sample(values_b @ values_t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cc = (n * sum_xy - sum_x * sum_y) / np.sqrt(
+            (n * sum_xx - np.square(sum_x)) * (n * sum_yy - np.square(sum_y))
+        )
+    cc[~np.isfinite(cc)] = 0
+    return rows + start, cols, n, cc
+
+
 class Target:
     """Target function for cosym analysis.
 
@@ -162,6 +229,7 @@ def __init__(
         dimensions=None,
         nproc=1,
         cc_weights=None,
+        sparse_matrices=False,
     ):
         r"""Initialise a Target object.
 
@@ -185,12 +253,21 @@ def __init__(
             in the analysis. If not set, then the number of dimensions used is
             equal to the greater of 2 or the number of symmetry operations in the
             lattice group.
+          nproc (int): The number of processes to use when computing the rij
+            matrix.
+          cc_weights (str): Optionally use a sigma-weighted cc-half formula for the
+            pairwise correlation coefficients. Allowed values are `None` and
+            "sigma".
+          sparse_matrices (bool): Store the rij and wij matrices as
+            scipy.sparse.csr_matrix objects (with the same sparsity structure),
+            and evaluate the target function with sparse matrix operations.
         """
         if weights is not None:
             assert weights in ("count", "standard_error")
         self._weights = weights
         self._min_pairs = min_pairs
         self._nproc = nproc
+        self._sparse_matrices = sparse_matrices
 
         data = intensities.customized_copy(anomalous_flag=False)
         cb_op_to_primitive = data.change_of_basis_op_to_primitive_setting()
@@ -237,6 +314,7 @@ def __init__(
         logger.debug(
             "Patterson group: %s", self._patterson_group.info().symbol_and_number()
         )
+        self._sparse_element_cache = None
         if cc_weights == "sigma":
             self.rij_matrix, self.wij_matrix = self._compute_rij_wij_ccweights()
         else:
@@ -327,6 +405,20 @@ def _compute_rij_wij_ccweights(self):
                     else:
                         wij_matrix += wij
 
+        if self._sparse_matrices:
+            rij_matrix = rij_matrix.tocsr().astype(np.float64)
+            if wij_matrix is not None:
+                wij_matrix = wij_matrix.tocoo().astype(np.float64)
+                if self._weights == "standard_error":
+                    # As below, but only for the stored elements
+                    rij = np.asarray(rij_matrix[wij_matrix.row, wij_matrix.col]).ravel()
+                    sel = wij_matrix.data > 1
+                    se = np.sqrt((1 - np.square(rij[sel])) / (wij_matrix.data[sel] - 1))
+                    wij_matrix.data[~sel] = 0
+                    wij_matrix.data[sel] = 1 / se
+                wij_matrix = wij_matrix.tocsr()
+            return rij_matrix, wij_matrix
+
         rij_matrix = rij_matrix.toarray().astype(np.float64)
         if wij_matrix is not None:
             wij_matrix = wij_matrix.toarray().astype(np.float64)
@@ -341,7 +433,7 @@ def _compute_rij_wij_ccweights(self):
 
         return rij_matrix, wij_matrix
 
-    def _compute_rij_wij(self, use_cache=True):
+    def _compute_rij_wij(self):
         """Compute the rij_wij matrix.
 
         Rij is a symmetric matrix of size (n x m, n x m), where n is the number of
@@ -351,10 +443,12 @@ def _compute_rij_wij(self, use_cache=True):
         correlation coefficients between cb_op_k applied to datasets 1..N with
         cb_op_kk applied to datasets 1.. N.
 
-        If `use_cache=True`, then an optimisation is made to reflect the fact some elements
-        of the matrix are equivalent, i.e.:
-            CC[(a, cb_op_k), (b, cb_op_kk)] == CC[(a,), (b, cb_op_k.inverse() * cb_op_kk)]
-
+        The correlation coefficients are calculated from a sparse matrix of the
+        intensities of each dataset under each symmetry operation, using only the
+        miller indices common to each pair of rows, so that the memory required
+        scales with the number of observations and the number of overlapping pairs,
+        rather than with the size of the miller index grid. Blocks of rows are
+        processed in parallel if nproc > 1.
         """
         n_lattices = len(self._lattices)
         n_sym_ops = len(self.sym_ops)
@@ -387,72 +481,116 @@ def _compute_rij_wij(self, use_cache=True):
         for cb_op, hkl in indices.items():
             indices[cb_op] = np.ravel_multi_index((hkl + offset).T, dims)
 
-        # Create an empty 2D array of shape (m * n, L), where m is the number of sym
-        # ops, n is the number of lattices, and L is the number of unique miller indices
-        all_intensities = np.empty((n_sym_ops * n_lattices, np.prod(dims)))
-
-        # Populate all_intensities with intensity values, filling absent intensities
-        # with np.nan
-        all_intensities.fill(np.nan)
+        # Create a sparse 2D array of shape (m * n, L), where m is the number of sym
+        # ops, n is the number of lattices, and L is the number of unique miller
+        # indices present in the data (rather than the size of the full miller index
+        # grid), containing the intensity values of the observations with epsilon=1
         slices = np.append(self._lattices, intensities.size)
         slices = list(map(slice, slices[:-1], slices[1:]))
+        rows = []
+        columns = []
+        values = []
         for i, (mil_ind, eps) in enumerate(zip(indices.values(), epsilons.values())):
             for j, selection in enumerate(slices):
-                # map (i, j) to a column in all_intensities
-                column = np.ravel_multi_index((i, j), (n_sym_ops, n_lattices))
+                # map (i, j) to a row in the intensity matrix
+                row = np.ravel_multi_index((i, j), (n_sym_ops, n_lattices))
                 epsilon_equals_one = eps[selection] == 1
-                valid_mil_ind = mil_ind[selection][epsilon_equals_one]
-                valid_intensities = intensities[selection][epsilon_equals_one]
-                all_intensities[column, valid_mil_ind] = valid_intensities
-
-        # Ideally we would use `np.ma.corrcoef` here, but it is broken, so use
-        # pd.DataFrame.corr() instead (see numpy/numpy#15601)
-        rij = (
-            pd.DataFrame(all_intensities)
-            .T.dropna(how="all")
-            .corr(min_periods=self._min_pairs)
-            .values
+                columns.append(mil_ind[selection][epsilon_equals_one])
+                values.append(intensities[selection][epsilon_equals_one])
+                rows.append(np.full(columns[-1].size, row))
+        rows = np.concatenate(rows)
+        columns = np.concatenate(columns)
+        values = np.concatenate(values)
+        unique_columns, columns = np.unique(columns, return_inverse=True)
+        columns = columns.ravel()
+
+        # Offset the intensities in each row by their mean to reduce rounding errors
+        # in the correlation coefficients, which are independent of such an offset
+        NN = n_sym_ops * n_lattices
+        row_counts = np.bincount(rows, minlength=NN)
+        row_means = np.bincount(rows, values, minlength=NN) / np.maximum(row_counts, 1)
+        values -= row_means[rows]
+        all_intensities = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(NN, unique_columns.size)
         )
-        # Set any NaN correlation coefficients to zero
-        np.nan_to_num(rij, copy=False)
-        # Cosym does not make use of the on-diagonal correlation coefficients
-        np.fill_diagonal(rij, 0)
 
-        if self._weights:
-            wij = np.zeros_like(rij)
-            right_up = np.triu_indices_from(wij, k=1)
+        # Compute the pairwise correlation coefficients in blocks of rows, limiting
+        # the block size to bound the size of the intermediate sparse products
+        block_size = max(1, min(1000, -(-NN // (4 * self._nproc))))
+        blocks = [
+            (start, min(start + block_size, NN)) for start in range(0, NN, block_size)
+        ]
+        results = []
+        if self._nproc > 1 and len(blocks) > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._nproc,
+                initializer=_initialise_rij_worker,
+                initargs=(all_intensities,),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _compute_pairwise_cc_one_row_block,
+                        start,
+                        stop,
+                        self._min_pairs,
+                    )
+                    for start, stop in blocks
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    results.append(future.result())
+        else:
+            _initialise_rij_worker(all_intensities)
+            for start, stop in blocks:
+                results.append(
+                    _compute_pairwise_cc_one_row_block(start, stop, self._min_pairs)
+                )
+            _worker_intensities.clear()
+        rows, columns, n_pairs, cc = (
+            np.concatenate(arrays) for arrays in zip(*results)
+        )
+
+        rij = sparse.csr_matrix((cc, (rows, columns)), shape=(NN, NN))
 
+        if self._weights:
             # For each correlation coefficient, set the weight equal to the size of
             # the sample used to calculate that coefficient
-            pairwise_combos = itertools.combinations(np.isfinite(all_intensities), 2)
-
-            def sample_size(x, y):
-                pairs = np.count_nonzero(x & y)
-                if pairs < self._min_pairs:
-                    return 0
-                else:
-                    return pairs
-
-            wij[right_up] = list(itertools.starmap(sample_size, pairwise_combos))
+            wij = n_pairs.astype(np.float64)
 
             if self._weights == "standard_error":
                 # Set each weights as the reciprocal of the standard error on the
                 # corresponding correlation coefficient
                 # http://www.sjsu.edu/faculty/gerstman/StatPrimer/correlation.pdf
                 with np.errstate(divide="ignore", invalid="ignore"):
-                    reciprocal_se = np.sqrt(
-                        (wij[right_up] - 2) / (1 - np.square(rij[right_up]))
-                    )
-
-                wij[right_up] = np.where(wij[right_up] > 2, reciprocal_se, 0)
+                    reciprocal_se = np.sqrt((wij - 2) / (1 - np.square(cc)))
 
-            # Symmetrise the wij matrix
-            wij += wij.T
+                wij = np.where(wij > 2, reciprocal_se, 0)
+            wij = sparse.csr_matrix((wij, (rows, columns)), shape=(NN, NN))
         else:
             wij = None
 
+        if not self._sparse_matrices:
+            rij = rij.toarray()
+            if wij is not None:
+                wij = wij.toarray()
+
         return rij, wij
 
+    def _sparse_elements(self):
+        """Return the row and column indices of the stored elements of the sparse
+        rij (or wij, if present) matrix, with the rij and wij values at these
+        elements. These are found on the first call and reused thereafter."""
+        if self._sparse_element_cache is None:
+            if self.wij_matrix is not None:
+                wij = self.wij_matrix.tocoo()
+                rows, cols, w = wij.row, wij.col, wij.data
+                r = np.asarray(sparse.csr_matrix(self.rij_matrix)[rows, cols]).ravel()
+            else:
+                rij = self.rij_matrix.tocoo()
+                rows, cols, r = rij.row, rij.col, rij.data
+                w = None
+            self._sparse_element_cache = rows, cols, r, w
+        return self._sparse_element_cache
+
     def compute_functional(self, x: np.ndarray) -> float:
         """Compute the target function at coordinates `x`.
 
@@ -467,6 +605,17 @@ def compute_functional(self, x: np.ndarray) -> float:
         """
         assert (x.size // self.dim) == (len(self._lattices) * len(self.sym_ops))
         x = x.reshape((self.dim, x.size // self.dim))
+        if sparse.issparse(self.rij_matrix):
+            rows, cols, r, w = self._sparse_elements()
+            xtx = np.einsum("ij,ij->j", x[:, rows], x[:, cols])
+            if w is not None:
+                # Only the elements with a nonzero weight contribute
+                return 0.5 * np.sum(w * np.square(r - xtx))
+            # sum((r - xTx)^2) = sum(r^2) - 2 sum(r * xTx) + sum((xTx)^2), where the
+            # last term is equal to the sum of the elements of (x xT)^2
+            return 0.5 * (
+                np.sum(np.square(r)) - 2 * np.sum(r * xtx) + np.sum(np.square(x @ x.T))
+            )
         elements = np.square(self.rij_matrix - x.T @ x)
         if self.wij_matrix is not None:
             np.multiply(self.wij_matrix, elements, out=elements)
@@ -514,6 +663,20 @@ def compute_gradients(self, x: np.ndarray) -> np.ndarray:
           grad: The gradients of the target function with respect to the parameters.
         """
         x = x.reshape((self.dim, x.size // self.dim))
+        if sparse.issparse(self.rij_matrix):
+            rows, cols, r, w = self._sparse_elements()
+            if w is not None:
+                xtx = np.einsum("ij,ij->j", x[:, rows], x[:, cols])
+                # The elements are in the order of the stored elements of wij, so
+                # the residuals share its structure
+                residuals = sparse.csr_matrix(
+                    (w * (r - xtx), self.wij_matrix.indices, self.wij_matrix.indptr),
+                    shape=self.wij_matrix.shape,
+                )
+                grad = -2 * (residuals.T @ x.T).T
+            else:
+                grad = -2 * (self.rij_matrix.T @ x.T).T + 2 * (x @ x.T) @ x
+            return grad.flatten()
         if self.wij_matrix is not None:
             wrij_matrix = np.multiply(self.wij_matrix, self.rij_matrix)
             grad = -2 * x @ (wrij_matrix - np.multiply(self.wij_matrix, x.T @ x))
@@ -534,11 +697,19 @@ def curvatures(self, x: np.ndarray) -> np.ndarray:
           curvs (np.ndarray):
           The curvature of the target function with respect to the parameters.
         """
+        x = x.reshape((self.dim, x.size // self.dim))
+        if sparse.issparse(self.rij_matrix):
+            if self.wij_matrix is not None:
+                curvs = 2 * (self.wij_matrix.T @ np.square(x).T).T
+            else:
+                curvs = np.repeat(
+                    2 * np.sum(np.square(x), axis=1, keepdims=True), x.shape[1], axis=1
+                )
+            return curvs.flatten()
         if self.wij_matrix is not None:
             wij = self.wij_matrix
         else:
             wij = np.ones(self.rij_matrix.shape)
-        x = x.reshape((self.dim, x.size // self.dim))
         curvs = 2 * np.square(x) @ wij
         return curvs.flatten()
 
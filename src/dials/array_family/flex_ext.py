@@ -8,8 +8,10 @@
 import collections
 import copy
 import functools
+import io
 import itertools
 import logging
+import mmap
 import operator
 import os
 import pickle
@@ -23,6 +25,7 @@
 import cctbx.array_family.flex
 import cctbx.miller
 import libtbx.smart_open
+from dxtbx import flumpy
 from dxtbx.model import ExperimentType
 from scitbx import matrix
 
@@ -31,6 +34,7 @@
 import dials.util.ext
 import dials_array_family_flex_ext
 from dials.algorithms.centroid import centroid_px_to_mm_panel
+from dials.array_family.msgpack_columns import MsgpackColumnIndex
 from dials.util.exclude_images import expand_exclude_multiples, set_invalid_images
 
 __all__ = ["real", "reflection_table_selector"]
@@ -214,16 +218,42 @@ def as_msgpack_file(self, filename):
             self.as_msgpack_to_file(dials.util.ext.streambuf(python_file_obj=outfile))
 
     @staticmethod
-    def from_msgpack_file(filename):
+    def from_msgpack_file(filename, columns=None):
         """
         Read the reflection table from file in msgpack format
+
+        :param filename: The msgpack filename
+        :param columns: Optionally, the names of the columns to read. Only the
+                        data of these columns is read from the file and decoded.
+        :return: The reflection table
         """
         if filename and hasattr(filename, "__fspath__"):
             filename = filename.__fspath__()
         with libtbx.smart_open.for_reading(filename, "rb") as infile:
-            return dials_array_family_flex_ext.reflection_table.from_msgpack(
-                infile.read()
-            )
+            if columns is None:
+                return dials_array_family_flex_ext.reflection_table.from_msgpack(
+                    infile.read()
+                )
+
+            # Memory-map uncompressed files, so only the parts of the file which
+            # are needed are read from disk
+            buffer = None
+            if isinstance(infile, io.BufferedReader):
+                try:
+                    buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+                except (OSError, ValueError):
+                    pass
+            if buffer is None:
+                buffer = infile.read()
+            try:
+                with MsgpackColumnIndex(buffer) as index:
+                    packed = index.select(columns)
+            except ValueError as e:
+                raise RuntimeError(f"Unable to read reflection table: {e}")
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+        return dials_array_family_flex_ext.reflection_table.from_msgpack(packed)
 
     def as_file(self, filename):
         """
@@ -235,16 +265,24 @@ def as_file(self, filename):
             self.as_msgpack_file(filename)
 
     @staticmethod
-    def from_file(filename):
+    def from_file(filename, columns=None):
         """
         Read the reflection table from either pickle or msgpack
+
+        :param filename: The reflection table filename
+        :param columns: Optionally, the names of the columns to read. For msgpack
+                        files, only the data of these columns is decoded.
+        :return: The reflection table
         """
         try:
             return dials_array_family_flex_ext.reflection_table.from_msgpack_file(
-                filename
+                filename, columns=columns
             )
         except RuntimeError:
-            return dials_array_family_flex_ext.reflection_table.from_pickle(filename)
+            table = dials_array_family_flex_ext.reflection_table.from_pickle(filename)
+            if columns is not None:
+                table = table.select(tuple(dict.fromkeys(columns)))
+            return table
 
     @staticmethod
     def empty_standard(nrows):
@@ -1050,15 +1088,24 @@ def contains_invalid_pixels(self):
         self.set_flags(ninvfg > 0, self.flags.foreground_includes_bad_pixels)
         return (ntotal - nvalid) > 0
 
-    def find_overlaps(self, experiments=None, border=0):
+    def find_overlaps(self, experiments=None, border=0, nproc=1):
         """
         Check for overlapping reflections.
 
+        Large reflection tables, or if nproc > 1, are split into chunks by
+        imageset, panel and windows of images, in which the overlaps are found
+        in parallel.
+
         :param experiments: The experiment list
         :param tolerance: A positive integer specifying border around shoebox
+        :param nproc: The number of processes used to find the overlaps
         :return: The overlap list
         """
         from dials.algorithms.shoebox import OverlapFinder
+        from dials.algorithms.shoebox.overlap_finder import (
+            CHUNK_SIZE,
+            ChunkedOverlapFinder,
+        )
 
         # Expand the bbox if necessary
         if border > 0:
@@ -1083,20 +1130,25 @@ def find_overlaps(self, experiments=None, border=0):
             )
 
             # Get the experiment ids we're to treat together
-            lookup = {}
+            lookup = np.zeros(len(experiments), dtype=np.uint64)
             for j, (key, indices) in enumerate(groups):
-                for i in indices:
-                    lookup[i] = j
-            group_id = cctbx.array_family.flex.size_t([lookup[i] for i in self["id"]])
+                lookup[list(indices)] = j
+            ids = self["id"].as_numpy_array()
+            if len(ids) and (ids.min() < 0 or ids.max() >= len(experiments)):
+                raise KeyError("Reflection experiment id not in experiment list")
+            group_id = flumpy.from_numpy(lookup[ids])
         elif "imageset_id" in self:
             imageset_id = self["imageset_id"]
             assert imageset_id.all_ge(0)
-            group_id = cctbx.array_family.flex.size_t(list(imageset_id))
+            group_id = flumpy.from_numpy(imageset_id.as_numpy_array().astype(np.uint64))
         else:
             raise RuntimeError("Either need to supply experiments or have imageset_id")
 
         # Create the overlap finder
-        find_overlapping = OverlapFinder()
+        if nproc > 1 or len(self) > CHUNK_SIZE:
+            find_overlapping = ChunkedOverlapFinder(nproc=nproc)
+        else:
+            find_overlapping = OverlapFinder()
 
         # Find the overlaps
         overlaps = find_overlapping(group_id, panel, bbox)
@@ -0,0 +1,237 @@
+"""
+Read a subset of the columns of a reflection table file in msgpack format.
+
+A reflection table is written to msgpack as
+
+    ["dials::af::reflection_table", 1, {"identifiers": {...}, "nrows": N,
+                                        "data": {name: [type, column], ...}}]
+
+where the data of each column is stored in msgpack bin objects, so the
+positions of the columns in the file can be found by reading just the msgpack
+headers, and skipping over the column data using the lengths given in the
+headers. The MsgpackColumnIndex records these positions, and creates a new
+msgpack document containing only the requested columns, which can then be
+decoded by reflection_table.from_msgpack. If the file is memory-mapped, only
+the headers and the data of the requested columns are read from disk.
+"""
+
+from __future__ import annotations
+
+import struct
+
+_FILETYPE = "dials::af::reflection_table"
+
+# The sizes of the fixed length msgpack types, by type byte
+_FIXED_SIZES = {
+    0xC0: 0,  # nil
+    0xC2: 0,  # false
+    0xC3: 0,  # true
+    0xCA: 4,  # float 32
+    0xCB: 8,  # float 64
+    0xCC: 1,  # uint 8
+    0xCD: 2,  # uint 16
+    0xCE: 4,  # uint 32
+    0xCF: 8,  # uint 64
+    0xD0: 1,  # int 8
+    0xD1: 2,  # int 16
+    0xD2: 4,  # int 32
+    0xD3: 8,  # int 64
+    0xD4: 2,  # fixext 1
+    0xD5: 3,  # fixext 2
+    0xD6: 5,  # fixext 4
+    0xD7: 9,  # fixext 8
+    0xD8: 17,  # fixext 16
+}
+
+_INT_FORMATS = {
+    0xCC: ">B",
+    0xCD: ">H",
+    0xCE: ">I",
+    0xCF: ">Q",
+    0xD0: ">b",
+    0xD1: ">h",
+    0xD2: ">i",
+    0xD3: ">q",
+}
+
+# The type bytes of the variable length types, with the struct format of the
+# length that follows
+_STR_TYPES = {0xD9: ">B", 0xDA: ">H", 0xDB: ">I"}
+_BIN_TYPES = {0xC4: ">B", 0xC5: ">H", 0xC6: ">I"}
+_EXT_TYPES = {0xC7: ">B", 0xC8: ">H", 0xC9: ">I"}
+_ARRAY_TYPES = {0xDC: ">H", 0xDD: ">I"}
+_MAP_TYPES = {0xDE: ">H", 0xDF: ">I"}
+
+
+def _unpack_length(buffer, pos, fmt):
+    size = struct.calcsize(fmt)
+    return struct.unpack_from(fmt, buffer, pos)[0], pos + size
+
+
+def _read_header(buffer, pos):
+    """
+    Read the header of the msgpack object at pos.
+
+    :return: A tuple (kind, value, pos), where kind is one of "map", "array",
+             "str", "bin", "int" or "other". For maps and arrays, value is the
+             number of items; for str and bin, the length in bytes of the data
+             which follows; for int, the value. pos is the position after the
+             header.
+    """
+    t = buffer[pos]
+    pos += 1
+    if t <= 0x7F:
+        return "int", t, pos
+    if t >= 0xE0:
+        return "int", t - 0x100, pos
+    if 0x80 <= t <= 0x8F:
+        return "map", t & 0x0F, pos
+    if 0x90 <= t <= 0x9F:
+        return "array", t & 0x0F, pos
+    if 0xA0 <= t <= 0xBF:
+        return "str", t & 0x1F, pos
+    if t in _INT_FORMATS:
+        value = struct.unpack_from(_INT_FORMATS[t], buffer, pos)[0]
+        return "int", value, pos + _FIXED_SIZES[t]
+    if t in _FIXED_SIZES:
+        return "other", None, pos + _FIXED_SIZES[t]
+    for kind, types in (
+        ("str", _STR_TYPES),
+        ("bin", _BIN_TYPES),
+        ("array", _ARRAY_TYPES),
+        ("map", _MAP_TYPES),
+    ):
+        if t in types:
+            value, pos = _unpack_length(buffer, pos, types[t])
+            return kind, value, pos
+    if t in _EXT_TYPES:
+        length, pos = _unpack_length(buffer, pos, _EXT_TYPES[t])
+        return "other", None, pos + 1 + length
+    raise ValueError(f"Invalid msgpack type byte {t:#x} at position {pos - 1}")
+
+
+def _skip(buffer, pos):
+    """Return the position after the msgpack object at pos."""
+    kind, value, pos = _read_header(buffer, pos)
+    if kind in ("str", "bin"):
+        return pos + value
+    if kind == "array":
+        for _ in range(value):
+            pos = _skip(buffer, pos)
+    elif kind == "map":
+        for _ in range(2 * value):
+            pos = _skip(buffer, pos)
+    return pos
+
+
+def _read_str(buffer, pos):
+    kind, length, pos = _read_header(buffer, pos)
+    if kind != "str":
+        raise ValueError(f"Expected msgpack str at position {pos}")
+    return bytes(buffer[pos : pos + length]).decode("utf-8"), pos + length
+
+
+def _pack_map_header(n):
+    if n < 16:
+        return bytes([0x80 | n])
+    if n < 2**16:
+        return b"\xde" + struct.pack(">H", n)
+    return b"\xdf" + struct.pack(">I", n)
+
+
+class MsgpackColumnIndex:
+    """
+    The positions of the columns in a reflection table in msgpack format.
+    """
+
+    def __init__(self, buffer):
+        """
+        Index the reflection table, reading only the msgpack headers.
+
+        :param buffer: The msgpack data, e.g. a bytes object or an mmap
+        :raises ValueError: If the data is not a reflection table
+        """
+        self.buffer = memoryview(buffer)
+        try:
+            self._index(self.buffer)
+        except BaseException:
+            # Release the buffer, so that a memory map can still be closed
+            self.buffer.release()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def _index(self, buffer):
+        """Record the positions of the header entries and the columns."""
+        try:
+            kind, size, pos = _read_header(buffer, 0)
+            if kind != "array" or size != 3:
+                raise ValueError("Not a reflection table")
+            filetype, pos = _read_str(buffer, pos)
+            if filetype != _FILETYPE:
+                raise ValueError("Not a reflection table")
+            pos = _skip(buffer, pos)  # the version
+
+            # The map of identifiers, nrows and data
+            self._header_end = pos
+            kind, nitems, pos = _read_header(buffer, pos)
+            if kind != "map":
+                raise ValueError("Reflection table header is not a map")
+            self._entries = []
+            self.nrows = None
+            self.columns = {}
+            for _ in range(nitems):
+                start = pos
+                name, pos = _read_str(buffer, pos)
+                if name == "nrows":
+                    _, self.nrows, _ = _read_header(buffer, pos)
+                if name == "data":
+                    self._entries.append((name, start, pos))
+                    kind, ncols, pos = _read_header(buffer, pos)
+                    if kind != "map":
+                        raise ValueError("Reflection table data is not a map")
+                    for _ in range(ncols):
+                        column_start = pos
+                        column, pos = _read_str(buffer, pos)
+                        pos = _skip(buffer, pos)
+                        self.columns[column] = (column_start, pos)
+                else:
+                    pos = _skip(buffer, pos)
+                    self._entries.append((name, start, pos))
+        except (IndexError, struct.error) as e:
+            raise ValueError(f"Truncated reflection table: {e}")
+        if pos > len(buffer):
+            raise ValueError("Truncated reflection table")
+
+    def select(self, columns):
+        """
+        Create a msgpack reflection table containing only the given columns.
+
+        :param columns: The names of the columns
+        :return: The msgpack data, as bytes
+        :raises KeyError: If any of the columns are not in the table
+        """
+        missing = [c for c in columns if c not in self.columns]
+        if missing:
+            raise KeyError(f"Columns not in reflection table: {', '.join(missing)}")
+        columns = list(dict.fromkeys(columns))
+        parts = [
+            self.buffer[: self._header_end],
+            _pack_map_header(len(self._entries)),
+        ]
+        for name, start, end in self._entries:
+            parts.append(self.buffer[start:end])
+            if name == "data":
+                parts.append(_pack_map_header(len(columns)))
+                for column in columns:
+                    column_start, column_end = self.columns[column]
+                    parts.append(self.buffer[column_start:column_end])
+        return b"".join(parts)
+
+    def release(self):
+        """Release the buffer, e.g. so that a memory map can be closed."""
+        self.buffer.release()
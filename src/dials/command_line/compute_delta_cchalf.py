@@ -77,6 +77,12 @@
     .type = float
     .help = "Datasets with a ΔCC½ below (mean - stdcutoff*std) are removed"
 
+  nproc = 1
+    .type = int(value_min=1)
+    .help = "The number of processes over which to split the groups when"
+            "computing the CC½ excluding each group."
+    .expert_level = 2
+
   output {
     log = 'dials.compute_delta_cchalf.log'
       .type = str
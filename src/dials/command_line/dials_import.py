@@ -20,6 +20,10 @@
 from dxtbx.sequence_filenames import template_regex_from_list
 
 from dials.util import Sorry, log, show_mail_handle_errors
+from dials.util.image_headers import (
+    comparisons_from_tolerance,
+    experiments_from_filenames,
+)
 from dials.util.multi_dataset_handling import generate_experiment_identifiers
 from dials.util.options import ArgumentParser, flatten_experiments
 from dials.util.version import dials_version
@@ -149,6 +153,16 @@ def _pickle_load(fh):
       .type = bool
       .help = "If False, raise an error if multiple sequences are found"
 
+    nproc = 1
+      .type = int(value_min=1)
+      .help = "The number of processes used to read the image headers"
+
+    header_cache = None
+      .type = path
+      .help = "A directory in which to cache the models read from the image"
+              "headers, so that the headers of unchanged images are not read"
+              "again when they are imported again"
+
   }
 
   include scope dials.util.options.format_phil_scope
@@ -227,9 +241,18 @@ def _extract_or_read_imagesets(params):
                     % params.input.experiments
                 )
         elif len(params.input.directory) > 0:
-            experiments = ExperimentListFactory.from_filenames(
-                params.input.directory, format_kwargs=format_kwargs
-            )
+            if params.input.nproc > 1 or params.input.header_cache:
+                experiments = experiments_from_filenames(
+                    params.input.directory,
+                    nproc=params.input.nproc,
+                    cache_directory=params.input.header_cache,
+                    format_kwargs=format_kwargs,
+                    **comparisons_from_tolerance(params.input.tolerance),
+                )
+            else:
+                experiments = ExperimentListFactory.from_filenames(
+                    params.input.directory, format_kwargs=format_kwargs
+                )
             if len(experiments) == 0:
                 raise Sorry(
                     "No experiments found in directories %s" % params.input.directory
@@ -155,6 +155,10 @@
       .type = float
       .help = "An absolute tolerance on the wavelength (in A)"
 
+    nproc = 1
+      .type = int(value_min=1)
+      .help = "The number of threads used to convert the data to MTZ columns"
+
   }
 
   sadabs {
@@ -398,6 +402,7 @@ def export_mtz(params, experiments, reflections):
         crystal_name=params.mtz.crystal_name,
         project_name=params.mtz.project_name,
         wavelength_tolerance=params.mtz.wavelength_tolerance,
+        nproc=params.mtz.nproc,
     )
 
 
@@ -29,6 +29,40 @@ def work(host, port, filename, params):
     return conn.getresponse().read()
 
 
+def work_batch(host, port, filenames, params, nproc=None):
+    """
+    Send a batch of images to the server, and yield the response for each
+    image, in order, as it becomes available.
+
+    If the server does not support batch requests, each image is sent in a
+    separate request instead, from nproc threads.
+    """
+    conn = http.client.HTTPConnection(host, port)
+    conn.request(
+        "POST",
+        "/batch",
+        body=json.dumps({"filenames": filenames, "params": params}),
+        headers={"Content-type": "application/json"},
+    )
+    response = conn.getresponse()
+    if response.status == 200:
+        for line in response:
+            yield json.loads(line)
+        conn.close()
+        return
+    response.read()
+    conn.close()
+
+    nproc = nproc or CPU_COUNT
+    with ThreadPool(processes=nproc) as pool:
+        threads = [
+            pool.apply_async(work, (host, port, filename, params))
+            for filename in filenames
+        ]
+        for thread in threads:
+            yield json.loads(thread.get())
+
+
 def response_to_xml(d):
     if "n_spots_total" in d:
         response = f"""<image>{d['image']}</image>
@@ -83,17 +117,10 @@ def work_all(
     grid=None,
     nproc=None,
 ):
-    nproc = nproc or CPU_COUNT
-    with ThreadPool(processes=nproc) as pool:
-        threads = {}
-        for filename in filenames:
-            threads[filename] = pool.apply_async(work, (host, port, filename, params))
-        results = []
-        for filename in filenames:
-            response = threads[filename].get()
-            d = json.loads(response)
-            results.append(d)
-            print(response_to_xml(d))
+    results = []
+    for d in work_batch(host, port, filenames, params, nproc=nproc):
+        results.append(d)
+        print(response_to_xml(d))
 
     if json_file is not None:
         with open(json_file, "wb") as f:
@@ -227,6 +254,10 @@ def run(args=None):
     if len(unhandled) and unhandled[0] == "stop":
         stopped = stop(params.host, params.port, params.nproc)
         print("Stopped %d findspots processes" % stopped)
+    elif len(unhandled) and unhandled[0] == "metrics":
+        url = "http://%s:%i/metrics" % (params.host, params.port)
+        metrics = json.loads(urllib.request.urlopen(url).read())
+        print(json.dumps(metrics, indent=2))
     elif len(unhandled) and unhandled[0] == "ping":
         url = "http://%s:%i" % (params.host, params.port)
         try:
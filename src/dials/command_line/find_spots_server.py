@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import collections
+import concurrent.futures
+import functools
 import http.server as server_base
 import json
 import logging
 import multiprocessing
+import os
+import statistics
 import sys
+import threading
 import time
 import urllib.parse
 
@@ -16,6 +22,7 @@
 from dials.algorithms.integration.integrator import create_integrator
 from dials.algorithms.profile_model.factory import ProfileModelFactory
 from dials.algorithms.spot_finding import per_image_analysis
+from dials.algorithms.spot_finding.factory import SpotFinderFactory
 from dials.array_family import flex
 from dials.command_line.find_spots import phil_scope as find_spots_phil_scope
 from dials.command_line.index import phil_scope as index_phil_scope
@@ -63,17 +70,45 @@
 * ``total_intensity`` is the total intensity of all strong spots excluding those
   at resolutions where ice rings may be found
 
+Requests are handled concurrently, by a pool of nproc worker processes which
+are started with the server. Each worker caches the parsed parameters, masks
+and the models read from multi-image files (e.g. an HDF5 master file, where
+each request selects an image with scan_range) between requests.
+
+When more than one image is given to ``dials.find_spots_client``, all of the
+images are sent to the server in a single batch request, and the results are
+streamed back in order as they become available.
+
 Any valid ``dials.find_spots`` parameter may be passed to
 ``dials.find_spots_client``, e.g.::
 
   dials.find_spots_client /path/to/image.cbf min_spot_size=2 d_min=2
 
+The number of queued requests and the request latencies are reported by::
+
+  dials.find_spots_client metrics [host=hostname] [port=1234]
+
 To stop the server::
 
   dials.find_spots_client stop [host=hostname] [port=1234]
 """
 
-stop = False
+server_phil_scope = libtbx.phil.parse(
+    """\
+ice_rings {
+  filter = True
+    .type = bool
+  width = 0.004
+    .type = float(value_min=0.0)
+}
+index = False
+  .type = bool
+integrate = False
+  .type = bool
+indexing_min_spots = 10
+  .type = int(value_min=1)
+"""
+)
 
 
 def _filter_by_resolution(experiments, reflections, d_min=None, d_max=None):
@@ -95,35 +130,23 @@ def _filter_by_resolution(experiments, reflections, d_min=None, d_max=None):
     return reflections
 
 
-def work(filename, cl=None):
-    if cl is None:
-        cl = []
+@functools.lru_cache(maxsize=32)
+def _fetch_params(cl):
+    """
+    Interpret the command line parameters of a request.
 
-    phil_scope = libtbx.phil.parse(
-        """\
-ice_rings {
-  filter = True
-    .type = bool
-  width = 0.004
-    .type = float(value_min=0.0)
-}
-index = False
-  .type = bool
-integrate = False
-  .type = bool
-indexing_min_spots = 10
-  .type = int(value_min=1)
-"""
-    )
-    interp = phil_scope.command_line_argument_interpreter()
+    The result is cached, as the same parameters are usually sent with every
+    image of a dataset.
+
+    :param cl: A tuple of the command line parameters
+    :returns: A tuple of the extracted server parameters, the spotfinding phil
+              scope, and a tuple of the remaining parameters
+    """
+    interp = server_phil_scope.command_line_argument_interpreter()
     params, unhandled = interp.process_and_fetch(
-        cl, custom_processor="collect_remaining"
+        list(cl), custom_processor="collect_remaining"
     )
-    filter_ice = params.extract().ice_rings.filter
-    ice_rings_width = params.extract().ice_rings.width
-    index = params.extract().index
-    integrate = params.extract().integrate
-    indexing_min_spots = params.extract().indexing_min_spots
+    server_params = params.extract()
 
     interp = find_spots_phil_scope.command_line_argument_interpreter()
     phil_scope, unhandled = interp.process_and_fetch(
@@ -131,10 +154,54 @@ def work(filename, cl=None):
     )
     logger.info("The following spotfinding parameters have been modified:")
     logger.info(find_spots_phil_scope.fetch_diff(source=phil_scope).as_str())
+    return server_params, phil_scope, tuple(unhandled)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_mask(filename):
+    return SpotFinderFactory.load_image(filename)
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_experiments(filename, size, mtime):
+    return ExperimentListFactory.from_filenames([filename])
+
+
+def _load_experiments(filename):
+    """
+    Read the experiments from an image file, reusing the experiments read by
+    a previous request for the same (unmodified) file.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        # e.g. a URL
+        return ExperimentListFactory.from_filenames([filename])
+    return _cached_experiments(filename, st.st_size, st.st_mtime_ns)
+
+
+def work(filename, cl=None):
+    if cl is None:
+        cl = []
+
+    server_params, phil_scope, unhandled = _fetch_params(tuple(cl))
+    unhandled = list(unhandled)
+    filter_ice = server_params.ice_rings.filter
+    ice_rings_width = server_params.ice_rings.width
+    index = server_params.index
+    integrate = server_params.integrate
+    indexing_min_spots = server_params.indexing_min_spots
+
     params = phil_scope.extract()
     # no need to write the hot mask in the server/client
     params.spotfinder.write_hot_mask = False
-    experiments = ExperimentListFactory.from_filenames([filename])
+    if params.spotfinder.lookup.mask:
+        params.spotfinder.lookup.mask = _load_mask(params.spotfinder.lookup.mask)
+    if index:
+        # The models are modified by indexing, so must not be shared
+        experiments = ExperimentListFactory.from_filenames([filename])
+    else:
+        experiments = _load_experiments(filename)
     if params.spotfinder.scan_range and len(experiments) > 1:
         # This means we've imported a sequence of still image: select
         # only the experiment, i.e. image, we're interested in
@@ -293,47 +360,210 @@ def work(filename, cl=None):
     return stats
 
 
+def _filename_from_path(path):
+    # If we're passing a url through, then unquote and ignore leading /
+    if "%3A//" in path:
+        return urllib.parse.unquote(path[1:])
+    return path
+
+
+def _work_in_worker(filename, params):
+    """
+    Process one image in a worker process.
+
+    :returns: A tuple of the HTTP response code and the response dictionary
+    """
+    d = {"image": filename}
+    try:
+        stats = work(filename, params)
+        d.update(stats)
+        return 200, d
+    except Exception as e:
+        d["error"] = str(e)
+        return 500, d
+
+
+class _Metrics:
+    """Thread-safe counters of the requests handled by the server."""
+
+    def __init__(self, n_latencies=1000):
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self.n_queued = 0
+        self.n_completed = 0
+        self.n_errors = 0
+        self._latencies = collections.deque(maxlen=n_latencies)
+
+    def submitted(self):
+        with self._lock:
+            self.n_queued += 1
+
+    def completed(self, latency, error):
+        with self._lock:
+            self.n_queued -= 1
+            self.n_completed += 1
+            self.n_errors += error
+            self._latencies.append(latency)
+
+    def cancelled(self):
+        with self._lock:
+            self.n_queued -= 1
+
+    def as_dict(self):
+        """
+        :returns: The number of queued and completed images, and the mean,
+                  median, 95th percentile and maximum of the latencies (in
+                  seconds) of the most recent images
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            d = {
+                "uptime": time.time() - self._start,
+                "queue_depth": self.n_queued,
+                "n_completed": self.n_completed,
+                "n_errors": self.n_errors,
+            }
+        if latencies:
+            d["latency"] = {
+                "mean": statistics.mean(latencies),
+                "median": statistics.median(latencies),
+                "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+                "max": latencies[-1],
+            }
+        return d
+
+
+class FindSpotsServer(server_base.ThreadingHTTPServer):
+    """
+    An HTTP server which handles each request in a thread, and processes the
+    images in a pool of worker processes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, nproc):
+        super().__init__(server_address, handler)
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        else:
+            mp_context = None
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=nproc, mp_context=mp_context
+        )
+        # Start the worker processes before any request handling threads
+        self.pool.submit(os.getpid).result()
+        self.metrics = _Metrics()
+
+    def submit(self, filename, params):
+        """
+        Queue an image for processing.
+
+        :returns: A _Job, to wait for the result of processing the image
+        """
+        return _Job(self, filename, params)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+class _Job:
+    """
+    An image queued for processing by a FindSpotsServer. The image is counted
+    as completed in the server metrics when its result has been collected, so
+    the metrics are up to date by the time the response is sent.
+    """
+
+    def __init__(self, server, filename, params):
+        self.filename = filename
+        self._metrics = server.metrics
+        self._start = time.perf_counter()
+        self._metrics.submitted()
+        self._future = server.pool.submit(_work_in_worker, filename, params)
+
+    def result(self):
+        """
+        Wait for the image to be processed.
+
+        :returns: The HTTP response code and response dictionary
+        """
+        try:
+            response = self._future.result()
+        except Exception as e:
+            # e.g. a worker process was killed
+            response = 500, {"image": self.filename, "error": str(e)}
+        self._metrics.completed(time.perf_counter() - self._start, response[0] != 200)
+        return response
+
+    def cancel(self):
+        """
+        Cancel processing the image, or wait for it to be processed if it has
+        already started.
+        """
+        if self._future.cancel():
+            self._metrics.cancelled()
+        else:
+            self.result()
+
+
 class handler(server_base.BaseHTTPRequestHandler):
+    def _send_json(self, response, d):
+        self.send_response(response)
+        self.send_header("Content-type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(d).encode())
+
     def do_GET(self):
         """Respond to a GET request."""
         if self.path == "/Ctrl-C":
             self.send_response(200)
             self.end_headers()
+            # shutdown() waits for serve_forever() to return, so must not be
+            # called from a request handling thread that it waits for
+            threading.Thread(target=self.server.shutdown).start()
+            return
 
-            global stop
-            stop = True
+        if self.path == "/metrics":
+            self._send_json(200, self.server.metrics.as_dict())
             return
 
-        filename = self.path.split(";")[0]
+        filename = _filename_from_path(self.path.split(";")[0])
         params = self.path.split(";")[1:]
-
-        # If we're passing a url through, then unquote and ignore leading /
-        if "%3A//" in filename:
-            filename = urllib.parse.unquote(filename[1:])
-
-        d = {"image": filename}
-
+        self._send_json(*self.server.submit(filename, params).result())
+
+    def do_POST(self):
+        """
+        Respond to a batch request, with a JSON body of the form
+        {"filenames": [...], "params": [...]}. The result for each image is
+        written as a line of JSON as soon as it (and the results for all of the
+        preceding images) are available.
+        """
+        if self.path != "/batch":
+            self.send_error(404)
+            return
         try:
-            stats = work(filename, params)
-            d.update(stats)
-            response = 200
-        except Exception as e:
-            d["error"] = str(e)
-            response = 500
+            length = int(self.headers["Content-Length"])
+            request = json.loads(self.rfile.read(length))
+            filenames = [_filename_from_path(f) for f in request["filenames"]]
+            params = list(request.get("params", []))
+        except (TypeError, ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Invalid batch request: {e}"})
+            return
 
-        self.send_response(response)
-        self.send_header("Content-type", "application/json")
+        jobs = [self.server.submit(filename, params) for filename in filenames]
+        self.send_response(200)
+        self.send_header("Content-type", "application/x-ndjson")
         self.end_headers()
-        response = json.dumps(d).encode()
-        self.wfile.write(response)
-
-
-def serve(httpd):
-    try:
-        while not stop:
-            httpd.handle_request()
-    except KeyboardInterrupt:
-        pass
+        for i, job in enumerate(jobs):
+            _, d = job.result()
+            try:
+                self.wfile.write(json.dumps(d).encode() + b"\n")
+                self.wfile.flush()
+            except ConnectionError:
+                # The client has gone away: don't process the rest of the batch
+                for remaining in jobs[i + 1 :]:
+                    remaining.cancel()
+                return
 
 
 phil_scope = libtbx.phil.parse(
@@ -347,15 +577,12 @@ def serve(httpd):
 
 
 def main(nproc, port):
-    server_class = server_base.HTTPServer
-    httpd = server_class(("", port), handler)
+    httpd = FindSpotsServer(("", port), nproc)
     print(time.asctime(), "Serving %d processes on port %d" % (nproc, port))
-
-    for j in range(nproc - 1):
-        proc = multiprocessing.Process(target=serve, args=(httpd,))
-        proc.daemon = True
-        proc.start()
-    serve(httpd)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
     httpd.server_close()
     print(time.asctime(), "done")
 
@@ -89,6 +89,19 @@
   .expert_level = 2
 stack_mode = max mean *sum
   .type = choice
+image_cache {
+  max_memory = 1024
+    .type = int(value_min=0)
+    .help = "The maximum memory in MB used to keep the image data read, the"
+            "threshold images calculated and the tiles drawn for recently"
+            "viewed images."
+    .expert_level = 2
+  prefetch = 2
+    .type = int(value_min=0)
+    .help = "The number of images either side of the current image to read"
+            "in the background."
+    .expert_level = 2
+}
 d_min = None
   .type = float(value_min=0)
 mask = None
@@ -3,11 +3,14 @@
 import concurrent.futures
 import logging
 import math
+import multiprocessing
+import threading
 
 import numpy as np
 
 import libtbx
 from cctbx import sgtbx, uctbx
+from dxtbx import flumpy
 from iotbx import ccp4_map, phil
 from scitbx.array_family import flex
 
@@ -76,11 +79,36 @@
 )
 
 
-def process_block(
-    block, imageset, i_panel, grid_size, reverse_phi, S, ignore_mask, xy, rec_range
-):
-    grid = flex.double(flex.grid(grid_size, grid_size, grid_size), 0)
-    counts = flex.int(flex.grid(grid_size, grid_size, grid_size), 0)
+# The grid and counts to which process_block adds the images, which are shared
+# between the worker processes, and the lock serialising the additions to them
+_target = {}
+
+
+def _set_target(grid, counts, grid_size, lock):
+    """
+    Set the grid and counts, as shared ctypes arrays of grid_size**3 elements,
+    to which process_block adds the images.
+    """
+    shape = (grid_size, grid_size, grid_size)
+    _target["grid"] = np.frombuffer(grid, dtype=np.float64).reshape(shape)
+    _target["counts"] = np.frombuffer(counts, dtype=np.intc).reshape(shape)
+    _target["lock"] = lock
+
+
+def process_block(block, imageset, reverse_phi, panels, ignore_mask, rec_range):
+    """
+    Map a block of images into reciprocal space, adding them to the grid and
+    counts set by _set_target. Each image is read once, and the pixels of all
+    panels are added to the grid.
+
+    panels is a list of tuples (i_panel, S, pixels) of the panel index, the
+    scattering vectors of the target pixels and the indices of the target
+    pixels in the flattened panel data.
+    """
+    grid = _target["grid"].reshape(-1)
+    counts = _target["counts"].reshape(-1)
+    npoints = _target["grid"].shape[0]
+    step = 2 * rec_range / npoints
 
     axis = imageset.get_goniometer().get_rotation_axis()
     for i in block:
@@ -90,16 +118,24 @@ def process_block(
         if not reverse_phi:
             # the pixel is in S AFTER rotation. Thus we have to rotate BACK.
             angle *= -1
-        rotated_S = S.rotate_around_origin(axis, angle)
 
-        data = imageset.get_raw_data(i)[i_panel]
+        raw_data = imageset.get_raw_data(i)
         if not ignore_mask:
-            mask = imageset.get_mask(i)[i_panel]
-            data.set_selected(~mask, 0)
+            mask = imageset.get_mask(i)
 
-        recviewer.fill_voxels(data, grid, counts, rotated_S, xy, rec_range)
+        for i_panel, S, pixels in panels:
+            rotated_S = flumpy.to_numpy(S.rotate_around_origin(axis, angle))
+            data = flumpy.to_numpy(raw_data[i_panel]).ravel()[pixels]
+            if not ignore_mask:
+                data[~flumpy.to_numpy(mask[i_panel]).ravel()[pixels]] = 0
 
-    return grid, counts
+            # Find the voxel of each pixel as recviewer.fill_voxels does
+            voxels = (rotated_S / step + npoints // 2 + 0.5).astype(int)
+            inside = np.all((voxels >= 0) & (voxels < npoints), axis=1)
+            index = np.ravel_multi_index(voxels[inside].T, _target["grid"].shape)
+            with _target["lock"]:
+                np.add.at(grid, index, data[inside])
+                np.add.at(counts, index, 1)
 
 
 class Script:
@@ -141,12 +177,10 @@ def run(self, args=None):
         self.max_resolution = params.rs_mapper.max_resolution
         self.ignore_mask = params.rs_mapper.ignore_mask
 
-        self.grid = flex.double(
-            flex.grid(self.grid_size, self.grid_size, self.grid_size), 0
-        )
-        self.counts = flex.int(
-            flex.grid(self.grid_size, self.grid_size, self.grid_size), 0
-        )
+        # The grid and counts are held in shared memory, so that the images can
+        # be added to them by all of the worker processes
+        self._grid = multiprocessing.RawArray("d", self.grid_size**3)
+        self._counts = multiprocessing.RawArray("i", self.grid_size**3)
 
         self.nproc = params.rs_mapper.nproc
         if self.nproc is libtbx.Auto:
@@ -155,13 +189,13 @@ def run(self, args=None):
 
         for i_expt, experiment in enumerate(self.experiments):
             logger.info(f"Calculation for experiment {i_expt}")
-            for i_panel in range(len(experiment.detector)):
-                grid, counts = self.process_imageset(experiment.imageset, i_panel)
-
-                self.grid += grid
-                self.counts += counts
+            self.process_imageset(experiment.imageset)
 
-        recviewer.normalize_voxels(self.grid, self.counts)
+        shape = (self.grid_size, self.grid_size, self.grid_size)
+        grid = np.frombuffer(self._grid, dtype=np.float64).reshape(shape)
+        counts = np.frombuffer(self._counts, dtype=np.intc).reshape(shape)
+        np.divide(grid, counts, out=grid, where=counts != 0)
+        self.grid = flumpy.from_numpy(grid)
 
         # Let's use 1/(100A) as the unit so that the absolute numbers in the
         # "cell dimensions" field of the ccp4 map are typical for normal
@@ -180,31 +214,42 @@ def run(self, args=None):
             flex.std_string(["cctbx.miller.fft_map"]),
         )
 
-    def process_imageset(self, imageset, i_panel):
+    def process_imageset(self, imageset):
+        """
+        Map all panels of all images of the imageset into reciprocal space,
+        adding the results to the grid and counts.
+        """
         rec_range = 1 / self.max_resolution
 
         beam = imageset.get_beam()
         s0 = beam.get_s0()
 
-        panel = imageset.get_detector()[i_panel]
-        pixel_size = panel.get_pixel_size()
-        nfast, nslow = panel.get_image_size()
+        # cache transformation for each panel
+        panels = []
+        for i_panel, panel in enumerate(imageset.get_detector()):
+            pixel_size = panel.get_pixel_size()
+            nfast, nslow = panel.get_image_size()
 
-        if pixel_size[0] != pixel_size[1]:
-            raise Sorry("This program does not support non-square pixels.")
+            if pixel_size[0] != pixel_size[1]:
+                raise Sorry("This program does not support non-square pixels.")
 
-        # cache transformation
-        xy = recviewer.get_target_pixels(panel, s0, nfast, nslow, self.max_resolution)
-        s1 = panel.get_lab_coord(xy * pixel_size[0])
-        s1 = s1 / s1.norms() * (1 / beam.get_wavelength())
-        S = s1 - s0
+            xy = recviewer.get_target_pixels(
+                panel, s0, nfast, nslow, self.max_resolution
+            )
+            s1 = panel.get_lab_coord(xy * pixel_size[0])
+            s1 = s1 / s1.norms() * (1 / beam.get_wavelength())
+            S = s1 - s0
+            x, y = flumpy.to_numpy(xy).astype(int).T
+            panels.append((i_panel, S, y * nfast + x))
 
         # Split imageset into up to nproc blocks of at least 10 images
         nblocks = min(self.nproc, int(math.ceil(len(imageset) / 10)))
         blocks = np.array_split(range(len(imageset)), nblocks)
         blocks = [block.tolist() for block in blocks]
 
-        logger.info(f"Calculation for panel {i_panel} split over {len(blocks)} blocks")
+        logger.info(
+            f"Calculation for {len(panels)} panel(s) split over {len(blocks)} blocks"
+        )
         header = ["Block", "Oscillation range (°)"]
         scan = imageset.get_scan()
         rows = [
@@ -216,47 +261,29 @@ def process_imageset(self, imageset, i_panel):
         ]
         logger.info(dials.util.tabulate(rows, header, numalign="right") + "\n")
 
+        args = (imageset, self.reverse_phi, panels, self.ignore_mask, rec_range)
         if len(blocks) == 1:
-            results = [
-                process_block(
-                    blocks[0],
-                    imageset,
-                    i_panel,
-                    self.grid_size,
-                    self.reverse_phi,
-                    S,
-                    self.ignore_mask,
-                    xy,
-                    rec_range,
-                ),
-            ]
+            _set_target(self._grid, self._counts, self.grid_size, threading.Lock())
+            try:
+                process_block(blocks[0], *args)
+            finally:
+                _target.clear()
         else:
+            # Every block is added to the same grid in shared memory, so the
+            # memory used does not grow with the number of processes
             with concurrent.futures.ProcessPoolExecutor(
-                max_workers=len(blocks)
+                max_workers=len(blocks),
+                initializer=_set_target,
+                initargs=(
+                    self._grid,
+                    self._counts,
+                    self.grid_size,
+                    multiprocessing.Lock(),
+                ),
             ) as pool:
-                results = [
-                    pool.submit(
-                        process_block,
-                        block,
-                        imageset,
-                        i_panel,
-                        self.grid_size,
-                        self.reverse_phi,
-                        S,
-                        self.ignore_mask,
-                        xy,
-                        rec_range,
-                    )
-                    for block in blocks
-                ]
-            results = [e.result() for e in results]
-
-        grid, counts = results[0]
-        for g, c in results[1:]:
-            grid += g
-            counts += c
-
-        return grid, counts
+                futures = [pool.submit(process_block, block, *args) for block in blocks]
+                for future in futures:
+                    future.result()
 
 
 @dials.util.show_mail_handle_errors()
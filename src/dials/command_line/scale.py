@@ -150,6 +150,7 @@ def _export_unmerged_mtz(params, experiments, reflection_table):
     export_params.mtz.crystal_name = params.output.crystal_name
     export_params.mtz.project_name = params.output.project_name
     export_params.mtz.best_unit_cell = params.reflection_selection.best_unit_cell
+    export_params.mtz.nproc = params.scaling_options.nproc
     if params.cut_data.d_min:
         export_params.mtz.d_min = params.cut_data.d_min
     logger.info(
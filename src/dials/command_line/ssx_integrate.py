@@ -63,7 +63,7 @@
 from dials.util.version import dials_version
 
 try:
-    from typing import List, Type
+    from typing import Iterable, List, Type
 except ImportError:
     pass
 
@@ -296,7 +296,21 @@ def wrap_integrate_one(input_to_integrate: InputToIntegrate):
     return result
 
 
-def process_batch(sub_tables, sub_expts, configuration, batch_offset=0):
+def _initialise_worker(individual_log_verbosity, loggers):
+    # Reduce the logging of the worker processes for the whole run
+    manage_loggers(individual_log_verbosity, loggers).__enter__()
+
+
+@dataclass
+class _Batch:
+    inputs: List[InputToIntegrate]
+    experiments: ExperimentList
+    original_isets: list
+    identifiers_to_scans: dict
+
+
+def prepare_batch(sub_tables, sub_expts, configuration, batch_offset=0) -> _Batch:
+    """Create the inputs to integrate for each image of a batch."""
     # create iterable
     input_iterable: List[InputToIntegrate] = []
     from dxtbx.imageset import ImageSequence, ImageSet
@@ -332,21 +346,14 @@ def process_batch(sub_tables, sub_expts, configuration, batch_offset=0):
             )
         )
     input_iterable = sorted(input_iterable, key=lambda i: i.table.size(), reverse=True)
-    with manage_loggers(
-        configuration["params"].individual_log_verbosity,
-        configuration["loggers_to_disable"],
-    ):
-        if configuration["params"].nproc > 1:
-            with Pool(configuration["params"].nproc) as pool:
-                results: List[IntegrationResult] = pool.map(
-                    wrap_integrate_one, input_iterable
-                )
-        else:
-            results: List[IntegrationResult] = [
-                wrap_integrate_one(i) for i in input_iterable
-            ]
+    return _Batch(input_iterable, sub_expts, original_isets, identifiers_to_scans)
 
-    # then join
+
+def join_batch(results: Iterable[IntegrationResult], batch: _Batch, configuration):
+    """Combine the integration results of the images of a batch."""
+    sub_expts = batch.experiments
+    original_isets = batch.original_isets
+    identifiers_to_scans = batch.identifiers_to_scans
     integrated_reflections = flex.reflection_table()
     integrated_experiments = []
 
@@ -361,7 +368,7 @@ def process_batch(sub_tables, sub_expts, configuration, batch_offset=0):
         use_detector = sub_expts.detectors()[0]
 
     n_integrated = 0
-    for result in sorted(results, key=lambda result: result.crystalno):
+    for result in results:
         if result.table:
             if identifiers_to_scans:
                 result.experiment.scan = identifiers_to_scans[
@@ -395,6 +402,22 @@ def process_batch(sub_tables, sub_expts, configuration, batch_offset=0):
     return integrated_experiments, integrated_reflections
 
 
+def process_batch(sub_tables, sub_expts, configuration, batch_offset=0):
+    batch = prepare_batch(sub_tables, sub_expts, configuration, batch_offset)
+    with manage_loggers(
+        configuration["params"].individual_log_verbosity,
+        configuration["loggers_to_disable"],
+    ):
+        results = [wrap_integrate_one(i) for i in batch.inputs]
+    return join_batch(results, batch, configuration)
+
+
+def _batches(reflections, experiments, batches):
+    for i, b in enumerate(batches[:-1]):
+        end_ = batches[i + 1]
+        yield b, end_, reflections[b:end_], experiments[b:end_]
+
+
 def run_integration(reflections, experiments, params):
     assert len(reflections) == len(experiments)
     if params.output.nuggets:
@@ -406,21 +429,57 @@ def run_integration(reflections, experiments, params):
             params.output.nuggets = None
     batches, configuration = setup(reflections, params)
 
-    # now process each batch, and do parallel processing within a batch
-    for i, b in enumerate(batches[:-1]):
-        end_ = batches[i + 1]
-        logger.info(f"Processing images {b+1} to {end_}")
-        sub_tables = reflections[b:end_]
-        sub_expts = experiments[b:end_]
+    if params.nproc == 1:
+        for b, end_, sub_tables, sub_expts in _batches(
+            reflections, experiments, batches
+        ):
+            logger.info(f"Processing images {b+1} to {end_}")
+            integrated_experiments, integrated_reflections = process_batch(
+                sub_tables, sub_expts, configuration, batch_offset=b
+            )
+            yield (
+                integrated_experiments,
+                integrated_reflections,
+                configuration["aggregator"],
+            )
+        return
 
-        integrated_experiments, integrated_reflections = process_batch(
-            sub_tables, sub_expts, configuration, batch_offset=b
-        )
-        yield (
-            integrated_experiments,
-            integrated_reflections,
-            configuration["aggregator"],
-        )
+    # Use one pool of processes for all batches. The images of the next batch
+    # are queued before the results of the previous batch are collected, so
+    # that the processes carry on integrating while the previous batch is joined
+    # and saved. The results are taken in the order of the inputs, as for serial
+    # processing.
+    with Pool(
+        params.nproc,
+        initializer=_initialise_worker,
+        initargs=(params.individual_log_verbosity, configuration["loggers_to_disable"]),
+    ) as pool:
+        pending = None
+        for b, end_, sub_tables, sub_expts in _batches(
+            reflections, experiments, batches
+        ):
+            logger.info(f"Processing images {b+1} to {end_}")
+            batch = prepare_batch(sub_tables, sub_expts, configuration, b)
+            results = pool.imap(wrap_integrate_one, batch.inputs)
+            if pending:
+                integrated_experiments, integrated_reflections = join_batch(
+                    *pending, configuration
+                )
+                yield (
+                    integrated_experiments,
+                    integrated_reflections,
+                    configuration["aggregator"],
+                )
+            pending = (results, batch)
+        if pending:
+            integrated_experiments, integrated_reflections = join_batch(
+                *pending, configuration
+            )
+            yield (
+                integrated_experiments,
+                integrated_reflections,
+                configuration["aggregator"],
+            )
 
 
 @show_mail_handle_errors()
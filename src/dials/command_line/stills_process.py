@@ -4,6 +4,7 @@
 import copy
 import glob
 import logging
+import multiprocessing
 import os
 import pickle
 import sys
@@ -21,7 +22,8 @@
 
 import dials.util
 from dials.array_family import flex
-from dials.util import log
+from dials.util import log, tabulate
+from dials.util.mp import dynamic_multi_core_run
 
 logger = logging.getLogger("dials.command_line.stills_process")
 
@@ -169,6 +171,11 @@ def _control_phil_str():
     nproc = 1
       .type = int(value_min=1)
       .help = "The number of processes to use."
+    chunksize = 1
+      .type = int(value_min=1)
+      .help = "For multiprocessing, the number of images each process takes"
+              "from the shared queue of images at a time."
+      .expert_level = 2
     composite_stride = None
       .type = int
       .help = For MPI, if using composite mode, specify how many ranks to    \
@@ -433,8 +440,6 @@ def load_reference_geometry(self):
 
     def run(self, args=None):
         """Execute the script."""
-        from libtbx import easy_mp
-
         try:
             from mpi4py import MPI
         except ImportError:
@@ -713,8 +718,10 @@ def do_work(i, item_list, processor=None, finalize=True):
                     experiments = do_import(filename, load_models=True)
                     imagesets = experiments.imagesets()
                     if len(imagesets) == 0 or len(imagesets[0]) == 0:
+                        # Skip the file, but carry on with the rest of the items,
+                        # and keep the processor to finalize
                         logger.info("Zero length imageset in file: %s", filename)
-                        return
+                        continue
                     if len(imagesets) > 1:
                         raise Abort(f"Found more than one imageset in file: {filename}")
                     if len(imagesets[0]) > 1:
@@ -832,11 +839,13 @@ def process_this_event(nevent):
                         print("Rank %d event processed" % rank)
                 processor.finalize()
         else:
-            from dxtbx.command_line.image_average import splitit
-
             if params.mp.nproc == 1:
                 do_work(0, iterable)
-            else:
+            elif "fork" not in multiprocessing.get_all_start_methods():
+                # Split the images into fixed partitions, one per process
+                from dxtbx.command_line.image_average import splitit
+                from libtbx import easy_mp
+
                 result = list(
                     easy_mp.multi_core_run(
                         myfunction=do_work,
@@ -853,6 +862,50 @@ def process_this_event(nevent):
                         if error is None:
                             continue
                         print(error)
+            else:
+                # Each process keeps one Processor and takes the next images from
+                # a shared queue as soon as it is free, to balance the load
+                reports = dynamic_multi_core_run(
+                    function=lambda rank, items, processor: do_work(
+                        rank, items, processor, finalize=False
+                    ),
+                    iterable=iterable,
+                    nproc=params.mp.nproc,
+                    chunksize=params.mp.chunksize,
+                    initializer=lambda rank: Processor(
+                        copy.deepcopy(params), composite_tag="%04d" % rank, rank=rank
+                    ),
+                    finalizer=lambda processor: processor.finalize(),
+                )
+                logger.info("\nProcess utilisation:")
+                logger.info(
+                    tabulate(
+                        [
+                            (
+                                r.rank,
+                                r.num_items,
+                                f"{r.busy_time:.1f}",
+                                f"{r.wall_time:.1f}",
+                                f"{100 * r.utilisation:.1f}",
+                            )
+                            for r in reports
+                        ],
+                        headers=(
+                            "Process",
+                            "Images",
+                            "Busy time (s)",
+                            "Wall time (s)",
+                            "Utilisation (%)",
+                        ),
+                    )
+                )
+                error_list = [error for r in reports for error in r.errors]
+                if error_list:
+                    print(
+                        "Some processes failed execution. Not all images may have processed. Error messages:"
+                    )
+                    for error in error_list:
+                        print(error)
 
         # Total Time
         logger.info("")
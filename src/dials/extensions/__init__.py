@@ -1,6 +1,33 @@
 from __future__ import annotations
 
-import pkg_resources
+import functools
+import importlib.metadata
+
+
+@functools.lru_cache(maxsize=None)
+def _entry_points(group):
+    """
+    Find the entry points registered for a group, without loading them.
+
+    The installed distributions are only scanned the first time that any group
+    is requested, and the entry points found are cached for the process.
+
+    :param group: The name of the entry point group
+    :returns: A tuple of the entry points, in the order they were found
+    """
+    entry_points = _all_entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=group)
+    else:
+        # Python < 3.10
+        entry_points = entry_points.get(group, ())
+    # A distribution found more than once on the path lists its entry points twice
+    return tuple(dict.fromkeys(entry_points))
+
+
+@functools.lru_cache(maxsize=None)
+def _all_entry_points():
+    return importlib.metadata.entry_points()
 
 
 class _Extension:
@@ -13,21 +40,21 @@ class _Extension:
     @classmethod
     def extensions(cls):
         """Return a list of all registered extension classes."""
-        return [
-            entry_point.load()
-            for entry_point in pkg_resources.iter_entry_points(cls.entry_point)
-        ]
+        return [entry_point.load() for entry_point in _entry_points(cls.entry_point)]
 
     @classmethod
     def load(cls, name):
         """Get the requested extension class by name.
 
+        Only the module of the requested extension is imported.
+
         :param name: The name of the extension
         :returns: The extension class
         """
-        for entry_point in pkg_resources.iter_entry_points(cls.entry_point, name):
+        for entry_point in _entry_points(cls.entry_point):
             # if there are multiple entry points with the same name then just return the first
-            return entry_point.load()
+            if entry_point.name == name:
+                return entry_point.load()
 
     @classmethod
     def phil_scope(cls):
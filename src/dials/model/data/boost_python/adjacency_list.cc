@@ -12,7 +12,9 @@
 #include <boost/python/def.hpp>
 #include <boost/python/iterator.hpp>
 #include <boost_adaptbx/std_pair_conversion.h>
+#include <dials/array_family/scitbx_shared_and_versa.h>
 #include <dials/model/data/adjacency_list.h>
+#include <dials/error.h>
 
 namespace dials { namespace model { namespace boost_python {
 
@@ -65,17 +67,55 @@ namespace dials { namespace model { namespace boost_python {
                                       self.edges(index).second);
   }
 
+  /**
+   * Add an edge between each pair of vertices a[i] and b[i]. The list must be
+   * finished before the edges can be read.
+   */
+  void add_edges(AdjacencyList &self,
+                 const af::const_ref<std::size_t> &a,
+                 const af::const_ref<std::size_t> &b) {
+    DIALS_ASSERT(a.size() == b.size());
+    for (std::size_t i = 0; i < a.size(); ++i) {
+      DIALS_ASSERT(a[i] < self.num_vertices());
+      DIALS_ASSERT(b[i] < self.num_vertices());
+      self.add_edge(a[i], b[i]);
+    }
+  }
+
+  /**
+   * Get the vertices of each edge as a pair of arrays, listing each edge once
+   * with the lower numbered vertex first.
+   */
+  tuple edge_arrays(const AdjacencyList &self) {
+    af::shared<std::size_t> a;
+    af::shared<std::size_t> b;
+    a.reserve(self.num_edges());
+    b.reserve(self.num_edges());
+    AdjacencyList::edge_iterator_range range = self.edges();
+    for (AdjacencyList::edge_iterator it = range.first; it != range.second; ++it) {
+      if (it->first < it->second) {
+        a.push_back(it->first);
+        b.push_back(it->second);
+      }
+    }
+    return make_tuple(a, b);
+  }
+
   void export_adjacency_list() {
     class_<AdjacencyList::edge_descriptor>("EdgeDescriptor", no_init);
 
     iterator_wrapper<adjacent_vertices_iterator>::wrap("AdjacentVerticesIter");
 
     class_<AdjacencyList>("AdjacencyList", no_init)
+      .def(init<std::size_t>())
       .def("source", &AdjacencyList::source)
       .def("target", &AdjacencyList::target)
       .def("adjacent_vertices", &make_adjacent_vertices_iterator)
       .def("edges", boost::python::range(edges_begin, edges_end))
       .def("add_edge", &AdjacencyList::add_edge)
+      .def("add_edges", &add_edges)
+      .def("finish", &AdjacencyList::finish)
+      .def("edge_arrays", &edge_arrays)
       .def("num_vertices", &AdjacencyList::num_vertices)
       .def("num_edges", &AdjacencyList::num_edges);
   }
@@ -4,7 +4,6 @@
 from copy import copy
 from math import ceil, floor
 
-import iotbx
 from cctbx import crystal, miller, uctbx
 from dxtbx.model import ExperimentList
 from scitbx.array_family import flex
@@ -14,6 +13,7 @@
 from dials.report.plots import d_star_sq_to_d_ticks
 from dials.util.export_mtz import MTZWriterBase
 from dials.util.filter_reflections import filter_reflection_table
+from dials.util.merging_statistics import cached_dataset_statistics
 
 logger = logging.getLogger("dials.command_line.damage_analysis")
 
@@ -101,8 +101,8 @@ def add_to_accumulation_series(self, data, low, upper):
     def _add_data_to_plots_dict(self, plots_dict, data, low, upper):
         label = f"{low} <= dose < {upper}"
         try:
-            result = iotbx.merging_statistics.dataset_statistics(
-                i_obs=data,
+            result = cached_dataset_statistics(
+                data,
                 n_bins=20,
                 anomalous=False,
                 use_internal_variance=False,
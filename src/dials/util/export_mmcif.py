@@ -12,13 +12,13 @@
 from cctbx import crystal as cctbxcrystal
 from cctbx import miller
 from cctbx.sgtbx import bravais_types
-from iotbx.merging_statistics import dataset_statistics
 from libtbx import Auto
 from scitbx.array_family import flex
 
 import dials.util.version
 from dials.algorithms.symmetry import median_unit_cell
 from dials.util.filter_reflections import filter_reflection_table
+from dials.util.merging_statistics import cached_dataset_statistics
 
 logger = logging.getLogger(__name__)
 RAD2DEG = 180.0 / math.pi
@@ -389,8 +389,8 @@ def make_cif_block(self, experiments, reflections):
                 miller.array_info(source="DIALS", source_type="reflection_tables")
             )
 
-            result = dataset_statistics(
-                i_obs=i_obs,
+            result = cached_dataset_statistics(
+                i_obs,
                 crystal_symmetry=crystal_symmetry,
                 use_internal_variance=False,
                 eliminate_sys_absent=False,
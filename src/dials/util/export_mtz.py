@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures
 import logging
 import time
 import warnings
@@ -11,7 +12,6 @@
 
 import gemmi
 import numpy as np
-import pandas as pd
 
 from cctbx import uctbx
 from dxtbx import flumpy
@@ -358,183 +358,162 @@ def add_batch_list(
     return
 
 
-def write_columns(mtz, reflection_table):
-    """Write the column definitions AND data to the current dataset."""
+# The approximate maximum memory, in bytes, used for the values of the columns
+# being converted by write_columns at any one time
+MAX_CONVERSION_MEMORY = 2**28
+# The maximum number of rows converted by write_columns in one block
+MAX_BLOCK_SIZE = 2**14
 
-    nref = len(reflection_table["miller_index"])
-    assert nref
-    xdet, ydet, _ = [
-        flex.double(x) for x in reflection_table["xyzobs.px.value"].parts()
-    ]
 
-    type_table = {
-        "H": "H",
-        "K": "H",
-        "L": "H",
-        "I": "J",
-        "SIGI": "Q",
-        "IPR": "J",
-        "SIGIPR": "Q",
-        "BG": "R",
-        "SIGBG": "R",
-        "XDET": "R",
-        "YDET": "R",
-        "BATCH": "B",
-        "BGPKRATIOS": "R",
-        "WIDTH": "R",
-        "MPART": "I",
-        "M_ISYM": "Y",
-        "FLAG": "I",
-        "LP": "R",
-        "FRACTIONCALC": "R",
-        "ROT": "R",
-        "QE": "R",
-    }
-
-    mtz_data = pd.DataFrame(
-        flumpy.to_numpy(reflection_table["miller_index"]).astype("float32"),
-        columns=["H", "K", "L"],
-    )
-    mtz_data.insert(3, "M/ISYM", np.zeros(nref, dtype="float32"))
+def _mtz_columns(reflection_table):
+    """
+    Choose the columns to write for a reflection table.
 
-    # H, K, L are in the base dataset, but we have to add M/ISYM
-    mtz.add_column("M/ISYM", type_table["M_ISYM"])
-    mtz.add_column("BATCH", type_table["BATCH"])
-    mtz_data.insert(
-        4, "BATCH", flumpy.to_numpy(reflection_table["batch"]).astype("float32")
-    )
+    :return: A list of the label, MTZ type and a function converting the rows of
+             the table, for each column after H, K, L
+    """
+
+    def column(name, transform=None, index=None):
+        def convert(table, rows):
+            values = flumpy.to_numpy(table[name])
+            values = values[rows] if index is None else values[rows, index]
+            return values if transform is None else transform(values)
+
+        return convert
+
+    def constant(value):
+        return lambda table, rows: value
+
+    columns = [
+        ("M/ISYM", "Y", constant(0)),
+        ("BATCH", "B", column("batch")),
+    ]
 
     # if intensity values used in scaling exist, then just export these as I, SIGI
     if "intensity.scale.value" in reflection_table:
-        I_scaling = reflection_table["intensity.scale.value"]
-        V_scaling = reflection_table["intensity.scale.variance"]
-        assert V_scaling.all_gt(0)  # Trap negative variances
-        mtz.add_column("I", type_table["I"])
-        mtz_data.insert(
-            len(mtz_data.columns), "I", flumpy.to_numpy(I_scaling).astype("float32")
-        )
-        mtz.add_column("SIGI", type_table["SIGI"])
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "SIGI",
-            flumpy.to_numpy(flex.sqrt(V_scaling)).astype("float32"),
-        )
-        mtz.add_column("SCALEUSED", "R")
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "SCALEUSED",
-            flumpy.to_numpy(reflection_table["inverse_scale_factor"]).astype("float32"),
-        )
-        mtz.add_column("SIGSCALEUSED", "R")
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "SIGSCALEUSED",
-            flumpy.to_numpy(
-                flex.sqrt(reflection_table["inverse_scale_factor_variance"])
-            ).astype("float32"),
-        )
+        # Trap negative variances
+        assert reflection_table["intensity.scale.variance"].all_gt(0)
+        columns += [
+            ("I", "J", column("intensity.scale.value")),
+            ("SIGI", "Q", column("intensity.scale.variance", np.sqrt)),
+            ("SCALEUSED", "R", column("inverse_scale_factor")),
+            ("SIGSCALEUSED", "R", column("inverse_scale_factor_variance", np.sqrt)),
+        ]
     else:
         if "intensity.prf.value" in reflection_table:
             if "intensity.sum.value" in reflection_table:
-                col_names = ("IPR", "SIGIPR")
+                labels = ("IPR", "SIGIPR")
             else:
-                col_names = ("I", "SIGI")
-            I_profile = reflection_table["intensity.prf.value"]
-            V_profile = reflection_table["intensity.prf.variance"]
-            assert V_profile.all_gt(0)  # Trap negative variances
-            mtz.add_column(col_names[0], type_table["I"])
-            mtz_data.insert(
-                len(mtz_data.columns),
-                col_names[0],
-                flumpy.to_numpy(I_profile.as_float()).astype("float32"),
-            )
-            mtz.add_column(col_names[1], type_table["SIGI"])
-            mtz_data.insert(
-                len(mtz_data.columns),
-                col_names[1],
-                flumpy.to_numpy(flex.sqrt(V_profile)).astype("float32"),
-            )
-
+                labels = ("I", "SIGI")
+            # Trap negative variances
+            assert reflection_table["intensity.prf.variance"].all_gt(0)
+            columns += [
+                (labels[0], "J", column("intensity.prf.value")),
+                (labels[1], "Q", column("intensity.prf.variance", np.sqrt)),
+            ]
         if "intensity.sum.value" in reflection_table:
-            I_sum = reflection_table["intensity.sum.value"]
-            V_sum = reflection_table["intensity.sum.variance"]
-            assert V_sum.all_gt(0)  # Trap negative variances
-            mtz.add_column("I", type_table["I"])
-            mtz_data.insert(
-                len(mtz_data.columns), "I", flumpy.to_numpy(I_sum).astype("float32")
-            )
-            mtz.add_column("SIGI", type_table["SIGI"])
-            mtz_data.insert(
-                len(mtz_data.columns),
-                "SIGI",
-                flumpy.to_numpy(flex.sqrt(V_sum)).astype("float32"),
-            )
+            # Trap negative variances
+            assert reflection_table["intensity.sum.variance"].all_gt(0)
+            columns += [
+                ("I", "J", column("intensity.sum.value")),
+                ("SIGI", "Q", column("intensity.sum.variance", np.sqrt)),
+            ]
 
     if (
         "background.sum.value" in reflection_table
         and "background.sum.variance" in reflection_table
     ):
-        bg = reflection_table["background.sum.value"]
-        varbg = reflection_table["background.sum.variance"]
-        assert (varbg >= 0).count(False) == 0
-        sigbg = flex.sqrt(varbg)
-        mtz.add_column("BG", type_table["BG"])
-        mtz_data.insert(
-            len(mtz_data.columns), "BG", flumpy.to_numpy(bg).astype("float32")
-        )
-        mtz.add_column("SIGBG", type_table["SIGBG"])
-        mtz_data.insert(
-            len(mtz_data.columns), "SIGBG", flumpy.to_numpy(sigbg).astype("float32")
-        )
-
-    mtz.add_column("FRACTIONCALC", type_table["FRACTIONCALC"])
-    mtz_data.insert(
-        len(mtz_data.columns),
-        "FRACTIONCALC",
-        flumpy.to_numpy(reflection_table["fractioncalc"]).astype("float32"),
-    )
+        assert reflection_table["background.sum.variance"].all_ge(0)
+        columns += [
+            ("BG", "R", column("background.sum.value")),
+            ("SIGBG", "R", column("background.sum.variance", np.sqrt)),
+        ]
 
-    mtz.add_column("XDET", type_table["XDET"])
-    mtz_data.insert(
-        len(mtz_data.columns), "XDET", flumpy.to_numpy(xdet).astype("float32")
-    )
-    mtz.add_column("YDET", type_table["YDET"])
-    mtz_data.insert(
-        len(mtz_data.columns), "YDET", flumpy.to_numpy(ydet).astype("float32")
-    )
-    mtz.add_column("ROT", type_table["ROT"])
-    mtz_data.insert(
-        len(mtz_data.columns),
-        "ROT",
-        flumpy.to_numpy(reflection_table["ROT"]).astype("float32"),
-    )
+    columns += [
+        ("FRACTIONCALC", "R", column("fractioncalc")),
+        ("XDET", "R", column("xyzobs.px.value", index=0)),
+        ("YDET", "R", column("xyzobs.px.value", index=1)),
+        ("ROT", "R", column("ROT")),
+    ]
     if "lp" in reflection_table:
-        mtz.add_column("LP", type_table["LP"])
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "LP",
-            flumpy.to_numpy(reflection_table["lp"]).astype("float32"),
-        )
+        columns.append(("LP", "R", column("lp")))
     if "qe" in reflection_table:
-        mtz.add_column("QE", type_table["QE"])
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "QE",
-            flumpy.to_numpy(reflection_table["qe"]).astype("float32"),
-        )
+        columns.append(("QE", "R", column("qe")))
     elif "dqe" in reflection_table:
-        mtz.add_column("QE", type_table["QE"])
-        mtz_data.insert(
-            len(mtz_data.columns),
-            "QE",
-            flumpy.to_numpy(reflection_table["dqe"]).astype("float32"),
-        )
+        columns.append(("QE", "R", column("dqe")))
+    else:
+        columns.append(("QE", "R", constant(1)))
+    return columns
+
+
+def write_columns(mtz, reflection_tables, nproc=1, max_memory=MAX_CONVERSION_MEMORY):
+    """
+    Write the column definitions AND data to the current dataset.
+
+    The data are converted a block of rows at a time and written straight into
+    the data array of the MTZ object, so that the memory used on top of the MTZ
+    data is limited to max_memory rather than a multiple of the size of the
+    reflection tables.
+
+    :param mtz: The gemmi MTZ object
+    :param reflection_tables: A reflection table, or a list of reflection tables
+                              to write one after the other, each with the same
+                              columns
+    :param nproc: The number of threads used to convert the columns
+    :param max_memory: The approximate maximum memory in bytes used for the
+                       values being converted at any one time
+    """
+    if isinstance(reflection_tables, (list, tuple)):
+        tables = reflection_tables
     else:
-        mtz.add_column("QE", type_table["QE"])
-        mtz_data.insert(len(mtz_data.columns), "QE", np.ones(nref).astype("float32"))
+        tables = [reflection_tables]
+    sizes = [len(table["miller_index"]) for table in tables]
+    nref = sum(sizes)
+    assert nref
 
+    columns = _mtz_columns(tables[0])
+    for table in tables[1:]:
+        assert [c[:2] for c in _mtz_columns(table)] == [c[:2] for c in columns]
+    # H, K, L are in the base dataset
+    for label, mtz_type, _ in columns:
+        mtz.add_column(label, mtz_type)
     mtz.switch_to_original_hkl()
-    mtz.set_data(mtz_data)
+
+    # An array of this size is only allocated as it is written, so memory is
+    # not used by both this and the MTZ data
+    mtz.set_data(np.empty((nref, len(mtz.columns)), dtype=np.float32))
+    data = mtz.array
+
+    # Split the rows into blocks small enough to stay in the CPU cache, and so
+    # that the blocks being converted by all of the threads use at most about
+    # max_memory: each row of a block uses 4 bytes per column, and up to 24
+    # bytes for the values of a column being converted
+    block_size = max(
+        1, min(MAX_BLOCK_SIZE, max_memory // ((4 * data.shape[1] + 24) * nproc))
+    )
+    blocks = []
+    offset = 0
+    for table, size in zip(tables, sizes):
+        for start in range(0, size, block_size):
+            blocks.append((table, slice(start, min(start + block_size, size)), offset))
+        offset += size
+
+    def write(block):
+        table, rows, offset = block
+        values = np.empty((rows.stop - rows.start, data.shape[1]), dtype=np.float32)
+        values[:, :3] = flumpy.to_numpy(table["miller_index"])[rows]
+        for i, (_, _, convert) in enumerate(columns):
+            values[:, i + 3] = convert(table, rows)
+        data[offset + rows.start : offset + rows.stop] = values
+
+    if nproc > 1:
+        # The conversions are done by numpy, which releases the GIL
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nproc) as pool:
+            for _ in pool.map(write, blocks):
+                pass
+    else:
+        for block in blocks:
+            write(block)
 
 
 def export_mtz(
@@ -552,6 +531,7 @@ def export_mtz(
     crystal_name=None,
     project_name=None,
     wavelength_tolerance=1e-4,
+    nproc=1,
 ):
     """Export data from reflection_table corresponding to experiment_list to an
     MTZ file hklout."""
@@ -758,27 +738,23 @@ def export_mtz(
         ds.project_name = project_name
         ds.wavelength = wavelength.weighted_mean
 
-    # Combine all of the experiment data columns before writing
-    combined_data = {k: v.deep_copy() for k, v in experiment_list[0].data.items()}
-    for experiment in experiment_list[1:]:
-        for k, v in experiment.data.items():
-            combined_data[k].extend(v)
+    # Write the data of the experiments one after the other, rather than
+    # combining them into one table first
+    experiment_data = [experiment.data for experiment in experiment_list]
     # ALL columns must be the same length
-    assert len({len(v) for v in combined_data.values()}) == 1, "Column length mismatch"
-    assert len(combined_data["id"]) == len(
-        reflection_table["id"]
-    ), "Lost rows in split/combine"
+    for data in experiment_data:
+        assert len({len(v) for v in data.values()}) == 1, "Column length mismatch"
+    n_written = sum(len(data["id"]) for data in experiment_data)
+    assert n_written == len(reflection_table["id"]), "Lost rows in split/combine"
 
     # Write all the data and columns to the mtz file
-    write_columns(mtz, combined_data)
+    write_columns(mtz, experiment_data, nproc=nproc)
 
     # Switch to ASU indices and sort file in standard order
     mtz.switch_to_asu_hkl()
     mtz.sort(5)
 
-    logger.info(
-        "Saving %s integrated reflections to %s", len(combined_data["id"]), filename
-    )
+    logger.info("Saving %s integrated reflections to %s", n_written, filename)
     mtz.write_to_file(filename)
     log_summary(mtz)
 
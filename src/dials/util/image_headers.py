@@ -0,0 +1,307 @@
+"""
+Read the experimental models from the headers of many image files in parallel,
+with an optional on-disk cache of the models read.
+
+ExperimentListFactory.from_filenames reads the header of each image file in
+turn, which for sweeps of 10^4 - 10^5 files can take minutes. Here the files
+are grouped by template and split into chunks of consecutive images, and the
+chunks are read by ExperimentListFactory.from_filenames in a pool of worker
+processes. The results are merged in order as they become available, and a
+sequence which was split at the boundary between two chunks is joined back
+into a single sequence if the models and scans of the two parts are
+consistent, in the same way as for consecutive images within a chunk.
+
+The experiments read from each chunk can be cached on disk, keyed by the path,
+size and modification time of each of the files in the chunk (and the format
+and model comparison options), so that the headers of the files are not read
+again when the same images are imported again. As the chunk boundaries are
+fixed for each template, only the last chunk of a sweep has to be read again if
+more images are added to the sweep.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import copy
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+
+from dxtbx.imageset import ImageSequence, ImageSetFactory
+from dxtbx.model.experiment_list import (
+    BeamComparison,
+    DetectorComparison,
+    ExperimentList,
+    ExperimentListFactory,
+    GoniometerComparison,
+)
+from dxtbx.sequence_filenames import template_regex
+
+from dials.util.version import dials_version
+
+logger = logging.getLogger(__name__)
+
+# The maximum number of consecutive images of a template read in one task
+CHUNK_SIZE = 1000
+
+
+def comparisons_from_tolerance(tolerance):
+    """
+    Create the model comparison functions from the input.tolerance parameters.
+
+    :param tolerance: The input.tolerance phil scope extract
+    :return: A dictionary of the compare_beam, compare_detector,
+             compare_goniometer and scan_tolerance keyword arguments of
+             ExperimentListFactory.from_filenames
+    """
+    return {
+        "compare_beam": BeamComparison(
+            wavelength_tolerance=tolerance.beam.wavelength,
+            direction_tolerance=tolerance.beam.direction,
+            polarization_normal_tolerance=tolerance.beam.polarization_normal,
+            polarization_fraction_tolerance=tolerance.beam.polarization_fraction,
+        ),
+        "compare_detector": DetectorComparison(
+            fast_axis_tolerance=tolerance.detector.fast_axis,
+            slow_axis_tolerance=tolerance.detector.slow_axis,
+            origin_tolerance=tolerance.detector.origin,
+        ),
+        "compare_goniometer": GoniometerComparison(
+            rotation_axis_tolerance=tolerance.goniometer.rotation_axis,
+            fixed_rotation_tolerance=tolerance.goniometer.fixed_rotation,
+            setting_rotation_tolerance=tolerance.goniometer.setting_rotation,
+        ),
+        "scan_tolerance": tolerance.scan.oscillation,
+    }
+
+
+def _expand_paths(paths):
+    """Expand directories into the files they contain, in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def _split_into_chunks(filenames, chunk_size):
+    """
+    Group the files by template, and split the files of each template into
+    chunks of consecutive images.
+
+    :return: A list of lists of filenames
+    """
+    templates = defaultdict(list)
+    for filename in filenames:
+        try:
+            template, index = template_regex(filename)
+        except ValueError:
+            template, index = None, None
+        if template is None or index is None:
+            template, index = filename, 0
+        templates[template].append((index, filename))
+
+    chunks = []
+    for indexed_filenames in templates.values():
+        indexed_filenames.sort()
+        for i in range(0, len(indexed_filenames), chunk_size):
+            chunks.append([f for _, f in indexed_filenames[i : i + chunk_size]])
+    return chunks
+
+
+def _cache_path(directory, filenames, format_kwargs, comparisons, load_models):
+    """The path of the cache file for a chunk of image files."""
+    files = []
+    for filename in filenames:
+        st = os.stat(filename)
+        files.append((os.path.abspath(filename), st.st_size, st.st_mtime_ns))
+    options = {
+        key: vars(value) if hasattr(value, "__dict__") else value
+        for key, value in comparisons.items()
+    }
+    key = json.dumps(
+        [dials_version(), format_kwargs, options, load_models, files],
+        sort_keys=True,
+        default=str,
+    )
+    return os.path.join(directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _read_chunk(filenames, format_kwargs, comparisons, load_models, cache_directory):
+    """
+    Read the experiments from a chunk of image files, or from the cache.
+
+    :return: A tuple of the experiments, the unhandled filenames, and whether
+             the experiments were read from the cache
+    """
+    cache_path = None
+    if cache_directory:
+        try:
+            cache_path = _cache_path(
+                cache_directory, filenames, format_kwargs, comparisons, load_models
+            )
+        except OSError:
+            # e.g. a file does not exist: leave it to from_filenames to report
+            pass
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            experiments = ExperimentListFactory.from_dict(cached["experiments"])
+            return experiments, cached["unhandled"], True
+        except Exception as e:
+            logger.debug("Could not read header cache file %s: %s", cache_path, e)
+
+    unhandled = []
+    experiments = ExperimentListFactory.from_filenames(
+        filenames,
+        unhandled=unhandled,
+        format_kwargs=format_kwargs,
+        load_models=load_models,
+        **comparisons,
+    )
+    if cache_path:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"experiments": experiments.to_dict(), "unhandled": unhandled}, f
+                )
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug("Could not write header cache file %s: %s", cache_path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return experiments, unhandled, False
+
+
+def _join_sequences(first, second, comparisons):
+    """
+    Join two consecutive parts of a sequence.
+
+    :return: The joined sequence, or None if the sequences cannot be joined
+    """
+    if not (isinstance(first, ImageSequence) and isinstance(second, ImageSequence)):
+        return None
+    if first.get_template() != second.get_template():
+        return None
+    if first.get_format_class() != second.get_format_class():
+        return None
+    if not comparisons["compare_beam"](first.get_beam(), second.get_beam()):
+        return None
+    if not comparisons["compare_detector"](first.get_detector(), second.get_detector()):
+        return None
+    gonio1, gonio2 = first.get_goniometer(), second.get_goniometer()
+    if (gonio1 is None) != (gonio2 is None) or (
+        gonio1 is not None and not comparisons["compare_goniometer"](gonio1, gonio2)
+    ):
+        return None
+    scan = copy.deepcopy(first.get_scan())
+    try:
+        if comparisons["scan_tolerance"] is None:
+            scan.append(second.get_scan())
+        else:
+            scan.append(second.get_scan(), scan_tolerance=comparisons["scan_tolerance"])
+    except RuntimeError:
+        return None
+    start, end = scan.get_image_range()
+    return ImageSetFactory.make_sequence(
+        template=first.get_template(),
+        indices=list(range(start, end + 1)),
+        format_class=first.get_format_class(),
+        beam=first.get_beam(),
+        detector=first.get_detector(),
+        goniometer=gonio1,
+        scan=scan,
+        format_kwargs=first.params(),
+    )
+
+
+def experiments_from_filenames(
+    filenames,
+    unhandled=None,
+    nproc=1,
+    cache_directory=None,
+    format_kwargs=None,
+    compare_beam=None,
+    compare_detector=None,
+    compare_goniometer=None,
+    scan_tolerance=None,
+    load_models=True,
+):
+    """
+    Create an experiment list from image files or directories, reading the
+    image headers in parallel and/or from a cache.
+
+    :param filenames: The image files or directories containing image files
+    :param unhandled: A list to which the files which could not be read as
+                      images are appended
+    :param nproc: The number of processes used to read the image headers
+    :param cache_directory: A directory in which to cache the models read from
+                            the image headers, or None
+    :param format_kwargs: The format keyword arguments
+    :param compare_beam: The beam comparison function
+    :param compare_detector: The detector comparison function
+    :param compare_goniometer: The goniometer comparison function
+    :param scan_tolerance: The scan oscillation tolerance
+    :param load_models: Whether to load all models for the experiments
+    :return: The experiment list
+    """
+    comparisons = {
+        "compare_beam": compare_beam or BeamComparison(),
+        "compare_detector": compare_detector or DetectorComparison(),
+        "compare_goniometer": compare_goniometer or GoniometerComparison(),
+        "scan_tolerance": scan_tolerance,
+    }
+    if cache_directory:
+        os.makedirs(cache_directory, exist_ok=True)
+    chunks = _split_into_chunks(list(_expand_paths(filenames)), CHUNK_SIZE)
+    args = (format_kwargs, comparisons, load_models, cache_directory)
+
+    nproc = min(nproc, len(chunks))
+    if nproc > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=nproc)
+        results = pool.map(_read_chunk, chunks, *([arg] * len(chunks) for arg in args))
+    else:
+        pool = None
+        results = (_read_chunk(chunk, *args) for chunk in chunks)
+
+    # Merge the imagesets of the chunks as they are read, in order
+    imagesets = []
+    n_cached = 0
+    try:
+        for experiments, chunk_unhandled, cached in results:
+            n_cached += cached
+            if unhandled is not None:
+                unhandled.extend(chunk_unhandled)
+            for imageset in experiments.imagesets():
+                joined = None
+                if imagesets:
+                    joined = _join_sequences(imagesets[-1], imageset, comparisons)
+                if joined is not None:
+                    imagesets[-1] = joined
+                else:
+                    imagesets.append(imageset)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    logger.debug(
+        "Read image headers in %d chunks (%d from cache) with %d processes",
+        len(chunks),
+        n_cached,
+        max(nproc, 1),
+    )
+
+    experiments = ExperimentList()
+    for imageset in imagesets:
+        experiments.extend(
+            ExperimentListFactory.from_imageset_and_crystal(
+                imageset, None, load_models=load_models
+            )
+        )
+    return experiments
@@ -0,0 +1,193 @@
+"""
+A cache of the decoded image data and derived images shown in the image
+viewer, so that stepping back and forth through the images of a sequence, or
+stacking images, does not read and decode the same images again.
+
+The cache holds the least recently used items up to a limit on the memory they
+use, and can read images in a background thread (e.g. the images either side
+of the one displayed) while the viewer is idle.
+"""
+
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# The size in bytes of the elements of the flex array types, by type name
+_ITEMSIZE = {"bool": 1, "float": 4, "int": 4, "double": 8, "size_t": 8}
+
+
+def nbytes(data):
+    """
+    Estimate the memory used by image data.
+
+    :param data: A flex or numpy array, or a tuple or list of arrays
+    :return: The size of the data in bytes
+    """
+    if isinstance(data, (tuple, list)):
+        return sum(nbytes(d) for d in data)
+    if hasattr(data, "nbytes"):
+        return data.nbytes
+    return len(data) * _ITEMSIZE.get(type(data).__name__, 8)
+
+
+class IdentityKey:
+    """
+    A key for an object by its identity, e.g. an imageset, which holds a
+    reference to the object, so that the id of the object can't be reused by
+    another object while the key is held in a cache.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return isinstance(other, IdentityKey) and other.obj is self.obj
+
+
+class ImageCache:
+    """
+    A thread-safe least-recently-used cache with a limit on the memory used,
+    which can load items in a background thread.
+    """
+
+    def __init__(self, max_bytes, sizeof=nbytes):
+        """
+        :param max_bytes: The maximum total size of the items held
+        :param sizeof: A function returning the size in bytes of an item
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        # Events for the items currently being loaded, by key
+        self._loading = {}
+        # The image readers are not thread-safe, so load one item at a time.
+        # Other reads from the same images (e.g. of the masks) must also hold
+        # this lock.
+        self.load_lock = threading.Lock()
+        self._pending = collections.deque()
+        self._condition = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    @property
+    def nbytes(self):
+        """The total size of the items held"""
+        return self._nbytes
+
+    def get(self, key, load):
+        """
+        Get an item, loading it if it is not held in the cache.
+
+        If the item is being loaded in the background, wait for it rather than
+        loading it again.
+
+        :param key: The key of the item
+        :param load: A function with no arguments which loads the item
+        :return: The item
+        """
+        while True:
+            with self._lock:
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return self._items[key][0]
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            event.wait()
+
+        try:
+            with self.load_lock:
+                item = load()
+            self._insert(key, item)
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+        return item
+
+    def _insert(self, key, item):
+        size = self.sizeof(item)
+        with self._lock:
+            if key in self._items:
+                self._nbytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._items[key] = (item, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                _, (_, dropped) = self._items.popitem(last=False)
+                self._nbytes -= dropped
+
+    def prefetch(self, items):
+        """
+        Load items in a background thread, replacing any items that are still
+        waiting to be loaded.
+
+        :param items: A list of (key, load) pairs, in the order to load them
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._pending.clear()
+            self._pending.extend(items)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="ImageCachePrefetch", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                key, load = self._pending.popleft()
+                if key in self._items or key in self._loading:
+                    continue
+            try:
+                self.get(key, load)
+            except Exception as e:
+                logger.debug("Failed to prefetch image %s: %s", key, e)
+
+    def clear(self):
+        """Remove all of the items."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def close(self):
+        """Stop loading items in the background."""
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -392,9 +392,17 @@ def get_beam_center_px(self):
 
         return panel_id, beam_pixel_fast, beam_pixel_slow
 
-    def load_image(self, file_name_or_data, get_image_data=None, show_untrusted=False):
+    def load_image(
+        self,
+        file_name_or_data,
+        get_image_data=None,
+        show_untrusted=False,
+        cache_key=None,
+    ):
         """The load_image() function displays the image from @p
-        file_name_or_data.  The chooser is updated appropriately.
+        file_name_or_data.  The chooser is updated appropriately.  If a
+        cache_key is given, the tiles of the image are kept for when it
+        is displayed again with the same cache_key.
         """
 
         # Due to a bug in wxPython 3.0.2 for Linux
@@ -439,6 +447,7 @@ def load_image(self, file_name_or_data, get_image_data=None, show_untrusted=Fals
                 self.settings.display == "image"
                 and self.settings.image_type == "corrected"
             ),
+            cache_key=cache_key,
         )
 
         # Initialise position zoom level for first image.  XXX Why do we
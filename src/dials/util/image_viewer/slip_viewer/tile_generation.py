@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import collections
 import math
 import sys
 
@@ -18,8 +19,17 @@
 class _Tiles:
     # maximum number of tiles held in each level cache
     MaxTileList = 512
+    # maximum number of images for which the tiles of every level are kept
+    MaxPyramids = 8
 
     def __init__(self, filename):
+        # the tiles of recently displayed images, by image and display settings,
+        # with the estimated memory used by each
+        self.pyramids = collections.OrderedDict()
+        self.pyramid_key = None
+        # the maximum memory in bytes used by the kept tiles, or None
+        self.max_pyramid_bytes = None
+        self.pyramid_bytes = 0
         (self.tile_size_x, self.tile_size_y) = (256, 256)
         self.levels = [-3, -2, -1, 0, 1, 2, 3, 4, 5]
 
@@ -40,7 +50,18 @@ def set_image(
         metrology_matrices=None,
         get_image_data=None,
         show_saturated=True,
+        cache_key=None,
     ):
+        """
+        Set the image to display.
+
+        If a cache_key is given, the tiles created for the image are kept when
+        another image is set, and are displayed again if the image is set with
+        the same cache_key, brightness and color scheme, rather than reading
+        the image data and creating the tiles again. The cache_key should
+        identify both the image and the settings used to create its data.
+        """
+        self.store_pyramid()
         self.reset_the_cache()
         if file_name_or_data is None:
             self.raw_image = None
@@ -66,6 +87,22 @@ def set_image(
         if len(detector) > 1 and metrology_matrices is not None:
             self.raw_image.apply_metrology_from_matrices(metrology_matrices)
 
+        if cache_key is not None:
+            self.pyramid_key = (
+                cache_key,
+                self.current_brightness,
+                self.current_color_scheme,
+                self.show_untrusted,
+                self.zoom_level >= 0,
+            )
+            pyramid = self.pyramids.pop(self.pyramid_key, None)
+            if pyramid is not None:
+                pyramid, size = pyramid
+                self.pyramid_bytes -= size
+                self.flex_image, self.cache, self.lru, image_data = pyramid
+                self.raw_image.set_image_data(image_data)
+                return
+
         if get_image_data is not None:
             self.raw_image.set_image_data(get_image_data(self.raw_image))
         image_data = self.raw_image.get_image_data()
@@ -86,6 +123,7 @@ def set_image(
 
     def set_image_data(self, raw_image_data, show_saturated=True):
         self.reset_the_cache()
+        self.pyramid_key = None
         # XXX Since there doesn't seem to be a good way to refresh the
         # image (yet), the metrology has to be applied here, and not
         # in frame.py.
@@ -117,6 +155,7 @@ def update_brightness(self, b, color_scheme=0):
         )
 
         self.reset_the_cache()
+        self.pyramid_key = None
         self.UseLevel(self.zoom_level)
         self.current_color_scheme = color_scheme
         self.current_brightness = b
@@ -125,6 +164,7 @@ def update_brightness(self, b, color_scheme=0):
     def update_color_scheme(self, color_scheme=0):
         self.flex_image.adjust(color_scheme)
         self.reset_the_cache()
+        self.pyramid_key = None
         self.UseLevel(self.zoom_level)
         self.current_color_scheme = color_scheme
 
@@ -136,6 +176,43 @@ def reset_the_cache(self):
             self.cache[l] = {}
             self.lru[l] = []
 
+    def pyramid_nbytes(self, image_data):
+        """Estimate the memory used by the tiles and data of the current image"""
+        if not isinstance(image_data, tuple):
+            image_data = (image_data,)
+        # the image data as doubles, with a padded copy and the rendered
+        # channels held by the flex image
+        data_bytes = 8 * sum(len(data) for data in image_data)
+        n_tiles = sum(len(tiles) for tiles in self.cache.values())
+        tile_bytes = 4 * self.tile_size_x * self.tile_size_y
+        return 2 * data_bytes + n_tiles * tile_bytes
+
+    def store_pyramid(self):
+        """Keep the tiles of the current image, if it was set with a cache_key"""
+        if self.pyramid_key is None:
+            return
+        image_data = self.raw_image.get_image_data()
+        size = self.pyramid_nbytes(image_data)
+        key, self.pyramid_key = self.pyramid_key, None
+        if self.max_pyramid_bytes is not None and size > self.max_pyramid_bytes:
+            return
+        self.pyramids[key] = (
+            (self.flex_image, self.cache, self.lru, image_data),
+            size,
+        )
+        self.pyramid_bytes += size
+        while len(self.pyramids) > self.MaxPyramids or (
+            self.max_pyramid_bytes is not None
+            and self.pyramid_bytes > self.max_pyramid_bytes
+        ):
+            _, (_, dropped) = self.pyramids.popitem(last=False)
+            self.pyramid_bytes -= dropped
+
+    def clear_pyramids(self):
+        """Discard the tiles kept for all images but the current one"""
+        self.pyramids.clear()
+        self.pyramid_bytes = 0
+
     def flex_image_get_tile(self, x, y):
         # The supports_rotated_tiles_antialiasing_recommended flag in
         # the C++ FlexImage class indicates whether the underlying image
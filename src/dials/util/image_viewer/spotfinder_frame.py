@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import collections
+import functools
 import itertools
 import math
 import types
@@ -31,6 +32,7 @@
 from dials.command_line.find_spots import phil_scope as find_spots_phil_scope
 from dials.extensions import SpotFinderThreshold
 from dials.util import masking
+from dials.util.image_viewer.image_cache import IdentityKey, ImageCache
 from dials.util.image_viewer.mask_frame import MaskSettingsFrame
 from dials.util.image_viewer.spotfinder_wrap import chooser_wrapper
 
@@ -63,6 +65,10 @@
     ],
 )
 
+# The memory used by the dispersion debug images of a panel, per pixel: the
+# mean, variance and index of dispersion, and four masks
+_DISPERSION_DEBUG_BYTES_PER_PIXEL = 3 * 8 + 4
+
 myEVT_LOADIMG = wx.NewEventType()
 EVT_LOADIMG = wx.PyEventBinder(myEVT_LOADIMG, 1)
 
@@ -110,6 +116,12 @@ def __call__(self, *args):
         return dispersion
 
 
+def _read_image(imageset, index, corrected):
+    if corrected:
+        return imageset.get_corrected_data(index)
+    return imageset.get_raw_data(index)
+
+
 def calculate_isoresolution_lines(
     spacings,
     beam,
@@ -323,7 +335,15 @@ def __init__(self, *args, **kwds):
 
         self.display_foreground_circles_patch = False  # hard code this option, for now
 
-        self._dispersion_debug_list_hash = 0
+        # Caches of the image data read, of the dispersion debug images
+        # calculated, and of the tiles drawn, for the recently viewed images,
+        # which share the memory limit
+        max_bytes = self.params.image_cache.max_memory * 1024**2
+        self._image_cache = ImageCache(max_bytes // 3)
+        self._dispersion_debug_cache = ImageCache(
+            max_bytes // 3, sizeof=lambda item: item[1]
+        )
+        self._max_pyramid_bytes = max_bytes // 3
 
         if (
             self.experiments is not None
@@ -710,6 +730,11 @@ def load_file_event(self, evt):
 
     def reload_image(self):
         """Re-load the currently displayed image"""
+        # The mask or stacking may have changed, so the images derived from the
+        # image data can't be reused
+        self._dispersion_debug_cache.clear()
+        if self.pyslip is not None:
+            self.pyslip.tiles.clear_pyramids()
         with wx.BusyCursor():
             self.load_image(self.images.selected, refresh=True)
 
@@ -747,13 +772,29 @@ def load_image(self, file_name_or_data, refresh=False):
         if self.params.show_mask:
             show_untrusted = True
 
+        # The tiles of single images can be kept to display again, but not
+        # those of stacked images
+        cache_key = None
+        if self.params.stack_images == 1:
+            cache_key = (
+                IdentityKey(file_name_or_data.image_set),
+                file_name_or_data.index,
+                self.settings.display,
+                self.settings.image_type,
+                self.params.show_mask,
+                self._dispersion_settings(),
+            )
+
         previously_selected_image = self.images.selected
         self.images.selected = file_name_or_data
+        if self.pyslip is not None:
+            self.pyslip.tiles.max_pyramid_bytes = self._max_pyramid_bytes
         # Do the actual data/image loading and update the viewer
         super().load_image(
             file_name_or_data,
             get_image_data=self.get_image_data,
             show_untrusted=show_untrusted,
+            cache_key=cache_key,
         )
 
         # Update the navigation UI controls to reflect this loaded image
@@ -768,6 +809,48 @@ def load_image(self, file_name_or_data, refresh=False):
         ):
             previously_selected_image.set_image_data(None)
 
+        self._prefetch_images()
+
+    def _read_image_data(self, image, corrected=True):
+        """Read the data of an image, or get it from the image cache"""
+        return self._image_cache.get(
+            (IdentityKey(image.image_set), image.index, corrected),
+            functools.partial(_read_image, image.image_set, image.index, corrected),
+        )
+
+    def _prefetch_images(self):
+        """Read the images either side of the current image in the background"""
+        n_prefetch = self.params.image_cache.prefetch
+        if not n_prefetch:
+            return
+        corrected = (
+            self.settings.display != "image"
+            or self.settings.image_type == "corrected"
+            or self.params.stack_images > 1
+        )
+        i_selected = self.images.selected_index
+        n_after = n_prefetch + self.params.stack_images - 1
+        offsets = [
+            offset
+            for i in range(1, max(n_after, n_prefetch) + 1)
+            for offset in (i, -i)
+            if offset <= n_after and -offset <= n_prefetch
+        ]
+        items = []
+        for offset in offsets:
+            if not 0 <= i_selected + offset < len(self.images):
+                continue
+            image = self.images[i_selected + offset]
+            items.append(
+                (
+                    (IdentityKey(image.image_set), image.index, corrected),
+                    functools.partial(
+                        _read_image, image.image_set, image.index, corrected
+                    ),
+                )
+            )
+        self._image_cache.prefetch(items)
+
     def OnShowSettings(self, event):
         if self.settings_frame is None:
             frame_rect = self.GetRect()
@@ -1078,7 +1161,10 @@ def stack_images(self):
         if self.params.stack_images > 1:
             self.settings.display = "image"
             image = self.pyslip.tiles.raw_image
-            image_data = image.get_image_data()
+            # The image readers are not thread-safe, so don't read the image
+            # while other images are read in the background
+            with self._image_cache.load_lock:
+                image_data = image.get_image_data()
             if not isinstance(image_data, tuple):
                 image_data = (image_data,)
 
@@ -1090,7 +1176,7 @@ def stack_images(self):
                 if (i_frame + i) >= len(self.images):
                     break
 
-                image_data_i = self.images[i_frame + i].get_image_data()
+                image_data_i = self._read_image_data(self.images[i_frame + i])
                 for j, rd in enumerate(image_data):
                     data = image_data_i[j]
 
@@ -1101,7 +1187,8 @@ def stack_images(self):
                         rd += data
 
                 if self.params.show_mask:
-                    image_masks = self.images[i_frame + i].get_mask()
+                    with self._image_cache.load_lock:
+                        image_masks = self.images[i_frame + i].get_mask()
                     for merged_mask, image_mask in zip(masks, image_masks):
                         merged_mask.set_selected(~image_mask, True)
 
@@ -1124,14 +1211,16 @@ def stack_images(self):
     def get_image_data(self, image):
         image.set_image_data(None)
         if self.settings.display == "image":
-            if self.settings.image_type == "corrected":
-                image_data = image.get_image_data()
-            else:
-                image_data = image.get_image_data(corrected=False)
-            if isinstance(image_data, tuple):
-                image_data = tuple(id.as_double() for id in image_data)
-            else:
-                image_data = (image_data.as_double(),)
+            image_data = self._read_image_data(
+                image, corrected=self.settings.image_type == "corrected"
+            )
+            if not isinstance(image_data, tuple):
+                image_data = (image_data,)
+            # Copy the cached data, as the mask is applied in place
+            image_data = tuple(
+                id.deep_copy() if isinstance(id, flex.double) else id.as_double()
+                for id in image_data
+            )
 
         else:
             dispersion_debug_list = self._calculate_dispersion_debug(image)
@@ -1205,32 +1294,41 @@ def get_image_data(self, image):
             self.mask_image_data(image_data)
         return image_data
 
-    def _calculate_dispersion_debug(self, image):
-        # hash current settings
-        dispersion_debug_list_hash = hash(
-            (
-                image.index,
-                self.images.selected.image_set,
-                self.settings.gain,
-                self.settings.nsigma_b,
-                self.settings.nsigma_s,
-                self.settings.global_threshold,
-                self.settings.min_local,
-                tuple(self.settings.kernel_size),
-                self.settings.threshold_algorithm,
-                self.settings.n_iqr,
-                self.settings.blur,
-                self.settings.n_bins,
-            )
+    def _dispersion_settings(self):
+        return (
+            self.settings.gain,
+            self.settings.nsigma_b,
+            self.settings.nsigma_s,
+            self.settings.global_threshold,
+            self.settings.min_local,
+            tuple(self.settings.kernel_size),
+            self.settings.threshold_algorithm,
+            self.settings.n_iqr,
+            self.settings.blur,
+            self.settings.n_bins,
         )
 
-        # compare current settings to last calculation of "dispersion debug" list
-        if dispersion_debug_list_hash == self._dispersion_debug_list_hash:
-            return self._dispersion_debug_list
+    def _calculate_dispersion_debug(self, image):
+        # The "dispersion debug" list of recently viewed images is cached for
+        # each set of settings
+        key = (
+            IdentityKey(self.images.selected.image_set),
+            image.index,
+            self._dispersion_settings(),
+        )
+        dispersion_debug_list, _ = self._dispersion_debug_cache.get(
+            key, functools.partial(self._dispersion_debug, image)
+        )
+        return dispersion_debug_list
 
+    def _dispersion_debug(self, image):
+        """
+        :returns: The "dispersion debug" list of the image, and an estimate
+                  of the memory it uses
+        """
         detector = image.get_detector()
         image_mask = self.get_mask(image)
-        image_data = image.get_image_data()
+        image_data = self._read_image_data(image)
         assert self.settings.gain > 0
         gain_map = [
             flex.double(image_data[i].accessor(), self.settings.gain)
@@ -1260,9 +1358,8 @@ def _calculate_dispersion_debug(self, image):
                 )
             )
 
-        self._dispersion_debug_list = dispersion_debug_list
-        self._dispersion_debug_list_hash = dispersion_debug_list_hash
-        return dispersion_debug_list
+        n_pixels = sum(len(data) for data in image_data)
+        return dispersion_debug_list, n_pixels * _DISPERSION_DEBUG_BYTES_PER_PIXEL
 
     def show_filters(self):
         image_data = self.get_image_data(self.pyslip.tiles.raw_image)
@@ -1540,7 +1637,10 @@ def update_settings(self, layout=True):
         self.pyslip.Update()
 
     def get_mask(self, image):
-        mask = image.get_mask()
+        # The image readers are not thread-safe, so don't read the mask while
+        # images are read in the background
+        with self._image_cache.load_lock:
+            mask = image.get_mask()
         if self.mask_input is not None:
             for p1, p2 in zip(self.mask_input, mask):
                 p2 &= p1
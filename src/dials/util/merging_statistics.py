@@ -0,0 +1,225 @@
+"""
+A cache of merging statistics, so that the statistics of the same intensities
+are not calculated again by each of the programs of a processing pipeline (e.g.
+dials.scale, dials.merge, dials.estimate_resolution and the mmCIF export).
+
+The statistics are keyed by a hash of the content of the intensities (the
+symmetry, miller indices, data and sigmas) together with the class and the
+options used to calculate them. The cache holds the most recently used results
+in memory (two by default, or the number given by the environment variable
+DIALS_MERGING_STATISTICS_CACHE_SIZE), and if the environment variable
+DIALS_MERGING_STATISTICS_CACHE is set to a directory, the results are also
+pickled to that directory, to be loaded by later programs calculating the same
+statistics.
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+import iotbx.merging_statistics
+from dxtbx import flumpy
+
+logger = logging.getLogger(__name__)
+
+# The environment variable giving a directory in which to save the statistics
+CACHE_DIRECTORY_VARIABLE = "DIALS_MERGING_STATISTICS_CACHE"
+# The environment variable giving the number of results held in memory
+CACHE_SIZE_VARIABLE = "DIALS_MERGING_STATISTICS_CACHE_SIZE"
+
+
+def content_hash(i_obs):
+    """
+    Calculate a hash of the content of a miller array.
+
+    :param i_obs: A miller array of intensities
+    :return: The hash, as a hexadecimal string
+    """
+    h = hashlib.sha256()
+    h.update(repr(i_obs.unit_cell().parameters()).encode())
+    h.update(i_obs.space_group_info().type().hall_symbol().encode())
+    h.update(repr((i_obs.anomalous_flag(), i_obs.is_xray_intensity_array())).encode())
+    # A view of the miller indices as integers, rather than a copy
+    h.update(flumpy.to_numpy(i_obs.indices()))
+    h.update(flumpy.to_numpy(i_obs.data()))
+    if i_obs.sigmas() is not None:
+        h.update(flumpy.to_numpy(i_obs.sigmas()))
+    return h.hexdigest()
+
+
+def _option_repr(value):
+    """A representation of an option which is the same in every process."""
+    if hasattr(value, "unit_cell") and hasattr(value, "space_group_info"):
+        # A crystal symmetry
+        return repr(
+            (
+                value.unit_cell().parameters(),
+                value.space_group_info().type().hall_symbol(),
+            )
+        )
+    return repr(value)
+
+
+def statistics_key(i_obs, statistics_class, options):
+    """
+    Calculate the key of the statistics of a miller array.
+
+    :param i_obs: A miller array of intensities
+    :param statistics_class: The class used to calculate the statistics
+    :param options: A dictionary of the other arguments of the class
+    :return: The key, as a hexadecimal string
+    """
+    h = hashlib.sha256(content_hash(i_obs).encode())
+    h.update(f"{statistics_class.__module__}.{statistics_class.__qualname__}".encode())
+    for name in sorted(options):
+        h.update(f"{name}={_option_repr(options[name])}".encode())
+    return h.hexdigest()
+
+
+class MergingStatisticsCache:
+    """
+    A least-recently-used cache of merging statistics, optionally saved to a
+    directory.
+    """
+
+    def __init__(self, max_items=2, directory=None):
+        """
+        :param max_items: The maximum number of results held in memory
+        :param directory: A directory in which to save the results, or None
+        """
+        self.max_items = max_items
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("Failed to load merging statistics %s: %s", key, e)
+            return None
+
+    def _save(self, key, result):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file, so that other processes never read
+            # a partially written file
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix=".tmp", delete=False
+            ) as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, self._path(key))
+        except Exception as e:
+            logger.debug("Failed to save merging statistics %s: %s", key, e)
+
+    def get(self, key, calculate):
+        """
+        Get a result, loading or calculating it if it is not held in memory.
+
+        :param key: The key of the result
+        :param calculate: A function with no arguments which calculates the
+                          result
+        :return: The result
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        result = self._load(key)
+        if result is None:
+            result = calculate()
+            self._save(key, result)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+        with self._lock:
+            self._items[key] = result
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return result
+
+    def dataset_statistics(
+        self,
+        i_obs,
+        statistics_class=iotbx.merging_statistics.dataset_statistics,
+        **kwargs,
+    ):
+        """
+        Get the merging statistics of a miller array, calculating them if they
+        are not in the cache.
+
+        :param i_obs: A miller array of intensities
+        :param statistics_class: The class used to calculate the statistics,
+                                 e.g. iotbx.merging_statistics.dataset_statistics
+        :param kwargs: The other arguments of the class
+        :return: The statistics, an instance of statistics_class
+        """
+        key = statistics_key(i_obs, statistics_class, kwargs)
+        return self.get(key, lambda: statistics_class(i_obs=i_obs, **kwargs))
+
+    def clear(self):
+        """Remove all of the results held in memory."""
+        with self._lock:
+            self._items.clear()
+
+
+_cache = None
+
+
+def get_cache():
+    """
+    :return: The merging statistics cache shared within the process
+    """
+    global _cache
+    directory = os.getenv(CACHE_DIRECTORY_VARIABLE) or None
+    max_items = int(os.getenv(CACHE_SIZE_VARIABLE) or 2)
+    if _cache is None or _cache.directory != directory:
+        _cache = MergingStatisticsCache(max_items=max_items, directory=directory)
+    else:
+        _cache.max_items = max_items
+    return _cache
+
+
+def cached_dataset_statistics(
+    i_obs, statistics_class=iotbx.merging_statistics.dataset_statistics, **kwargs
+):
+    """
+    Get the merging statistics of a miller array from the cache shared within
+    the process, calculating them if they are not in the cache.
+
+    The returned statistics may be shared with other callers, so must not be
+    modified.
+
+    :param i_obs: A miller array of intensities
+    :param statistics_class: The class used to calculate the statistics
+    :param kwargs: The other arguments of the class
+    :return: The statistics, an instance of statistics_class
+    """
+    return get_cache().dataset_statistics(i_obs, statistics_class, **kwargs)
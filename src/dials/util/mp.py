@@ -2,6 +2,11 @@
 
 import itertools
 import logging
+import multiprocessing
+import queue
+import time
+import traceback
+from dataclasses import dataclass, field
 
 import libtbx.easy_mp
 
@@ -144,6 +149,141 @@ def batch_multi_node_parallel_map(
     )
 
 
+@dataclass
+class WorkerReport:
+    """The work done by one process of dynamic_multi_core_run"""
+
+    rank: int
+    num_items: int = 0
+    num_chunks: int = 0
+    busy_time: float = 0.0
+    wall_time: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def utilisation(self):
+        """The fraction of the wall time spent processing items"""
+        return self.busy_time / self.wall_time if self.wall_time else 0.0
+
+
+def _dynamic_worker(
+    rank, function, items, chunksize, initializer, finalizer, counter, results
+):
+    """
+    Take chunks of items from the shared counter until all items are taken,
+    calling function(rank, chunk, state) for each chunk.
+    """
+    start_time = time.time()
+    report = WorkerReport(rank=rank)
+    state = None
+    try:
+        if initializer is not None:
+            state = initializer(rank)
+        while True:
+            with counter.get_lock():
+                first = counter.value
+                counter.value = first + chunksize
+            if first >= len(items):
+                break
+            chunk = items[first : first + chunksize]
+            st = time.time()
+            try:
+                state = function(rank, chunk, state)
+            except Exception as e:
+                logger.warning("Process %d failed processing a chunk: %s", rank, e)
+                report.errors.append(traceback.format_exc())
+            report.busy_time += time.time() - st
+            report.num_items += len(chunk)
+            report.num_chunks += 1
+        if finalizer is not None:
+            st = time.time()
+            finalizer(state)
+            report.busy_time += time.time() - st
+    except Exception:
+        report.errors.append(traceback.format_exc())
+    report.wall_time = time.time() - start_time
+    results.put(report)
+
+
+def dynamic_multi_core_run(
+    function, iterable, nproc, chunksize=1, initializer=None, finalizer=None
+):
+    """
+    Process the items of an iterable with a pool of forked processes which take
+    chunks of items from a shared queue as they become free, so that the work is
+    balanced between the processes at runtime.
+
+    Each process calls state = initializer(rank) once, then
+    state = function(rank, chunk, state) for each chunk of items it takes, and
+    finally finalizer(state), so that expensive state may be kept between
+    chunks. As the processes are forked, the functions need not be picklable.
+    An exception raised by function is logged and recorded in the report of
+    that process, and the process carries on with the next chunk. Where
+    processes cannot be forked (e.g. on Windows), all of the items are
+    processed in the calling process, as rank 0.
+
+    :param function: The function to call for each chunk of items
+    :param iterable: The items to process
+    :param nproc: The number of processes
+    :param chunksize: The number of items to take from the queue at a time
+    :param initializer: The function to call when each process starts
+    :param finalizer: The function to call when there are no more items
+    :return: A list of WorkerReport, one per process, ordered by rank
+    """
+    items = list(iterable)
+    if "fork" not in multiprocessing.get_all_start_methods():
+        logger.debug("Processes cannot be forked, processing the items serially")
+        results = queue.Queue()
+        _dynamic_worker(
+            0,
+            function,
+            items,
+            chunksize,
+            initializer,
+            finalizer,
+            multiprocessing.Value("l", 0),
+            results,
+        )
+        return [results.get()]
+    context = multiprocessing.get_context("fork")
+    counter = context.Value("l", 0)
+    results = context.Queue()
+    processes = {}
+    for rank in range(nproc):
+        processes[rank] = context.Process(
+            target=_dynamic_worker,
+            args=(
+                rank,
+                function,
+                items,
+                chunksize,
+                initializer,
+                finalizer,
+                counter,
+                results,
+            ),
+        )
+        processes[rank].start()
+
+    reports = {}
+    while len(reports) < nproc:
+        try:
+            report = results.get(timeout=1)
+        except queue.Empty:
+            # Check for processes which have died without reporting
+            for rank, process in processes.items():
+                if rank not in reports and process.exitcode not in (None, 0):
+                    reports[rank] = WorkerReport(
+                        rank=rank,
+                        errors=[f"Process exited with code {process.exitcode}"],
+                    )
+            continue
+        reports[report.rank] = report
+    for process in processes.values():
+        process.join()
+    return [reports[rank] for rank in sorted(reports)]
+
+
 if __name__ == "__main__":
 
     def func(x):
@@ -2,6 +2,7 @@
 
 import argparse
 import copy
+import functools
 import itertools
 import logging
 import os
@@ -173,6 +174,8 @@ def __init__(
         scan_tolerance=None,
         format_kwargs=None,
         load_models=True,
+        nproc=1,
+        header_cache=None,
     ):
         """
         Parse the arguments. Populates its instance attributes in an intelligent way
@@ -193,6 +196,8 @@ def __init__(
         :param check_format: Check the format when reading images
         :param verbose: True/False print out some stuff
         :param load_models: Whether to load all models for ExperimentLists
+        :param nproc: The number of processes used to read the image headers
+        :param header_cache: A directory in which to cache the image headers
         """
 
         # Initialise output
@@ -213,6 +218,8 @@ def __init__(
                 scan_tolerance,
                 format_kwargs,
                 load_models,
+                nproc,
+                header_cache,
             )
 
         # Second try to read experiment files
@@ -248,6 +255,8 @@ def try_read_experiments_from_images(
         scan_tolerance,
         format_kwargs,
         load_models=True,
+        nproc=1,
+        header_cache=None,
     ):
         """
         Try to import images.
@@ -260,10 +269,14 @@ def try_read_experiments_from_images(
         :param scan_tolerance:
         :param format_kwargs:
         :param load_models: Whether to load all models for ExperimentLists
+        :param nproc: The number of processes used to read the image headers
+        :param header_cache: A directory in which to cache the image headers
         :return: Unhandled arguments
         """
         from dxtbx.model.experiment_list import ExperimentListFactory
 
+        from dials.util.image_headers import experiments_from_filenames
+
         # If filenames contain wildcards, expand
         args_new = []
         for arg in args:
@@ -280,8 +293,15 @@ def try_read_experiments_from_images(
 
         unhandled = []
 
+        if nproc > 1 or header_cache:
+            read_experiments = functools.partial(
+                experiments_from_filenames, nproc=nproc, cache_directory=header_cache
+            )
+        else:
+            read_experiments = ExperimentListFactory.from_filenames
+
         try:
-            experiments = ExperimentListFactory.from_filenames(
+            experiments = read_experiments(
                 args,
                 unhandled=unhandled,
                 compare_beam=compare_beam,
@@ -554,6 +574,14 @@ def _is_a_phil_file(filename):
         except AttributeError:
             load_models = True
 
+        # Options for reading image headers, if the program has them
+        try:
+            nproc = params.input.nproc
+            header_cache = params.input.header_cache
+        except AttributeError:
+            nproc = 1
+            header_cache = None
+
         # Try to import everything
         importer = Importer(
             unhandled,
@@ -568,6 +596,8 @@ def _is_a_phil_file(filename):
             scan_tolerance=scan_tolerance,
             format_kwargs=format_kwargs,
             load_models=load_models,
+            nproc=nproc,
+            header_cache=header_cache,
         )
 
         # Grab a copy of the errors that occurred in case the caller wants them
@@ -29,6 +29,7 @@
     calculate_batch_offsets,
 )
 from dials.util.filter_reflections import filter_reflection_table
+from dials.util.merging_statistics import cached_dataset_statistics
 from dials.util.normalisation import quasi_normalisation
 
 logger = logging.getLogger(__name__)
@@ -551,8 +552,8 @@ def __init__(self, i_obs, params, batches=None, reference=None):
 
         self._intensities = i_obs
 
-        self._merging_statistics = iotbx.merging_statistics.dataset_statistics(
-            i_obs=i_obs,
+        self._merging_statistics = cached_dataset_statistics(
+            i_obs,
             n_bins=self._params.nbins,
             reflections_per_bin=self._params.reflections_per_bin,
             cc_one_half_significance_level=self._params.cc_half_significance_level,
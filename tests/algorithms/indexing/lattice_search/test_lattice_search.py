@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import concurrent.futures
+
 import py.path
 import pytest
 
@@ -30,6 +32,58 @@ def i04_weak_data(dials_regression):
     }
 
 
+def test_BasisVectorSearch_parallel_candidate_generator(i04_weak_data, monkeypatch):
+    reflections = i04_weak_data["reflections"]
+    experiments = i04_weak_data["experiments"]
+
+    params = phil_scope.fetch().extract()
+    params.indexing.refinement_protocol.n_macro_cycles = 2
+    params.indexing.basis_vector_combinations.max_refine = 5
+    params.indexing.method = "fft3d"
+    params.indexing.nproc = 2
+    idxr = lattice_search.BasisVectorSearch(
+        reflections.deep_copy(), experiments, params
+    )
+
+    # Pass the candidates as a generator
+    find_candidate_crystal_models = idxr.find_candidate_crystal_models
+    monkeypatch.setattr(
+        idxr,
+        "find_candidate_crystal_models",
+        lambda: (cm for cm in find_candidate_crystal_models()),
+    )
+    idxr.index()
+    assert len(idxr.refined_experiments) == 1
+    assert idxr.refined_experiments[0].crystal.get_unit_cell().parameters() == (
+        pytest.approx((57.752, 57.776, 150.013, 90.0101, 89.976, 90.008), rel=1e-3)
+    )
+
+
+def test_evaluate_candidates_in_pool(monkeypatch):
+    monkeypatch.setattr(
+        lattice_search, "_evaluate_candidate_in_worker", lambda cm: (True, cm * 10)
+    )
+    generated = []
+
+    def candidates():
+        for cm in range(100):
+            generated.append(cm)
+            yield cm
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        results = []
+        for result in lattice_search._evaluate_candidates_in_pool(
+            pool, candidates(), 4
+        ):
+            results.append(result)
+            if len(results) == 3:
+                break
+    # The results are in the order of the candidates, and the candidates are
+    # only generated as far as 4 ahead of the results consumed
+    assert results == [(True, 0), (True, 10), (True, 20)]
+    assert generated == list(range(7))
+
+
 @pytest.mark.parametrize(
     "indexing_method,space_group,unit_cell",
     (
@@ -61,6 +115,37 @@ def test_BasisVectorSearch_i04_weak_data(
     )
 
 
+@pytest.mark.parametrize("n_unchanged_best", (None, 2))
+def test_BasisVectorSearch_parallel_candidate_evaluation(
+    i04_weak_data, n_unchanged_best
+):
+    reflections = i04_weak_data["reflections"]
+    experiments = i04_weak_data["experiments"]
+
+    results = []
+    for nproc in (1, 2):
+        params = phil_scope.fetch().extract()
+        params.indexing.refinement_protocol.n_macro_cycles = 2
+        params.indexing.basis_vector_combinations.max_refine = 5
+        params.indexing.basis_vector_combinations.n_unchanged_best = n_unchanged_best
+        params.indexing.method = "fft3d"
+        params.indexing.nproc = nproc
+        idxr = lattice_search.BasisVectorSearch(
+            reflections.deep_copy(), experiments, params
+        )
+        idxr.index()
+        assert len(idxr.refined_experiments) == 1
+        results.append(idxr.refined_experiments[0].crystal)
+
+    # The candidates are considered in the same order for any nproc
+    assert results[0].get_unit_cell().parameters() == pytest.approx(
+        results[1].get_unit_cell().parameters()
+    )
+    assert results[1].get_unit_cell().parameters() == pytest.approx(
+        (57.752, 57.776, 150.013, 90.0101, 89.976, 90.008), rel=1e-3
+    )
+
+
 @pytest.mark.parametrize(
     "indexing_method,space_group,unit_cell",
     (
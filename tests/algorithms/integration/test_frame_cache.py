@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import os
+
+from dials.algorithms.integration.frame_cache import SharedFrameCache
+from dials.array_family import flex
+
+
+def test_shared_frame_cache(tmp_path):
+    cache = SharedFrameCache([3, 4], directory=tmp_path)
+    assert len(cache) == 2
+    assert 3 in cache and 5 not in cache
+
+    image = tuple(
+        flex.double(flex.grid(4, 5), float(i)) + flex.random_double(20)
+        for i in range(2)
+    )
+    mask = (flex.bool(flex.grid(4, 5), True), flex.bool(flex.grid(4, 5), False))
+
+    # Frames are not available until written, and only listed frames are cached
+    assert cache.get(3) is None
+    cache.put(5, image, mask)
+    assert cache.get(5) is None
+    cache.put(3, image, mask)
+
+    cached_image, cached_mask = cache.get(3)
+    assert len(cached_image) == len(cached_mask) == 2
+    for cached, expected in zip(cached_image + cached_mask, image + mask):
+        assert cached.all() == expected.all()
+        assert list(cached) == list(expected)
+
+    # A second write of the same frame is ignored
+    cache.put(3, tuple(im * 2 for im in image), mask)
+    assert list(cache.get(3)[0][0]) == list(image[0])
+
+    cache.close()
+    assert not os.path.exists(cache.directory)
+    assert cache.get(3) is None
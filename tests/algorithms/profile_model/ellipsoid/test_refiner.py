@@ -26,9 +26,11 @@
     Simple6MosaicityParameterisation,
 )
 from dials.algorithms.profile_model.ellipsoid.refiner import (
+    MaximumLikelihoodTarget,
     Refiner,
     RefinerData,
     ReflectionLikelihood,
+    VectorisedMaximumLikelihoodTarget,
     rotate_mat3_double,
     rotate_vec3_double,
 )
@@ -505,6 +507,74 @@ def check(
     check(S6, fix_mosaic_spread=False, fix_orientation=False, fix_unit_cell=False)
 
 
+@pytest.mark.parametrize(
+    "mosaicity_parameterisation",
+    [
+        Simple1MosaicityParameterisation(np.array([0.02])),
+        Simple6MosaicityParameterisation(
+            np.array([0.02, 0.002, 0.015, 0.001, 0.003, 0.018])
+        ),
+        Simple1Angular1MosaicityParameterisation(np.array([0.01, 0.002])),
+        Simple6Angular3MosaicityParameterisation(
+            np.array([0.01, 0.005, 0.02, 0.015, 0.03, 0.025, 0.002, 0.001, 0.003])
+        ),
+    ],
+)
+@pytest.mark.parametrize(
+    "fix_mosaic_spread,fix_orientation,fix_unit_cell",
+    [(False, True, True), (True, False, False), (False, False, False)],
+)
+def test_VectorisedMaximumLikelihoodTarget(
+    testdata,
+    refinerdata_testdata,
+    mosaicity_parameterisation,
+    fix_mosaic_spread,
+    fix_orientation,
+    fix_unit_cell,
+):
+    data = refinerdata_testdata
+    state = ModelState(
+        testdata.experiment,
+        mosaicity_parameterisation,
+        fix_mosaic_spread=fix_mosaic_spread,
+        fix_orientation=fix_orientation,
+        fix_unit_cell=fix_unit_cell,
+    )
+    args = (
+        state,
+        data.s0,
+        data.sp_list,
+        data.h_list,
+        data.ctot_list,
+        data.mobs_list,
+        data.sobs_list,
+        data.panel_ids,
+    )
+    target = MaximumLikelihoodTarget(*args)
+    vectorised = VectorisedMaximumLikelihoodTarget(*args)
+
+    def check():
+        assert vectorised.log_likelihood() == pytest.approx(target.log_likelihood())
+        assert vectorised.first_derivatives() == pytest.approx(
+            target.first_derivatives()
+        )
+        assert list(vectorised.fisher_information()) == pytest.approx(
+            list(target.fisher_information())
+        )
+        assert vectorised.jacobian().all() == target.jacobian().all()
+        assert list(vectorised.jacobian()) == pytest.approx(list(target.jacobian()))
+        assert vectorised.mse() == pytest.approx(target.mse()[0, 0])
+        assert vectorised.rmsd() == pytest.approx(target.rmsd())
+
+    check()
+
+    # Check again after a change to the parameters
+    state.active_parameters = state.active_parameters * 1.01
+    target.update()
+    vectorised.update()
+    check()
+
+
 def test_RefinerData(testdata):
     experiment = testdata.experiment
     reflections = testdata.reflections
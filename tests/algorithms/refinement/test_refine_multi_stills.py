@@ -164,3 +164,59 @@ def test_restrained_refinement_with_fixed_parameterisations(dials_data, tmp_path
     rmsd_limits = (0.2044, 0.2220, 0.0063)
     for a, b in zip(history["rmsd"][-1], rmsd_limits):
         assert a < b
+
+
+@pytest.mark.skipif(
+    os.name == "nt",
+    reason="Multiprocessing error on Windows: 'This class cannot be instantiated from Python'",
+)
+def test_worker_pool_gives_same_normal_equations_as_single_process(dials_data):
+    from dials.algorithms.refinement.refiner import phil_scope
+
+    data_dir = dials_data("refinement_test_data", pathlib=True)
+    experiments = ExperimentListFactory.from_json_file(
+        data_dir / "multi_stills_combined.json", check_format=False
+    )
+    reflections = flex.reflection_table.from_file(
+        data_dir / "multi_stills_combined.pickle"
+    )
+
+    engines = []
+    for nproc in (1, 3):
+        user_phil = phil.parse(
+            f"""
+refinement {{
+  reflections.outlier.algorithm = null
+  refinery.engine = LevMar
+  mp.nproc = {nproc}
+}}
+"""
+        )
+        params = phil_scope.fetch(source=user_phil).extract()
+        refiner = RefinerFactory.from_parameters_data_experiments(
+            params, reflections.deep_copy(), experiments
+        )
+        engines.append(refiner._refinery)
+    serial, parallel = engines
+
+    serial.build_up()
+    parallel.start_workers()
+    try:
+        # Build up twice, to check that the workers follow a change of the
+        # parameter values
+        parallel.build_up()
+        for engine in engines:
+            engine.x[0] += 0.01
+        serial.build_up()
+        parallel.build_up()
+    finally:
+        parallel.stop_workers()
+
+    assert parallel.n_equations == serial.n_equations
+    assert parallel.objective() == pytest.approx(serial.objective())
+    assert list(parallel.step_equations().normal_matrix_packed_u()) == pytest.approx(
+        list(serial.step_equations().normal_matrix_packed_u())
+    )
+    assert list(parallel.step_equations().right_hand_side()) == pytest.approx(
+        list(serial.step_equations().right_hand_side())
+    )
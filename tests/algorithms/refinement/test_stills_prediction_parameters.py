@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import copy
+
 import pytest
 
 from cctbx.sgtbx import space_group, space_group_symbols
@@ -23,6 +25,7 @@
     StillsPredictionParameterisation,
 )
 from dials.algorithms.refinement.prediction.managed_predictors import (
+    ExperimentsPredictor,
     ExperimentsPredictorFactory,
     ScansRayPredictor,
     StillsExperimentsPredictor,
@@ -341,3 +344,33 @@ def test_spherical_relp_stills_pred_param(tc):
                 else:
                     assert a == pytest.approx(b, abs=5e-6)
             print("OK")
+
+
+@pytest.mark.parametrize("spherical_relp", [False, True])
+def test_stills_batch_prediction_matches_per_experiment_prediction(tc, spherical_relp):
+    # Three experiments sharing the detector, with different beams
+    experiments = ExperimentList()
+    for i in range(3):
+        beam = copy.deepcopy(tc.beam)
+        beam.set_wavelength(beam.get_wavelength() * (1 + 0.01 * i))
+        experiments.append(
+            Experiment(beam=beam, detector=tc.detector, crystal=tc.crystal)
+        )
+    reflections = tc.reflections.deep_copy()
+    reflections["id"] = flex.int(i % 3 for i in range(len(reflections)))
+
+    predictor = ExperimentsPredictorFactory.from_experiments(
+        experiments, force_stills=True, spherical_relp=spherical_relp
+    )
+    assert isinstance(predictor, StillsExperimentsPredictor)
+    batched = predictor(reflections.deep_copy())
+    # The per-experiment prediction of the base class
+    expected = ExperimentsPredictor.__call__(predictor, reflections.deep_copy())
+
+    for column in ("s1", "xyzcal.mm", "xyzcal.px"):
+        for a, b in zip(batched[column], expected[column]):
+            assert a == pytest.approx(b, abs=1e-10)
+    assert list(batched["delpsical.rad"]) == pytest.approx(
+        list(expected["delpsical.rad"]), abs=1e-12
+    )
+    assert batched.get_flags(batched.flags.predicted).all_eq(True)
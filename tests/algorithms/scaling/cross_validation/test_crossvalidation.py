@@ -139,7 +139,7 @@ def mock_script():
 
 
 def test_cross_validate_script():
-    """Test the script, mocking the run_script and interpret results calls"""
+    """Test the script, mocking the calculate_results and interpret results calls"""
 
     param = generated_param()
     crossvalidator = DialsScaleCrossValidator([], [])
@@ -154,13 +154,14 @@ def test_cross_validate_script():
     param.cross_validation.nfolds = 2
     fpath = "dials.algorithms.scaling.cross_validation."
     with mock.patch(
-        fpath + "crossvalidator.DialsScaleCrossValidator.run_script"
-    ) as mock_run_script:
+        fpath + "crossvalidator.DialsScaleCrossValidator.calculate_results",
+        return_value=[0.1] * 6,
+    ) as mock_calculate_results:
         with mock.patch(
             fpath + "crossvalidator.DialsScaleCrossValidator.interpret_results"
         ) as mock_interpret:
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 2
+            assert mock_calculate_results.call_count == 2
             assert mock_interpret.call_count == 1
 
     # test multi mode
@@ -169,14 +170,15 @@ def test_cross_validate_script():
     param.cross_validation.nfolds = 2
     fpath = "dials.algorithms.scaling.cross_validation."
     with mock.patch(
-        fpath + "crossvalidator.DialsScaleCrossValidator.run_script"
-    ) as mock_run_script:
+        fpath + "crossvalidator.DialsScaleCrossValidator.calculate_results",
+        return_value=[0.1] * 6,
+    ) as mock_calculate_results:
         with mock.patch(
             fpath + "crossvalidator.DialsScaleCrossValidator.interpret_results"
         ) as mock_interpret:
             param.cross_validation.parameter = "physical.absorption_correction"
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 4
+            assert mock_calculate_results.call_count == 4
             assert mock_interpret.call_count == 1
 
             param.cross_validation.parameter = "physical.decay_interval"
@@ -186,25 +188,25 @@ def test_cross_validate_script():
             param.cross_validation.parameter = "physical.absorption_correction"
             param.cross_validation.parameter_values = ["True", "False"]
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 8
+            assert mock_calculate_results.call_count == 8
             assert mock_interpret.call_count == 2
 
             param.cross_validation.parameter = "physical.decay_interval"
             param.cross_validation.parameter_values = ["5.0", "10.0"]
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 12
+            assert mock_calculate_results.call_count == 12
             assert mock_interpret.call_count == 3
 
             param.cross_validation.parameter = "model"
             param.cross_validation.parameter_values = ["array", "physical"]
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 16
+            assert mock_calculate_results.call_count == 16
             assert mock_interpret.call_count == 4
 
             param.cross_validation.parameter = "physical.lmax"
             param.cross_validation.parameter_values = ["4", "6"]
             cross_validate(param, crossvalidator)
-            assert mock_run_script.call_count == 20
+            assert mock_calculate_results.call_count == 20
             assert mock_interpret.call_count == 5
 
             param.cross_validation.parameter = "bad_interval"
@@ -214,3 +216,36 @@ def test_cross_validate_script():
             param.cross_validation.cross_validation_mode = "bad"
             with pytest.raises(ValueError):
                 cross_validate(param, crossvalidator)
+
+
+def test_cross_validate_concurrent_runs():
+    """Test that the runs are performed concurrently within the process budget,
+    mocking the calculate_results call"""
+
+    param = generated_param()
+    param.cross_validation.cross_validation_mode = "multi"
+    param.cross_validation.parameter = "physical.absorption_correction"
+    param.cross_validation.nfolds = 2
+    param.cross_validation.nproc = 8
+    crossvalidator = DialsScaleCrossValidator([], [])
+
+    def calculate_results(params):
+        # Report the number of processes and free set offset of each run
+        return [params.scaling_options.nproc, params.scaling_options.free_set_offset]
+
+    fpath = "dials.algorithms.scaling.cross_validation."
+    metadata = {
+        "names": ["nproc", "offset"],
+        "indices_to_monitor": [],
+        "best_criterion": [],
+    }
+    with mock.patch(
+        fpath + "crossvalidator.DialsScaleCrossValidator.calculate_results",
+        side_effect=calculate_results,
+    ):
+        with mock.patch.object(DialsScaleCrossValidator, "results_metadata", metadata):
+            cross_validate(param, crossvalidator)
+    # The four runs share the eight processes
+    for results in crossvalidator.results_dict.values():
+        assert results["nproc"] == [2, 2]
+        assert sorted(results["offset"]) == [0, 1]
@@ -204,6 +204,7 @@ def test_IhTableblock_onedataset(large_reflection_table, test_sg):
         )
 
     assert list(block.calc_nh()) == [2, 1, 2, 1, 1, 2, 2]
+    assert list(block.group_indices()) == [0, 1, 0, 2, 3, 4, 4]
 
     # Test update error model
     block.update_weights(mock_error_model())
@@ -229,6 +230,7 @@ def test_IhTableblock_onedataset(large_reflection_table, test_sg):
     assert new_block.h_expand_matrix[0, 0] == 1
     assert new_block.h_expand_matrix[0, 1] == 1
     assert new_block.h_expand_matrix[1, 2] == 1
+    assert list(new_block.group_indices()) == [0, 0, 1]
 
     assert list(new_block.Ih_values) == pytest.approx(
         [x / 2.0 for x in [90.0, 90.0, 30.0]]
@@ -596,6 +598,70 @@ def update_vars_side_effect(*args):
     assert list(arr.indices()) == [(0, 0, 2), (0, 4, 0), (0, 4, 0), (10, 0, 0)]
 
 
+def test_IhTable_remove_datasets(
+    large_reflection_table, small_reflection_table, test_sg
+):
+    """Test that removing a dataset gives the same data as an Ih_table created
+    without that dataset."""
+
+    def dataset_values(Ih_table):
+        """The Ih values of the reflections of each dataset, by loc index."""
+        values = {}
+        for block in Ih_table.Ih_table_blocks:
+            for dataset_id, loc_index, Ih in zip(
+                block.Ih_table["dataset_id"],
+                block.Ih_table["loc_indices"],
+                block.Ih_values,
+            ):
+                values[(int(dataset_id), int(loc_index))] = Ih
+        return values
+
+    tables = [large_reflection_table, small_reflection_table, generate_refl_1()]
+    indices = [flex.size_t(range(t.size())) for t in tables]
+    Ih_table = IhTable(tables, test_sg, indices_lists=indices, nblocks=2)
+    Ih_table.calc_Ih()
+    Ih_table.remove_datasets([1])
+
+    expected = IhTable(
+        [tables[0], tables[2]], test_sg, indices_lists=[indices[0], indices[2]]
+    )
+    expected.calc_Ih()
+    assert Ih_table.n_datasets == 2
+    assert Ih_table.size == expected.size == 14
+    assert dataset_values(Ih_table) == pytest.approx(dataset_values(expected))
+    for i in range(2):
+        block_sels = Ih_table.get_block_selections_for_dataset(i)
+        assert sorted(i for sel in block_sels for i in sel) == list(range(7))
+    assert len(Ih_table.blocked_selection_list) == 2
+    assert all(len(sels) == 2 for sels in Ih_table.blocked_selection_list)
+
+    # The row ranges of the datasets after the removed dataset are renumbered
+    for block in Ih_table.Ih_table_blocks:
+        dataset_ids = block.Ih_table["dataset_id"].to_numpy()
+        for i in range(2):
+            rows = np.flatnonzero(dataset_ids == i)
+            info = block.dataset_info[i]
+            assert info["end_index"] - info["start_index"] == rows.size
+            assert list(rows) == list(range(info["start_index"], info["end_index"]))
+
+    # So data can be updated for the dataset after the removed dataset
+    before = [
+        block.Ih_table["intensity"].to_numpy().copy()
+        for block in Ih_table.Ih_table_blocks
+    ]
+    Ih_table.update_data_in_blocks(flex.double(tables[2].size(), 100.0), 1)
+    for block, intensities in zip(Ih_table.Ih_table_blocks, before):
+        dataset_ids = block.Ih_table["dataset_id"].to_numpy()
+        new_intensities = block.Ih_table["intensity"].to_numpy()
+        assert list(new_intensities[dataset_ids == 1]) == pytest.approx(
+            [100.0] * int((dataset_ids == 1).sum())
+        )
+        assert list(new_intensities[dataset_ids == 0]) == pytest.approx(
+            list(intensities[dataset_ids == 0])
+        )
+        assert len(new_intensities) == len(intensities)
+
+
 def test_set_Ih_values_to_target(test_sg):
     """Test the setting of Ih values for targeted scaling."""
     """Generate input for testing joint_Ih_table."""
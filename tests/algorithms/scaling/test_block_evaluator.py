@@ -0,0 +1,102 @@
+"""
+Tests for the block evaluators used in scaling minimisation.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from dials.algorithms.scaling.block_evaluator import (
+    BlockEvaluator,
+    ParallelBlockEvaluator,
+    block_evaluator,
+)
+from dials.algorithms.scaling.parameter_handler import ScalingParameterManagerGenerator
+from dials.algorithms.scaling.scaler import MultiScaler
+from dials.algorithms.scaling.scaler_factory import create_scaler
+from dials.algorithms.scaling.scaling_library import create_scaling_model
+from dials.algorithms.scaling.target_function import ScalingTarget
+
+from .test_scaler import generated_exp, generated_param, generated_refl
+
+
+@pytest.fixture
+def multiscaler_and_apm():
+    p, e = (generated_param(), generated_exp(2))
+    p.reflection_selection.method = "use_all"
+    reflections = []
+    for i in range(2):
+        r = generated_refl(id_=i)
+        r["intensity.sum.value"] = r["intensity"]
+        r["intensity.sum.variance"] = r["variance"]
+        reflections.append(r)
+    p.scaling_options.nproc = 2
+    p.model = "physical"
+    exp = create_scaling_model(p, e, reflections)
+    singlescaler1 = create_scaler(p, [exp[0]], [reflections[0]])
+    singlescaler2 = create_scaler(p, [exp[1]], [reflections[1]])
+    multiscaler = MultiScaler([singlescaler1, singlescaler2])
+    pmg = ScalingParameterManagerGenerator(
+        multiscaler.active_scalers,
+        ScalingTarget(),
+        multiscaler.params.scaling_refinery.refinement_order,
+    )
+    apm = pmg.parameter_managers()[0]
+    x = apm.get_param_vals()
+    apm.set_param_vals(x * 1.1)
+    return multiscaler, apm
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Parallel evaluation requires forking",
+)
+@pytest.mark.parametrize(
+    "method",
+    [
+        "compute_functional_gradients",
+        "compute_residuals",
+        "compute_residuals_and_gradients",
+    ],
+)
+def test_parallel_block_evaluator_matches_serial(multiscaler_and_apm, method):
+    multiscaler, apm = multiscaler_and_apm
+    blocks = multiscaler.get_blocks_for_minimisation()
+    assert len(blocks) == 2
+
+    serial = list(BlockEvaluator(multiscaler, apm).evaluate(method, blocks))
+    serial_scales = [list(b.inverse_scale_factors) for b in blocks]
+    serial_Ih = [list(b.Ih_values) for b in blocks]
+    for block in blocks:
+        block.inverse_scale_factors = block.inverse_scale_factors * 0.0 + 1.0
+        block.calc_Ih()
+
+    evaluator = block_evaluator(multiscaler, apm)
+    assert isinstance(evaluator, ParallelBlockEvaluator)
+    try:
+        parallel = list(evaluator.evaluate(method, blocks))
+    finally:
+        evaluator.close()
+
+    # The results should be identical, not just approximately equal.
+    assert len(parallel) == len(serial)
+    for s, p in zip(serial, parallel):
+        assert len(s) == len(p)
+        for s_i, p_i in zip(s, p):
+            if isinstance(s_i, (float, np.floating)) or hasattr(s_i, "n_rows"):
+                assert s_i == p_i
+            else:
+                assert list(s_i) == list(p_i)
+    # The state of the Ih_table in the main process should match too.
+    assert [list(b.inverse_scale_factors) for b in blocks] == serial_scales
+    assert [list(b.Ih_values) for b in blocks] == serial_Ih
+
+
+def test_block_evaluator_serial_for_nproc_1(multiscaler_and_apm):
+    multiscaler, apm = multiscaler_and_apm
+    multiscaler.params.scaling_options.nproc = 1
+    evaluator = block_evaluator(multiscaler, apm)
+    assert not isinstance(evaluator, ParallelBlockEvaluator)
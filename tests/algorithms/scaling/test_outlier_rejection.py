@@ -321,6 +321,25 @@ def test_targeted_outlier_rejection(generated_Ih_table, outlier_target_table):
     assert list(outliers[0]) == [5, 6, 7, 8]
 
 
+def test_targeted_outlier_rejection_multiple_groups(generated_Ih_table, test_sg):
+    """Test targeted outlier rejection against a target with several groups,
+    not all of which are present in the reflection table."""
+    target = flex.reflection_table()
+    target["intensity"] = flex.double([1.0, 500.0, 10.0])
+    target["variance"] = flex.double(3, 1.0)
+    target["inverse_scale_factor"] = flex.double(3, 1.0)
+    target["miller_index"] = flex.miller_index([(0, 0, 1), (0, 0, 2), (0, 0, 5)])
+    target.set_flags(flex.bool(3, False), target.flags.excluded_for_scaling)
+    target.set_flags(flex.bool(3, False), target.flags.user_excluded_in_scaling)
+    outlier_rej = TargetedOutlierRejection(
+        generated_Ih_table, 6.0, IhTable([target], test_sg, nblocks=1)
+    )
+    outlier_rej.run()
+    outliers = outlier_rej.final_outlier_arrays
+    assert len(outliers) == 1
+    assert list(outliers[0]) == [4, 5, 6, 7, 8]
+
+
 def test_simple_outlier_rejection(generated_Ih_table):
     """Test the simple outlier rejection algorithm."""
     zmax = 6.0
@@ -19,6 +19,7 @@
 )
 from dxtbx.serialize import load
 from libtbx import phil
+from scitbx import sparse
 from scitbx.sparse import matrix  # noqa: F401 - Needed to call calc_theta_phi
 
 from dials.algorithms.scaling.scaling_library import create_scaling_model
@@ -29,6 +30,8 @@
     calculate_prescaling_correction,
     quasi_normalisation,
     set_wilson_outliers,
+    sparse_matrix_from_arrays,
+    sparse_matrix_to_arrays,
 )
 from dials.array_family import flex
 from dials.util.options import ArgumentParser
@@ -560,3 +563,29 @@ def test_calc_lookup_index():
     assert list(indices) == [0, 64799, 359, 64440]
     indices = calc_lookup_index(theta_phi, 2)
     assert list(indices) == [0, 259199, 719, 258480]
+
+
+def test_sparse_matrix_to_and_from_arrays():
+    """Test the round trip of a sparse matrix through numpy arrays."""
+    m = sparse.matrix(
+        5, 3, elements_by_columns=[{0: 1.5, 3: -2.0}, {}, {1: 0.25, 4: 3.0}]
+    )
+    shape, data, indices, indptr = sparse_matrix_to_arrays(m)
+    assert shape == (5, 3)
+    assert list(data) == [1.5, -2.0, 0.25, 3.0]
+    assert list(indices) == [0, 3, 1, 4]
+    assert list(indptr) == [0, 2, 2, 4]
+    assert sparse_matrix_from_arrays(shape, data, indices, indptr) == m
+
+    empty = sparse.matrix(0, 0)
+    assert sparse_matrix_from_arrays(*sparse_matrix_to_arrays(empty)) == empty
+
+    # Explicitly stored zeros are not retained
+    m = sparse.matrix(3, 2, elements_by_columns=[{0: 0.0, 2: 1.0}, {1: 2.0}])
+    shape, data, indices, indptr = sparse_matrix_to_arrays(m)
+    assert list(data) == [1.0, 2.0]
+    assert list(indices) == [2, 1]
+    assert list(indptr) == [0, 1, 2]
+    assert sparse_matrix_from_arrays(shape, data, indices, indptr) == sparse.matrix(
+        3, 2, elements_by_columns=[{2: 1.0}, {1: 2.0}]
+    )
@@ -2,7 +2,10 @@
 
 import random
 
-from dials.algorithms.shoebox import find_overlapping
+import pytest
+
+from dials.algorithms.shoebox import OverlapFinder, find_overlapping
+from dials.algorithms.shoebox.overlap_finder import ChunkedOverlapFinder
 
 
 def test_single_panel():
@@ -104,3 +107,37 @@ def brute_force(bbox, panel=None):
                     overlaps.append((i, j))
 
     return overlaps
+
+
+@pytest.mark.parametrize(
+    "nproc,chunk_size,z_window", [(1, 100, 3), (1, 1000, None), (2, 100, 5)]
+)
+def test_chunked_overlap_finder(nproc, chunk_size, z_window):
+    from dials.array_family import flex
+
+    nrefl = 1000
+
+    # Generate bboxes spanning windows of images, in two imagesets
+    bbox = flex.int6(nrefl)
+    panel = flex.size_t(nrefl)
+    group_id = flex.size_t(nrefl)
+    for i in range(nrefl):
+        x0 = random.randint(0, 200)
+        y0 = random.randint(0, 200)
+        z0 = random.randint(-5, 50)
+        x1 = x0 + random.randint(2, 20)
+        y1 = y0 + random.randint(2, 20)
+        z1 = z0 + random.randint(1, 10)
+        bbox[i] = (x0, x1, y0, y1, z0, z1)
+        panel[i] = random.randint(0, 2)
+        group_id[i] = random.randint(0, 1)
+
+    expected = OverlapFinder()(group_id, panel, bbox)
+    overlaps = ChunkedOverlapFinder(
+        nproc=nproc, chunk_size=chunk_size, z_window=z_window
+    )(group_id, panel, bbox)
+    assert overlaps.num_vertices() == nrefl
+    assert overlaps.num_edges() == expected.num_edges()
+    assert [(overlaps.source(e), overlaps.target(e)) for e in overlaps.edges()] == [
+        (expected.source(e), expected.target(e)) for e in expected.edges()
+    ]
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+
+from dials.algorithms.spot_finding.streaming_labeller import (
+    StreamingPixelListLabeller,
+)
+from dials.array_family import flex
+from dials.model.data import PixelList, PixelListLabeller
+
+
+@pytest.mark.parametrize("twod", [False, True])
+@pytest.mark.parametrize("fraction", [0.1, 0.3, 0.6])
+def test_streaming_labeller_matches_pixel_list_labeller(twod, fraction):
+    size = (40, 50)
+    first_frame = 3
+    nframes = 10
+    min_spot_size, max_spot_size = 2, 20
+
+    labeller = PixelListLabeller()
+    streaming = StreamingPixelListLabeller(
+        panel=1,
+        twod=twod,
+        min_spot_size=min_spot_size,
+        max_spot_size=max_spot_size,
+        find_hot_pixels=True,
+    )
+    for i in range(nframes):
+        image = flex.random_double(size[0] * size[1])
+        mask = flex.random_bool(size[0] * size[1], fraction)
+        # A pixel which is strong on every image
+        mask[123] = True
+        image.reshape(flex.grid(size))
+        mask.reshape(flex.grid(size))
+        pixel_list = PixelList(first_frame + i, image, mask)
+        labeller.add(pixel_list)
+        streaming.add(pixel_list)
+    streaming.finish()
+
+    creator = flex.PixelListShoeboxCreator(
+        labeller, 1, 0, twod, min_spot_size, max_spot_size, True
+    )
+    expected = creator.result()
+    spot_size = creator.spot_size()
+    expected = expected.select(expected.is_allocated())
+    shoeboxes = streaming.shoeboxes()
+
+    assert streaming.num_spots == len(spot_size)
+    assert streaming.num_too_small == (spot_size < min_spot_size).count(True)
+    assert streaming.num_too_large == (spot_size > max_spot_size).count(True)
+    assert len(shoeboxes) == len(expected)
+    for sbox, expected_sbox in zip(shoeboxes, expected):
+        assert sbox.panel == expected_sbox.panel
+        assert sbox.bbox == expected_sbox.bbox
+        assert list(sbox.data) == list(expected_sbox.data)
+        assert list(sbox.mask) == list(expected_sbox.mask)
+    assert list(streaming.hot_pixels()) == list(creator.hot_pixels())
+    assert 123 in streaming.hot_pixels()
+
+
+def test_streaming_labeller_with_no_points():
+    size = (50, 50)
+    streaming = StreamingPixelListLabeller(find_hot_pixels=True)
+    for i in range(3):
+        image = flex.double(flex.grid(size), 0)
+        mask = flex.bool(flex.grid(size), False)
+        streaming.add(PixelList(i, image, mask))
+    streaming.finish()
+    assert streaming.num_pixels() == 0
+    assert len(streaming.shoeboxes()) == 0
+    assert len(streaming.hot_pixels()) == 0
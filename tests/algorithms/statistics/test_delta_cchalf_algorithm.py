@@ -4,9 +4,18 @@
 
 from unittest import mock
 
+import numpy as np
+import pytest
+
+from cctbx import sgtbx, uctbx
+from dxtbx import flumpy
 from dxtbx.model import Crystal, Experiment, ExperimentList, Scan
 
 from dials.algorithms.statistics.cc_half_algorithm import CCHalfFromDials
+from dials.algorithms.statistics.delta_cchalf import (
+    GroupedReflectionSums,
+    PerGroupCChalfStatistics,
+)
 from dials.array_family import flex
 from dials.command_line.compute_delta_cchalf import phil_scope
 
@@ -118,3 +127,189 @@ def mock_algorithm(*_):
         assert script.results_summary["dataset_removal"][
             "experiments_fully_removed"
         ] == ["0"]
+
+
+def reference_mean_cchalf(unique_index, intensities, bin_index, nbins):
+    """Compute the mean CC 1/2 in resolution bins, one reflection at a time."""
+    bins = [[] for _ in range(nbins)]
+    for h, b in enumerate(bin_index):
+        x = intensities[unique_index == h]
+        n = x.size
+        if n > 1:
+            var = (np.sum(np.square(x)) - np.sum(x) ** 2 / n) / (n - 1) / n
+            bins[b].append((np.mean(x), var))
+    total = 0.0
+    count = 0
+    for data in bins:
+        n = len(data)
+        if n > 1:
+            means = np.array([m for m, _ in data])
+            sigma_y = np.sum(np.square(means - np.mean(means))) / (n - 1)
+            sigma_e = sum(v for _, v in data) / n
+            total += n * (sigma_y - sigma_e) / (sigma_y + sigma_e)
+            count += n
+    return total / count if count else 0.0
+
+
+@pytest.mark.parametrize("nproc", [1, 2])
+def test_GroupedReflectionSums(nproc):
+    """Test the vectorised leave-one-group-out CC 1/2 against a simple loop."""
+    rng = np.random.default_rng(0)
+    n_obs, n_unique, n_groups, nbins = 2000, 150, 12, 4
+    unique_index = rng.integers(0, n_unique, n_obs)
+    group_index = rng.integers(0, n_groups, n_obs)
+    intensities = rng.normal(100.0, 30.0, n_obs) + (unique_index % 7) * 50.0
+    bin_index = np.arange(n_unique) % nbins
+
+    sums = GroupedReflectionSums(
+        unique_index, group_index, intensities, bin_index, nbins
+    )
+    assert sums.cchalf() == pytest.approx(
+        reference_mean_cchalf(unique_index, intensities, bin_index, nbins)
+    )
+    expected = [
+        reference_mean_cchalf(
+            unique_index[group_index != g],
+            intensities[group_index != g],
+            bin_index,
+            nbins,
+        )
+        for g in range(n_groups)
+    ]
+    assert list(sums.cchalf_excluding_each_group(nproc=nproc)) == pytest.approx(
+        expected, abs=1e-12
+    )
+
+
+def test_GroupedReflectionSums_update():
+    """Test that updated sums give the same CC 1/2 as sums built from scratch."""
+    rng = np.random.default_rng(0)
+    n_obs, n_unique, n_groups, nbins = 2000, 150, 12, 4
+    unique_index = rng.integers(0, n_unique, n_obs)
+    group_index = rng.integers(0, n_groups, n_obs)
+    intensities = rng.normal(100.0, 30.0, n_obs) + (unique_index % 7) * 50.0
+    bin_index = np.arange(n_unique) % nbins
+    sums = GroupedReflectionSums(
+        unique_index, group_index, intensities, bin_index, nbins
+    )
+
+    # Remove a few observations, for which the sums are updated in place
+    present = rng.random(n_obs) > 0.03
+    sums.update(present, intensities)
+    expected = GroupedReflectionSums(
+        unique_index[present], group_index[present], intensities[present], bin_index, 4
+    )
+    assert sums.cchalf() == pytest.approx(expected.cchalf(), abs=1e-12)
+    assert list(sums.cchalf_excluding_each_group()) == pytest.approx(
+        list(expected.cchalf_excluding_each_group()), abs=1e-12
+    )
+
+    # Remove some groups and observations, and rescale, then restore a group
+    present &= (group_index != 3) & (group_index != 7)
+    intensities = intensities * rng.normal(1.0, 0.05, n_obs)
+    sums.update(present, intensities)
+    present[group_index == 7] = True
+    present[group_index == 0] = False
+    intensities = intensities * 1.01
+    sums.update(present, intensities)
+
+    expected = GroupedReflectionSums(
+        unique_index[present],
+        group_index[present],
+        intensities[present],
+        bin_index,
+        nbins,
+    )
+    assert sums.cchalf() == pytest.approx(expected.cchalf(), abs=1e-12)
+    n_observations = sums.n_observations_per_group()
+    assert list(n_observations) == list(np.bincount(group_index[present], minlength=12))
+    groups = n_observations > 0
+    assert list(sums.cchalf_excluding_each_group()[groups]) == pytest.approx(
+        list(expected.cchalf_excluding_each_group()[groups]), abs=1e-12
+    )
+
+
+def generated_refl_with_indices():
+    """Generate scaled reflections with symmetry equivalents across datasets."""
+    rng = np.random.default_rng(0)
+    n = 600
+    pool = [(h, k, l) for h in range(1, 4) for k in range(3) for l in range(1, 5)]
+    unique_index = rng.integers(0, len(pool), n)
+    intensities = rng.uniform(100.0, 1000.0, len(pool))[unique_index]
+    intensities *= rng.normal(1.0, 0.1, n)
+    refls = flex.reflection_table()
+    refls["miller_index"] = flex.miller_index([pool[i] for i in unique_index])
+    refls["intensity.scale.value"] = flex.double(intensities)
+    refls["intensity.scale.variance"] = flex.double(intensities)
+    refls["inverse_scale_factor"] = flex.double(n, 1.0)
+    refls["id"] = flex.int([0] * (n // 2) + [1] * (n // 2))
+    refls["xyzobs.px.value"] = flex.vec3_double(
+        [(0, 0, z) for z in rng.uniform(0.0, 25.0, n)]
+    )
+    refls.set_flags(flex.bool(n, False), refls.flags.outlier_in_scaling)
+    refls.experiment_identifiers()[0] = "0"
+    refls.experiment_identifiers()[1] = "1"
+    return refls
+
+
+def test_CCHalfFromDials_update_from_previous():
+    """Test that the statistics updated from a previous run give the same
+    ΔCC½ values as statistics computed from scratch."""
+    params = phil_scope.extract()
+    params.mode = "image_group"
+    # Fix the resolution range, so that the statistics can be updated
+    params.dmin = 0.1
+    params.dmax = 2.0
+    expts = generated_exp(n=2)
+    refls = generated_refl_with_indices()
+    previous = CCHalfFromDials(params, expts, refls)
+    previous.algorithm.run()
+    statistics = previous.algorithm.statistics
+
+    # Exclude the first image group of the first dataset, then rescale
+    excluded = (refls["id"] == 0) & (refls["xyzobs.px.value"].parts()[2] < 10.0)
+    refls.set_flags(excluded, refls.flags.user_excluded_in_scaling)
+    rng = np.random.default_rng(1)
+    for rescale in (False, True):
+        if rescale:
+            refls["inverse_scale_factor"] = flex.double(
+                rng.uniform(0.8, 1.2, refls.size())
+            )
+        updated = CCHalfFromDials(params, expts, refls, previous=previous)
+        updated.algorithm.run()
+        assert updated.algorithm.statistics is statistics
+
+        recomputed = CCHalfFromDials(params, expts, refls)
+        recomputed.algorithm.run()
+        assert recomputed.algorithm.statistics is not statistics
+        assert updated.algorithm.delta_cchalf_i == pytest.approx(
+            recomputed.algorithm.delta_cchalf_i
+        )
+        previous = updated
+
+
+def test_PerGroupCChalfStatistics_bins_by_mean_unit_cell():
+    """Test that the unique reflections are binned by their d-spacing in the
+    mean unit cell, rather than by the d-spacing of any one observation."""
+    unit_cell = uctbx.unit_cell((10, 10, 10, 90, 90, 90))
+    hkl = [(1, 0, 0), (2, 0, 0), (3, 0, 0), (1, 1, 0), (1, 1, 1), (2, 2, 1)] * 3
+    table = flex.reflection_table()
+    table["miller_index"] = flex.miller_index(hkl)
+    table["intensity"] = flex.double(range(1, len(hkl) + 1))
+    table["variance"] = flex.double(len(hkl), 1.0)
+    table["dataset"] = flex.int(len(hkl), 0)
+    table["group"] = flex.int([0] * 6 + [1] * 6 + [2] * 6)
+    stats = PerGroupCChalfStatistics(
+        table, unit_cell, sgtbx.space_group("P 1"), n_bins=3
+    )
+    unique_hkl = flex.miller_index(sorted(set(stats.reflection_table["miller_index"])))
+    expected = list(stats.binner.indices(flumpy.to_numpy(unit_cell.d(unique_hkl))))
+    assert list(stats.reflection_sums.bin_index) == expected
+
+    # The first observations of each reflection are from a crystal with a
+    # larger cell than the mean, so have a larger d-spacing
+    stats.reflection_table["d"] = stats.reflection_table["d"] * flex.double(
+        [1.25] * 6 + [1.0] * 12
+    )
+    stats.compute_overall_stats()
+    assert list(stats.reflection_sums.bin_index) == expected
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import numpy as np
 import pytest
 
 import libtbx
@@ -139,3 +140,34 @@ def test_cosym(
             )
         else:
             reference = reindexed
+
+
+def test_cosym_parallel_random_starts():
+    datasets, _ = generate_test_data(
+        space_group=sgtbx.space_group_info(symbol="P4").group(),
+        unit_cell_volume=10000,
+        d_min=1.5,
+        map_to_p1=True,
+        sample_size=10,
+        seed=1,
+    )
+
+    results = []
+    for nproc in (1, 2):
+        params = phil_scope.extract()
+        params.dimensions = libtbx.Auto
+        params.normalisation = None
+        params.minimization.n_random_starts = 2
+        params.nproc = nproc
+        np.random.seed(42)
+        cosym = CosymAnalysis(datasets, params)
+        cosym.run()
+        results.append(cosym)
+
+    serial, parallel = results
+    assert parallel.target.dim == serial.target.dim
+    assert parallel.minimizer.fun == pytest.approx(serial.minimizer.fun)
+    assert parallel.coords == pytest.approx(serial.coords)
+    assert parallel.best_subgroup["best_subsym"].space_group() == (
+        serial.best_subgroup["best_subsym"].space_group()
+    )
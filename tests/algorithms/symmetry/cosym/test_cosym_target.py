@@ -52,3 +52,45 @@ def test_cosym_target(space_group):
         assert f < f0
         assert pytest.approx(g, abs=1e-3) == [0] * len(g)
         assert pytest.approx(g_fd, abs=1e-3) == [0] * len(g)
+
+
+@pytest.mark.parametrize("weights", [None, "count", "standard_error"])
+@pytest.mark.parametrize("nproc", [1, 2])
+def test_cosym_target_sparse_matrices(weights, nproc):
+    datasets, _ = generate_test_data(
+        space_group=sgtbx.space_group_info(symbol="P6").group(), sample_size=20
+    )
+
+    intensities = datasets[0]
+    dataset_ids = np.zeros(intensities.size() * len(datasets))
+    for i, d in enumerate(datasets[1:]):
+        i += 1
+        intensities = intensities.concatenate(d, assert_is_similar_symmetry=False)
+        dataset_ids[i * d.size() : (i + 1) * d.size()] = np.full(d.size(), i, dtype=int)
+
+    dense = target.Target(intensities, dataset_ids, weights=weights)
+    sparse = target.Target(
+        intensities, dataset_ids, weights=weights, nproc=nproc, sparse_matrices=True
+    )
+    np.testing.assert_allclose(sparse.rij_matrix.toarray(), dense.rij_matrix)
+    if weights:
+        np.testing.assert_allclose(sparse.wij_matrix.toarray(), dense.wij_matrix)
+    else:
+        assert sparse.wij_matrix is None
+
+    x = flex.random_double(len(datasets) * len(dense.sym_ops) * dense.dim)
+    x = x.as_numpy_array()
+    assert sparse.compute_functional(x) == pytest.approx(dense.compute_functional(x))
+    np.testing.assert_allclose(
+        sparse.compute_gradients(x), dense.compute_gradients(x), atol=1e-10
+    )
+    np.testing.assert_allclose(sparse.curvatures(x), dense.curvatures(x), atol=1e-10)
+
+    # The stored elements are found once, and reused at other coordinates
+    elements = sparse._sparse_elements()
+    x = flex.random_double(x.size).as_numpy_array()
+    assert sparse.compute_functional(x) == pytest.approx(dense.compute_functional(x))
+    np.testing.assert_allclose(
+        sparse.compute_gradients(x), dense.compute_gradients(x), atol=1e-10
+    )
+    assert sparse._sparse_elements() is elements
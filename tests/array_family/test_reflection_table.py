@@ -1185,6 +1185,66 @@ def compare(a, b):
     assert all(tuple(compare(a, b) for a, b in zip(new_table["col11"], c11)))
 
 
+def _table_for_columns():
+    table = flex.reflection_table()
+    table["id"] = flex.int([0, 1, 0, 1])
+    table["miller_index"] = flex.miller_index([(1, 2, 3), (4, 5, 6)] * 2)
+    table["intensity.sum.value"] = flex.double([1.0, 2.0, 3.0, 4.0])
+    table["xyzobs.px.value"] = flex.vec3_double(4, (1, 2, 3))
+    table["shoebox"] = flex.shoebox(
+        flex.size_t(4, 0), flex.int6(4, (0, 4, 0, 3, 0, 1)), allocate=True
+    )
+    table.experiment_identifiers()[0] = "abcd"
+    table.experiment_identifiers()[1] = "efgh"
+    return table
+
+
+def _check_columns(new_table, table, columns):
+    assert new_table.is_consistent()
+    assert new_table.size() == 4
+    assert set(new_table.keys()) == set(columns)
+    for column in columns:
+        assert list(new_table[column]) == list(table[column])
+    assert dict(new_table.experiment_identifiers()) == {0: "abcd", 1: "efgh"}
+
+
+def test_from_file_columns(tmp_path):
+    table = _table_for_columns()
+    columns = ["miller_index", "id", "intensity.sum.value"]
+    table.as_msgpack_file(tmp_path / "reflections.refl")
+    new_table = flex.reflection_table.from_file(tmp_path / "reflections.refl", columns)
+    _check_columns(new_table, table, columns)
+
+    # All of the columns are read by default
+    new_table = flex.reflection_table.from_file(tmp_path / "reflections.refl")
+    assert set(new_table.keys()) == set(table.keys())
+
+
+def test_from_file_columns_pickle(tmp_path):
+    # A pickle file can't be indexed as msgpack, so is read in full and the
+    # columns selected afterwards
+    table = _table_for_columns()
+    columns = ["miller_index", "id", "intensity.sum.value"]
+    table.as_pickle(tmp_path / "reflections.pickle")
+    new_table = flex.reflection_table.from_file(
+        tmp_path / "reflections.pickle", columns
+    )
+    _check_columns(new_table, table, columns)
+
+
+def test_from_msgpack_file_missing_column(tmp_path):
+    table = _table_for_columns()
+    table.as_msgpack_file(tmp_path / "reflections.refl")
+    with pytest.raises(KeyError):
+        flex.reflection_table.from_msgpack_file(
+            tmp_path / "reflections.refl", ["intensity.prf.value"]
+        )
+    with pytest.raises(KeyError):
+        flex.reflection_table.from_file(
+            tmp_path / "reflections.refl", ["id", "intensity.prf.value"]
+        )
+
+
 def test_experiment_identifiers():
     table = flex.reflection_table()
     table["id"] = flex.int([0, 1, 2, 3])
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+
+import pytest
+
+from dials.command_line import find_spots_client
+
+
+@pytest.fixture
+def server(tmp_path):
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        ["dials.find_spots_server", "nproc=2", f"port={port}"], cwd=tmp_path
+    )
+    try:
+        for _ in range(60):
+            try:
+                urllib.request.urlopen(f"http://localhost:{port}/metrics")
+                break
+            except OSError:
+                time.sleep(1)
+        else:
+            pytest.fail("Server did not start")
+        yield port
+    finally:
+        find_spots_client.stop("localhost", port, 1)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def test_find_spots_server_client(dials_data, server):
+    filenames = sorted(
+        str(f)
+        for f in dials_data("centroid_test_data", pathlib=True).glob("centroid*.cbf")
+    )[:4]
+
+    single = [
+        json.loads(find_spots_client.work("localhost", server, f, ["d_min=3.5"]))
+        for f in filenames
+    ]
+    batch = list(
+        find_spots_client.work_batch("localhost", server, filenames, ["d_min=3.5"])
+    )
+    assert [d["image"] for d in batch] == filenames
+    for d, expected in zip(batch, single):
+        assert "error" not in d
+        assert d["n_spots_total"] == expected["n_spots_total"] > 0
+        assert d["estimated_d_min"] == pytest.approx(expected["estimated_d_min"])
+
+    metrics = json.loads(
+        urllib.request.urlopen(f"http://localhost:{server}/metrics").read()
+    )
+    assert metrics["n_completed"] == 2 * len(filenames)
+    assert metrics["queue_depth"] == 0
+    assert metrics["n_errors"] == 0
+    assert metrics["latency"]["max"] >= metrics["latency"]["median"] > 0
@@ -103,3 +103,27 @@ def test_masked(dials_data, tmp_path):
     assert masked.header_max < unmasked.header_max
     assert masked.header_max == pytest.approx(289.11111)
     assert unmasked.header_max == pytest.approx(65535.0)
+
+
+def test_nproc(dials_data, tmp_path):
+    # At least 10 images per block, so the images are split over two blocks
+    images = sorted(dials_data("insulin", pathlib=True).glob("insulin_1_0*.img"))[:20]
+    for nproc in (1, 2):
+        result = subprocess.run(
+            [
+                shutil.which("dials.rs_mapper"),
+                *images,
+                "grid_size=96",
+                f"nproc={nproc}",
+                f"map_file=nproc_{nproc}.ccp4",
+            ],
+            cwd=tmp_path,
+            capture_output=True,
+        )
+        assert not result.returncode and not result.stderr
+    assert b"split over 2 blocks" in (tmp_path / "dials.rs_mapper.log").read_bytes()
+
+    serial = ccp4_map.map_reader(file_name=str(tmp_path / "nproc_1.ccp4"))
+    parallel = ccp4_map.map_reader(file_name=str(tmp_path / "nproc_2.ccp4"))
+    assert flex.max(serial.data) > 0
+    assert parallel.data.all_eq(serial.data)
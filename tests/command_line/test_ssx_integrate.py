@@ -149,3 +149,31 @@ def test_ssx_integrate_algorithms(dials_data, algorithm, expected_n_refls):
 
     assert len(experiments) == 2
     assert len(reflections) == pytest.approx(expected_n_refls, abs=9)
+
+
+@pytest.mark.xdist_group(name="group1")
+def test_ssx_integrate_batches_with_process_pool(dials_data):
+    ssx = dials_data("cunir_serial_processed", pathlib=True)
+    dials_data("cunir_serial", pathlib=True)
+
+    parser = ArgumentParser(phil=working_phil, check_format=False)
+
+    results = {}
+    for nproc in (1, 2):
+        indexed_expts = load.experiment_list(ssx / "indexed.expt", check_format=True)
+        indexed_refl = flex.reflection_table.from_file(
+            ssx / "indexed.refl"
+        ).split_by_experiment_id()
+        params, _ = parser.parse_args(args=[], quick_parse=True)
+        params.algorithm = "stills"
+        params.nproc = nproc
+        params.image_range = "1:3"
+        params.output.batch_size = 2
+        results[nproc] = list(run_integration(indexed_refl, indexed_expts, params))
+
+    # The pipelined batches are returned in order, with the same results, and
+    # the experiments of each batch in the same order
+    assert len(results[2]) == len(results[1]) == 2
+    for (expts1, refls1, _), (expts2, refls2, _) in zip(results[1], results[2]):
+        assert expts1.identifiers() == expts2.identifiers()
+        assert refls1.size() == refls2.size()
@@ -10,10 +10,11 @@
 import dxtbx
 from dxtbx.format.FormatCBFCspad import FormatCBFCspadInMemory
 from dxtbx.imageset import ImageSet, ImageSetData, MemReader
-from dxtbx.model.experiment_list import ExperimentListFactory
+from dxtbx.model.experiment_list import ExperimentList, ExperimentListFactory
 from libtbx.phil import parse
 
 from dials.array_family import flex
+from dials.command_line import stills_process
 from dials.command_line.stills_process import Processor, phil_scope
 
 cspad_cbf_in_memory_phil = """
@@ -257,3 +258,34 @@ def test_pseudo_scan(dials_data, tmp_path):
         tmp_path / "idx-0000_refined.expt", check_format=False
     )
     assert len(experiments) == 2
+
+
+def test_zero_length_imageset_is_skipped(dials_data, tmp_path, monkeypatch):
+    """A file with no images is skipped, and the files after it are processed."""
+    images = sorted(
+        str(f)
+        for f in dials_data("centroid_test_data", pathlib=True).glob(
+            "centroid_000[1-2].cbf"
+        )
+    )
+    do_import = stills_process.do_import
+
+    def do_import_first_as_empty(filename, load_models=True):
+        if os.path.basename(filename) == "centroid_0001.cbf":
+            return ExperimentList()
+        return do_import(filename, load_models=load_models)
+
+    processed = []
+    finalized = []
+    monkeypatch.setattr(stills_process, "do_import", do_import_first_as_empty)
+    monkeypatch.setattr(
+        Processor,
+        "process_experiments",
+        lambda self, tag, experiments: processed.append(tag),
+    )
+    monkeypatch.setattr(Processor, "finalize", lambda self: finalized.append(self))
+    monkeypatch.chdir(tmp_path)
+    stills_process.Script().run([*images, "mp.nproc=1"])
+
+    assert processed == ["centroid_0002"]
+    assert len(finalized) == 1
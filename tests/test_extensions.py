@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import dials.extensions
+
+
+def test_extensions():
+    names = [ext.name for ext in dials.extensions.SpotFinderThreshold.extensions()]
+    assert "dispersion" in names
+    assert "dispersion_extended" in names
+    assert dials.extensions.SpotFinderThreshold.load("dispersion").name == "dispersion"
+    assert dials.extensions.SpotFinderThreshold.load("not_an_extension") is None
+    assert dials.extensions.ProfileModel.load("gaussian_rs").name == "gaussian_rs"
+
+
+def test_load_imports_only_the_requested_extension():
+    code = """
+import sys
+import dials.extensions
+ext = dials.extensions.Background.load("simple")
+assert ext.name == "simple"
+assert "dials.extensions.simple_background_ext" in sys.modules
+assert "dials.extensions.glm_background_ext" not in sys.modules
+"""
+    subprocess.run([sys.executable, "-c", code], check=True)
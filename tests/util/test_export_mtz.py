@@ -6,9 +6,15 @@
 
 import itertools
 
+import gemmi
+import pytest
+
+from dxtbx import flumpy
 from dxtbx.model import Scan
 
+from dials.array_family import flex
 from dials.util.batch_handling import calculate_batch_offsets
+from dials.util.export_mtz import write_columns
 
 
 def range_to_set(ranges):
@@ -87,3 +93,64 @@ def test_calculate_batch_ranges(self):
         assert all(float(x).is_integer() for x in offsets)
         assert all(isinstance(x, int) for x in offsets)
         assert all(x > 0 for x in offsets)
+
+
+def _reflections(n, seed):
+    flex.set_random_seed(seed)
+    table = flex.reflection_table()
+    table["miller_index"] = flex.miller_index(
+        [(i % 7 - 3, i % 5, -(i % 11)) for i in range(n)]
+    )
+    table["batch"] = flex.int(range(1, n + 1))
+    table["intensity.prf.value"] = flex.random_double(n) * 100
+    table["intensity.prf.variance"] = flex.random_double(n) + 1
+    table["intensity.sum.value"] = flex.random_double(n) * 100
+    table["intensity.sum.variance"] = flex.random_double(n) + 1
+    table["fractioncalc"] = flex.random_double(n)
+    table["xyzobs.px.value"] = flex.vec3_double(
+        flex.random_double(n), flex.random_double(n), flex.random_double(n)
+    )
+    table["ROT"] = flex.random_double(n) * 90
+    return table
+
+
+@pytest.mark.parametrize("nproc, max_memory", [(1, 2**28), (2, 1000)])
+def test_write_columns(nproc, max_memory):
+    tables = [_reflections(50, 0), _reflections(23, 1)]
+    mtz = gemmi.Mtz(with_base=True)
+    mtz.add_dataset("FROMDIALS")
+    write_columns(mtz, tables, nproc=nproc, max_memory=max_memory)
+
+    labels = [column.label for column in mtz.columns]
+    assert labels == [
+        "H",
+        "K",
+        "L",
+        "M/ISYM",
+        "BATCH",
+        "IPR",
+        "SIGIPR",
+        "I",
+        "SIGI",
+        "FRACTIONCALC",
+        "XDET",
+        "YDET",
+        "ROT",
+        "QE",
+    ]
+    assert mtz.nreflections == 73
+    data = mtz.array
+    column = dict(zip(labels, data.T))
+    for start, table in zip((0, 50), tables):
+        rows = slice(start, start + len(table))
+        assert data[rows, :3] == pytest.approx(flumpy.to_numpy(table["miller_index"]))
+        assert column["BATCH"][rows] == pytest.approx(list(table["batch"]))
+        assert column["SIGIPR"][rows] == pytest.approx(
+            list(flex.sqrt(table["intensity.prf.variance"]))
+        )
+        assert column["I"][rows] == pytest.approx(list(table["intensity.sum.value"]))
+        assert column["YDET"][rows] == pytest.approx(
+            list(table["xyzobs.px.value"].parts()[1])
+        )
+    assert (column["M/ISYM"] == 0).all()
+    assert (column["QE"] == 1).all()
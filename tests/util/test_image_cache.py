@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+
+from dials.array_family import flex
+from dials.util.image_viewer.image_cache import IdentityKey, ImageCache, nbytes
+
+
+def test_nbytes():
+    assert nbytes(flex.double(10)) == 80
+    assert nbytes((flex.int(10), flex.bool(10))) == 50
+
+
+def test_image_cache_lru():
+    loaded = []
+
+    def load(i):
+        loaded.append(i)
+        return flex.double(10, i)
+
+    # Room for three items of 80 bytes
+    cache = ImageCache(250)
+    for i in (0, 1, 2, 0, 3):
+        assert cache.get(i, lambda: load(i))[0] == i
+    assert loaded == [0, 1, 2, 3]
+    assert (cache.hits, cache.misses) == (1, 4)
+    # 1 was the least recently used item
+    assert 1 not in cache
+    assert 0 in cache and 2 in cache and 3 in cache
+    assert cache.nbytes == 240
+
+    # Items larger than the cache are returned but not held
+    assert len(cache.get("big", lambda: flex.double(100))) == 100
+    assert "big" not in cache
+    assert len(cache) == 3
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_image_cache_prefetch():
+    cache = ImageCache(10**6)
+    release = threading.Event()
+    loaded = []
+
+    def load(i):
+        release.wait()
+        loaded.append(i)
+        return flex.double(10, i)
+
+    cache.prefetch([(i, lambda i=i: load(i)) for i in range(3)])
+    # Replace the pending items: 0 may already be being loaded
+    cache.prefetch([(i, lambda i=i: load(i)) for i in (4, 5)])
+    release.set()
+    # Waits for the item being loaded in the background, or loads it
+    assert cache.get(5, lambda: load(5))[0] == 5
+    cache.close()
+    assert loaded.count(5) == 1
+    assert set(loaded) <= {0, 4, 5}
+
+
+def test_identity_key():
+    a = flex.double(10)
+    b = flex.double(10)
+    assert IdentityKey(a) == IdentityKey(a)
+    assert hash(IdentityKey(a)) == hash(IdentityKey(a))
+    assert IdentityKey(a) != IdentityKey(b)
+
+    # The key keeps the object alive, so its id can't be reused while the
+    # key is held in a cache
+    cache = ImageCache(10**6)
+    cache.get((IdentityKey(flex.double(10)), 0), lambda: flex.double(10, 1))
+    cache.get((IdentityKey(flex.double(10)), 0), lambda: flex.double(10, 2))
+    assert (cache.hits, cache.misses) == (0, 2)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+from dxtbx.imageset import ImageSequence
+from dxtbx.model.experiment_list import ExperimentListFactory
+
+from dials.util import image_headers
+
+
+@pytest.mark.parametrize("nproc", [1, 2])
+def test_experiments_from_filenames(dials_data, tmp_path, monkeypatch, caplog, nproc):
+    image_files = sorted(
+        str(f)
+        for f in dials_data("centroid_test_data", pathlib=True).glob("centroid*.cbf")
+    )
+    expected = ExperimentListFactory.from_filenames(image_files)
+    assert len(expected) == 1
+
+    # Split the sequence into chunks, which should be joined back together
+    monkeypatch.setattr(image_headers, "CHUNK_SIZE", 4)
+    cache = tmp_path / "cache"
+    caplog.set_level(logging.DEBUG, logger=image_headers.__name__)
+    for n_from_cache in (0, 3):
+        caplog.clear()
+        unhandled = []
+        experiments = image_headers.experiments_from_filenames(
+            image_files,
+            unhandled=unhandled,
+            nproc=nproc,
+            cache_directory=str(cache),
+        )
+        assert len(experiments) == 1
+        imageset = experiments[0].imageset
+        assert isinstance(imageset, ImageSequence)
+        assert imageset.get_template() == expected[0].imageset.get_template()
+        assert experiments[0].scan == expected[0].scan
+        assert experiments[0].beam == expected[0].beam
+        assert experiments[0].detector == expected[0].detector
+        assert experiments[0].goniometer == expected[0].goniometer
+        assert unhandled == []
+        # The headers of all three chunks are read from the cache the second time
+        assert len(list(cache.glob("*.json"))) == 3
+        assert f"in 3 chunks ({n_from_cache} from cache)" in caplog.text
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import pytest
+
+import iotbx.merging_statistics
+from cctbx import crystal, miller
+from scitbx.array_family import flex
+
+from dials.util import merging_statistics
+from dials.util.merging_statistics import (
+    MergingStatisticsCache,
+    cached_dataset_statistics,
+    content_hash,
+    statistics_key,
+)
+
+
+@pytest.fixture
+def i_obs():
+    crystal_symmetry = crystal.symmetry(
+        unit_cell=(20, 30, 40, 90, 90, 90), space_group_symbol="P 2 2 2"
+    )
+    indices = crystal_symmetry.build_miller_set(
+        anomalous_flag=False, d_min=2.0
+    ).indices()
+    # Three observations of each reflection
+    all_indices = flex.miller_index()
+    for _ in range(3):
+        all_indices.extend(indices)
+    flex.set_random_seed(0)
+    data = flex.random_double(all_indices.size()) * 100 + 10
+    i_obs = miller.array(
+        miller.set(crystal_symmetry, all_indices, anomalous_flag=False),
+        data=data,
+        sigmas=flex.sqrt(data),
+    )
+    i_obs.set_observation_type_xray_intensity()
+    return i_obs
+
+
+def test_statistics_key(i_obs):
+    dataset_statistics = iotbx.merging_statistics.dataset_statistics
+    key = statistics_key(i_obs, dataset_statistics, {"n_bins": 5, "anomalous": False})
+    assert content_hash(i_obs) == content_hash(i_obs.deep_copy())
+    # The order of the options doesn't matter
+    assert key == statistics_key(
+        i_obs.deep_copy(), dataset_statistics, {"anomalous": False, "n_bins": 5}
+    )
+    assert key != statistics_key(i_obs, dataset_statistics, {"n_bins": 10})
+    changed = i_obs.deep_copy()
+    changed.data()[0] += 1
+    assert content_hash(changed) != content_hash(i_obs)
+    assert key != statistics_key(
+        changed, dataset_statistics, {"n_bins": 5, "anomalous": False}
+    )
+    # Crystal symmetry options are compared by value
+    assert statistics_key(
+        i_obs, dataset_statistics, {"crystal_symmetry": i_obs.crystal_symmetry()}
+    ) == statistics_key(
+        i_obs,
+        dataset_statistics,
+        {"crystal_symmetry": i_obs.deep_copy().crystal_symmetry()},
+    )
+
+
+def test_merging_statistics_cache(i_obs):
+    cache = MergingStatisticsCache(max_items=2)
+    result = cache.dataset_statistics(i_obs, n_bins=5)
+    assert isinstance(result, iotbx.merging_statistics.dataset_statistics)
+    assert len(result.bins) == 5
+    assert cache.dataset_statistics(i_obs.deep_copy(), n_bins=5) is result
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Different options give different statistics
+    assert cache.dataset_statistics(i_obs, n_bins=4) is not result
+    cache.dataset_statistics(i_obs, n_bins=3)
+    assert len(cache) == 2
+    # The least recently used statistics were dropped
+    assert cache.dataset_statistics(i_obs, n_bins=5) is not result
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_merging_statistics_cache_directory(i_obs, tmp_path):
+    cache = MergingStatisticsCache(directory=tmp_path)
+    result = cache.dataset_statistics(i_obs, n_bins=5)
+    assert len(list(tmp_path.glob("*.pickle"))) == 1
+
+    # A new cache loads the saved statistics
+    cache = MergingStatisticsCache(directory=tmp_path)
+    loaded = cache.dataset_statistics(i_obs, n_bins=5)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert loaded.overall.cc_one_half == pytest.approx(result.overall.cc_one_half)
+    assert [b.n_obs for b in loaded.bins] == [b.n_obs for b in result.bins]
+
+
+def test_cached_dataset_statistics(i_obs, tmp_path, monkeypatch):
+    monkeypatch.setattr(merging_statistics, "_cache", None)
+    monkeypatch.setenv(merging_statistics.CACHE_DIRECTORY_VARIABLE, str(tmp_path))
+    result = cached_dataset_statistics(i_obs, n_bins=5)
+    assert cached_dataset_statistics(i_obs, n_bins=5) is result
+    assert merging_statistics.get_cache().directory == str(tmp_path)
+    assert len(list(tmp_path.glob("*.pickle"))) == 1
+
+
+def test_cached_dataset_statistics_size(i_obs, monkeypatch):
+    monkeypatch.setattr(merging_statistics, "_cache", None)
+    monkeypatch.delenv(merging_statistics.CACHE_DIRECTORY_VARIABLE, raising=False)
+    monkeypatch.delenv(merging_statistics.CACHE_SIZE_VARIABLE, raising=False)
+    assert merging_statistics.get_cache().max_items == 2
+    monkeypatch.setenv(merging_statistics.CACHE_SIZE_VARIABLE, "1")
+    result = cached_dataset_statistics(i_obs, n_bins=5)
+    cached_dataset_statistics(i_obs, n_bins=4)
+    assert len(merging_statistics.get_cache()) == 1
+    assert cached_dataset_statistics(i_obs, n_bins=5) is not result
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
+
+from dials.util.mp import dynamic_multi_core_run
 from dials.util.system import CPU_COUNT
 
 
@@ -8,3 +12,56 @@ def test_available_cpus():
     # but we know there will be at least one available core, and
     # the function must return a positive integer in any case.
     assert CPU_COUNT >= 1
+
+
+def test_dynamic_multi_core_run(tmp_path):
+    def initializer(rank):
+        return []
+
+    def function(rank, items, state):
+        if 5 in items:
+            raise ValueError("bad item")
+        return state + list(items)
+
+    def finalizer(state):
+        (tmp_path / f"{os.getpid()}.txt").write_text(" ".join(map(str, state)))
+
+    reports = dynamic_multi_core_run(
+        function,
+        range(20),
+        nproc=3,
+        chunksize=2,
+        initializer=initializer,
+        finalizer=finalizer,
+    )
+    assert [r.rank for r in reports] == [0, 1, 2]
+    assert sum(r.num_items for r in reports) == 20
+    assert sum(r.num_chunks for r in reports) == 10
+    errors = [e for r in reports for e in r.errors]
+    assert len(errors) == 1 and "bad item" in errors[0]
+    assert all(0 <= r.utilisation <= 1 for r in reports)
+
+    processed = []
+    for f in tmp_path.glob("*.txt"):
+        processed.extend(int(i) for i in f.read_text().split())
+    assert sorted(processed) == [i for i in range(20) if i not in (4, 5)]
+
+
+def test_dynamic_multi_core_run_without_fork(monkeypatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    processed = []
+
+    def function(rank, items, state):
+        processed.extend(items)
+        return state + 1
+
+    reports = dynamic_multi_core_run(
+        function, range(10), nproc=3, chunksize=3, initializer=lambda rank: 0
+    )
+    # All of the items are processed in this process
+    assert processed == list(range(10))
+    assert len(reports) == 1
+    assert reports[0].rank == 0
+    assert reports[0].num_items == 10
+    assert reports[0].num_chunks == 4
+    assert not reports[0].errors
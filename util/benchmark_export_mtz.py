@@ -0,0 +1,90 @@
+"""
+Measure the throughput and peak memory of exporting unmerged reflections to MTZ.
+
+dials.export is run on the given files with format=mtz, once for each number of
+threads used to convert the columns, and the time taken, the number of
+reflections written per second and the peak memory of the process are reported.
+Run with
+
+    dials.python util/benchmark_export_mtz.py [-n REPEATS] [--nproc N ...]
+        scaled.expt scaled.refl [parameter=value ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# The log line giving the number of reflections written
+SAVING = re.compile(r"^Saving (\d+) integrated reflections")
+
+# Run a command, then print the peak memory of the command in kB to stderr
+PEAK_MEMORY = """
+import resource, subprocess, sys
+subprocess.run(sys.argv[1:], check=True)
+print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss, file=sys.stderr)
+"""
+
+
+def time_export(arguments, nproc):
+    """
+    :returns: The time taken in seconds, the number of reflections written and
+              the peak memory of the process in MB
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        command = [
+            shutil.which("dials.export"),
+            *arguments,
+            "format=mtz",
+            f"mtz.nproc={nproc}",
+            f"mtz.hklout={Path(directory) / 'benchmark.mtz'}",
+        ]
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", PEAK_MEMORY, *command],
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start
+    n_refl = 0
+    for line in result.stdout.splitlines():
+        if match := SAVING.match(line):
+            n_refl = int(match.group(1))
+    peak = int(result.stderr.split()[-1]) / 1024
+    return elapsed, n_refl, peak
+
+
+def run(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arguments", nargs="+", help="The arguments of dials.export")
+    parser.add_argument("-n", "--repeats", type=int, default=3)
+    parser.add_argument("--nproc", type=int, action="append")
+    options = parser.parse_args(args)
+    if not shutil.which("dials.export"):
+        sys.exit("dials.export not found")
+    arguments = [
+        str(Path(a).resolve()) if Path(a).exists() else a for a in options.arguments
+    ]
+
+    print(f"{'nproc':<8} {'median (s)':>10} {'refl/s':>12} {'peak (MB)':>10}")
+    for nproc in options.nproc or [1]:
+        results = [time_export(arguments, nproc) for _ in range(options.repeats)]
+        times = [elapsed for elapsed, _, _ in results]
+        n_refl = results[-1][1]
+        print(
+            f"{nproc:<8} {statistics.median(times):10.3f} "
+            f"{n_refl / statistics.median(times):12.0f} {results[-1][2]:10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,90 @@
+"""
+Compare the time taken by the ΔCC½ scale-and-filter cycles of dials.scale with
+and without reusing the scaler between cycles.
+
+dials.scale is run with filtering.method=deltacchalf on the given integrated
+files, once with filtering.deltacchalf.warm_start=True and once with it False,
+and the time taken for each cycle is read from the log. Run with
+
+    dials.python util/benchmark_scale_and_filter.py [-n REPEATS]
+        integrated.expt integrated.refl [parameter=value ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# The log line at the end of each scale-and-filter cycle
+CYCLE = re.compile(r"^Cycle \d+ of filtering")
+
+
+def time_scale_and_filter(arguments, warm_start, repeats):
+    """
+    :returns: A list of the total times in seconds, and a list of the times in
+              seconds taken by each filtering cycle (including the scaling
+              before the first cycle) in the last repeat
+    """
+    totals = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as directory:
+            command = [
+                shutil.which("dials.scale"),
+                *arguments,
+                "filtering.method=deltacchalf",
+                f"filtering.deltacchalf.warm_start={warm_start}",
+                "output.html=None",
+            ]
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                command,
+                cwd=directory,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            cycle_ends = []
+            for line in process.stdout:
+                if CYCLE.match(line):
+                    cycle_ends.append(time.perf_counter())
+            if process.wait():
+                sys.exit(f"{' '.join(command)} failed")
+            end = time.perf_counter()
+            totals.append(end - start)
+        cycles = [b - a for a, b in zip([start] + cycle_ends, cycle_ends)]
+    return totals, cycles
+
+
+def run(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arguments", nargs="+", help="The arguments of dials.scale")
+    parser.add_argument("-n", "--repeats", type=int, default=1)
+    options = parser.parse_args(args)
+    if not shutil.which("dials.scale"):
+        sys.exit("dials.scale not found")
+    arguments = [
+        str(Path(a).resolve()) if Path(a).exists() else a for a in options.arguments
+    ]
+
+    results = {}
+    for warm_start in (False, True):
+        results[warm_start] = time_scale_and_filter(
+            arguments, warm_start, options.repeats
+        )
+
+    print(f"{'warm_start':<12} {'median (s)':>10} {'min (s)':>10} {'cycles (s)'}")
+    for warm_start, (totals, cycles) in results.items():
+        print(
+            f"{str(warm_start):<12} {statistics.median(totals):10.3f} "
+            f"{min(totals):10.3f} {' '.join(f'{t:.2f}' for t in cycles)}"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,79 @@
+"""
+Check that scaling with scaling_options.nproc > 1 is not slower than scaling
+serially.
+
+dials.scale is run on the given files once for each number of processes, and
+the median time taken is reported. With more than one process, the blocks of
+the Ih table are evaluated in parallel, with the Jacobian of each block passed
+back from the worker processes; the script exits with an error if any run with
+more than one process is slower than the serial run by more than the given
+tolerance. Run with
+
+    dials.python util/benchmark_scaling_nproc.py [-n REPEATS] [--nproc N ...]
+        [--tolerance FRACTION] scaled.expt scaled.refl [parameter=value ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def time_scale(arguments, nproc):
+    """
+    :returns: The time taken in seconds
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        command = [
+            shutil.which("dials.scale"),
+            *arguments,
+            f"scaling_options.nproc={nproc}",
+            "output.html=None",
+        ]
+        start = time.perf_counter()
+        subprocess.run(command, cwd=directory, stdout=subprocess.DEVNULL, check=True)
+        return time.perf_counter() - start
+
+
+def run(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arguments", nargs="+", help="The arguments of dials.scale")
+    parser.add_argument("-n", "--repeats", type=int, default=3)
+    parser.add_argument("--nproc", type=int, action="append")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.05,
+        help="The fraction by which a parallel run may be slower than serial",
+    )
+    options = parser.parse_args(args)
+    if not shutil.which("dials.scale"):
+        sys.exit("dials.scale not found")
+    arguments = [
+        str(Path(a).resolve()) if Path(a).exists() else a for a in options.arguments
+    ]
+
+    medians = {}
+    print(f"{'nproc':<8} {'median (s)':>10} {'min (s)':>10}")
+    for nproc in [1] + [n for n in options.nproc or [4] if n != 1]:
+        times = [time_scale(arguments, nproc) for _ in range(options.repeats)]
+        medians[nproc] = statistics.median(times)
+        print(f"{nproc:<8} {medians[nproc]:10.3f} {min(times):10.3f}")
+
+    slower = [
+        nproc
+        for nproc, median in medians.items()
+        if median > medians[1] * (1 + options.tolerance)
+    ]
+    if slower:
+        sys.exit(f"Scaling with nproc={slower} is slower than serial scaling")
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,67 @@
+"""
+Measure the start-up time of the main DIALS command-line programs.
+
+Each program is run with -h, which imports the program and constructs its phil
+scope (including the parameters of the registered extensions) before exiting,
+so the time taken is dominated by the start-up cost. Run with
+
+    dials.python util/benchmark_startup.py [-n REPEATS] [program ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+PROGRAMS = (
+    "dials.import",
+    "dials.find_spots",
+    "dials.find_spots_client",
+    "dials.index",
+    "dials.refine",
+    "dials.integrate",
+    "dials.symmetry",
+    "dials.scale",
+    "dials.export",
+    "dials.ssx_index",
+    "dials.ssx_integrate",
+)
+
+
+def time_program(program, repeats):
+    """
+    :returns: The start-up times of the program in seconds
+    """
+    command = [shutil.which(program), "-h"]
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("programs", nargs="*", default=PROGRAMS)
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    options = parser.parse_args(args)
+
+    print(f"{'program':<24} {'median (s)':>10} {'min (s)':>10}")
+    total = 0
+    for program in options.programs:
+        if not shutil.which(program):
+            print(f"{program:<24} {'not found':>10}")
+            continue
+        times = time_program(program, options.repeats)
+        total += statistics.median(times)
+        print(f"{program:<24} {statistics.median(times):10.3f} {min(times):10.3f}")
+    print(f"{'total':<24} {total:10.3f}")
+
+
+if __name__ == "__main__":
+    sys.exit(run())